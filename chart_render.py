@@ -0,0 +1,82 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from exec_pool import get_pool
+from fingerprint import frame_fingerprint
+
+CACHE_MAX_BYTES = int(os.getenv("FIGURE_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+_figures = OrderedDict()
+_figures_bytes = 0
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chart-render")
+
+
+class RenderError(Exception):
+    pass
+
+
+def figure_key(code, df, figure_format="png", dataset_key=None):
+    return (hashlib.sha256(code.encode("utf-8")).hexdigest(), dataset_key or frame_fingerprint(df), figure_format)
+
+
+def _cache_get(key):
+    with _lock:
+        figures = _figures.get(key)
+        if figures is not None:
+            _figures.move_to_end(key)
+        return figures
+
+
+def _cache_put(key, figures):
+    global _figures_bytes
+    size = sum(len(f) for f in figures)
+    with _lock:
+        if key in _figures:
+            return
+        _figures[key] = figures
+        _figures_bytes += size
+        while _figures_bytes > CACHE_MAX_BYTES and len(_figures) > 1:
+            _, evicted = _figures.popitem(last=False)
+            _figures_bytes -= sum(len(f) for f in evicted)
+
+
+def cached_figures(key, build):
+    """Figures for `key` from the cache, or from build() which is then cached."""
+    figures = _cache_get(key)
+    if figures is None:
+        figures = build()
+        _cache_put(key, figures)
+    return figures
+
+
+def render_plot(code, df, figure_format="png", dataset_key=None):
+    """
+    Runs matplotlib code against `df` in the execution pool (Agg backend) and returns the
+    figures as a list of PNG or SVG bytes. Results are cached on (code hash, dataset
+    fingerprint, format), so re-displaying a chart on a Streamlit rerun does not execute anything.
+    Fingerprinting a large frame takes seconds, so callers that redraw charts of the same
+    dataset should compute frame_fingerprint(df) once and pass it as `dataset_key`.
+    """
+    def build():
+        outcome = get_pool().run(code, df, figure_format=figure_format, dataset_key=dataset_key)
+        if not outcome.ok:
+            raise RenderError(outcome.error)
+        if not outcome.figures:
+            raise RenderError("The code ran but did not draw any figure.")
+        return outcome.figures
+
+    return cached_figures(figure_key(code, df, figure_format, dataset_key), build)
+
+
+def render_plot_async(code, df, figure_format="png", dataset_key=None):
+    """Same as render_plot, but returns a Future so the caller's thread is never blocked."""
+    return _executor.submit(render_plot, code, df, figure_format, dataset_key)
+
+
+def submit(fn, *args):
+    """Runs fn(*args) on the render threads and returns the Future."""
+    return _executor.submit(fn, *args)
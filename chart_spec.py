@@ -0,0 +1,248 @@
+import io
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from chart_render import cached_figures, submit, RenderError
+from fingerprint import frame_fingerprint
+from model_router import routed_response
+from prompt_context import schema_section
+
+CHART_TYPES = ["histogram", "bar", "line", "scatter", "box", "pie"]
+AGGREGATIONS = ["mean", "sum", "count", "median", "min", "max"]
+AGG_ALIASES = {"average": "mean", "avg": "mean", "total": "sum"}
+MAX_BINS = 500
+MAX_LINE_POINTS = 2000
+MAX_SCATTER_POINTS = 20000
+HEXBIN_GRID = 60
+MAX_BARS = 40
+
+
+def _spec_prompt(df, query):
+    system_prompt = f"""
+    Given the schema of a DataFrame and a user query, describe the chart the user wants
+    as a JSON object. Do not write code, the chart is computed and drawn for you.
+
+    Schema:
+    {schema_section(df)}
+
+    JSON fields:
+    "chart": one of {", ".join(CHART_TYPES)}
+    "x": column for the x axis (for histogram and pie, the column to count or bin)
+    "y": numeric column for the y axis, or null to count rows
+    "group": column to split into series/groups, or null
+    "agg": one of {", ".join(AGGREGATIONS)} (how y is aggregated per x), default mean
+    "bins": number of bins for histograms, default 20
+    "color": matplotlib color name or null
+    "title": chart title
+
+    Use only columns present in the schema, with their exact names.
+    Respond with ONLY the JSON object.
+    """
+    return system_prompt, f"{query}"
+
+
+def generate_chart_spec(df, query):
+    """Asks the model for a declarative chart spec. Returns (raw response, spec dict)."""
+    from req_functions import _first_json_object
+
+    system_prompt, user_query = _spec_prompt(df, query)
+    response = routed_response("chart_spec", system_prompt, user_query)
+    spec = _first_json_object(response)
+    if not isinstance(spec, dict):
+        raise RenderError(f"The model did not return a chart spec: {response}")
+    return response, validate_spec(spec, df)
+
+
+def validate_spec(spec, df):
+    spec = dict(spec)
+    spec["chart"] = str(spec.get("chart", "bar")).lower()
+    if spec["chart"] not in CHART_TYPES:
+        raise RenderError(f"Unknown chart type: {spec['chart']}")
+    for field in ("x", "y", "group"):
+        col = spec.get(field)
+        if col is not None and col not in df.columns:
+            raise RenderError(f"Column '{col}' in field '{field}' does not exist.")
+    if spec.get("x") is None:
+        raise RenderError("The chart spec has no x column.")
+    agg = str(spec.get("agg") or "mean").lower()
+    spec["agg"] = AGG_ALIASES.get(agg, agg)
+    if spec["agg"] not in AGGREGATIONS:
+        raise RenderError(f"Unknown aggregation: {spec['agg']}")
+    try:
+        spec["bins"] = 20 if spec.get("bins") is None else int(spec["bins"])
+    except (TypeError, ValueError):
+        raise RenderError(f"The number of bins must be a whole number, not {spec.get('bins')!r}.") from None
+    if not 1 <= spec["bins"] <= MAX_BINS:
+        raise RenderError(f"The number of bins must be between 1 and {MAX_BINS}.")
+    chart, x, y = spec["chart"], spec["x"], spec.get("y")
+    if chart == "scatter":
+        if y is None:
+            raise RenderError("A scatter chart needs a y column.")
+        _require_numeric(df, x, "x", chart)
+        _require_numeric(df, y, "y", chart)
+    elif chart == "histogram":
+        _require_numeric(df, x, "x", chart)
+    elif chart == "box":
+        _require_numeric(df, y or x, "y" if y else "x", chart)
+    elif y is not None and spec["agg"] != "count":
+        _require_numeric(df, y, "y", f"{spec['agg']} {chart}")
+    return spec
+
+
+def _require_numeric(df, col, field, chart):
+    s = df[col]
+    if pd.api.types.is_bool_dtype(s) or not (
+            pd.api.types.is_numeric_dtype(s) or pd.api.types.is_datetime64_any_dtype(s)):
+        raise RenderError(f"A {chart} chart needs a numeric '{field}' column, '{col}' is {s.dtype}.")
+
+
+# ------------------------------
+# Aggregation (vectorised, independent of the plotting library)
+# ------------------------------
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets downsampling of a sorted series to n_out points."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+def _numeric(s):
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.astype("int64").to_numpy(dtype=np.float64)
+    return pd.to_numeric(s, errors="coerce").to_numpy(dtype=np.float64)
+
+
+def aggregate(spec, df):
+    """Turns a validated spec into the small arrays that are actually drawn."""
+    chart, x, y, group = spec["chart"], spec["x"], spec.get("y"), spec.get("group")
+
+    if chart == "histogram":
+        values = _numeric(df[x])
+        values = values[~np.isnan(values)]
+        counts, edges = np.histogram(values, bins=spec["bins"])
+        return {"counts": counts, "edges": edges}
+
+    if chart in ("bar", "pie"):
+        keys = [x] + ([group] if group and chart == "bar" else [])
+        if y is None:
+            table = df.groupby(keys, observed=True).size()
+        else:
+            table = df.groupby(keys, observed=True)[y].agg(spec["agg"])
+        if len(keys) > 1:
+            table = table.unstack(group)
+        if len(table) > MAX_BARS:
+            order = table.sum(axis=1) if table.ndim > 1 else table
+            table = table.loc[order.sort_values(ascending=False).index[:MAX_BARS]]
+        return {"table": table}
+
+    if chart == "line":
+        series = {}
+        groups = df.groupby(group, observed=True) if group else [(None, df)]
+        for name, part in groups:
+            if y is None:
+                line = part.groupby(x, observed=True).size()
+            else:
+                line = part.groupby(x, observed=True)[y].agg(spec["agg"])
+            lx, ly = _numeric(line.index.to_series()), line.to_numpy(dtype=np.float64)
+            series[name] = (line.index.to_numpy(), lx, ly)
+            if len(lx) > MAX_LINE_POINTS:
+                dx, dy = lttb(lx, ly, MAX_LINE_POINTS)
+                labels = pd.to_datetime(dx.astype("int64")) if pd.api.types.is_datetime64_any_dtype(line.index) else dx
+                series[name] = (labels, dx, dy)
+        return {"series": series}
+
+    if chart == "scatter":
+        xs, ys = _numeric(df[x]), _numeric(df[y])
+        ok = ~(np.isnan(xs) | np.isnan(ys))
+        xs, ys = xs[ok], ys[ok]
+        if len(xs) > MAX_SCATTER_POINTS:
+            counts, xedges, yedges = np.histogram2d(xs, ys, bins=HEXBIN_GRID)
+            return {"density": counts, "xedges": xedges, "yedges": yedges}
+        return {"points": (xs, ys)}
+
+    if chart == "box":
+        stats = []
+        groups = df.groupby(group, observed=True) if group else [(x, df)]
+        for name, part in groups:
+            values = _numeric(part[y or x])
+            values = values[~np.isnan(values)]
+            if not len(values):
+                continue
+            q1, med, q3 = np.percentile(values, [25, 50, 75])
+            iqr = q3 - q1
+            inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+            stats.append({"label": str(name), "med": med, "q1": q1, "q3": q3,
+                          "whislo": inside.min(), "whishi": inside.max(), "fliers": []})
+        return {"stats": stats}
+
+    raise RenderError(f"Unsupported chart type: {chart}")
+
+
+# ------------------------------
+# Drawing
+# ------------------------------
+def draw(spec, data, figure_format="png"):
+    # The Figure API does not touch pyplot's global state, so charts can be drawn on render threads.
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8, 5))
+    ax = fig.subplots()
+    chart, color = spec["chart"], spec.get("color")
+    if chart == "histogram":
+        edges = data["edges"]
+        ax.bar(edges[:-1], data["counts"], width=np.diff(edges), align="edge", color=color, edgecolor="white")
+        ax.set_ylabel("Count")
+    elif chart == "bar":
+        data["table"].plot(kind="bar", ax=ax, color=color)
+    elif chart == "pie":
+        data["table"].plot(kind="pie", ax=ax, autopct="%1.1f%%")
+        ax.set_ylabel("")
+    elif chart == "line":
+        for name, (labels, _, ys) in data["series"].items():
+            ax.plot(labels, ys, label=None if name is None else str(name), color=color if name is None else None)
+        if len(data["series"]) > 1:
+            ax.legend()
+    elif chart == "scatter" and "density" in data:
+        mesh = ax.pcolormesh(data["xedges"], data["yedges"], data["density"].T, cmap="viridis")
+        fig.colorbar(mesh, ax=ax, label="Rows")
+    elif chart == "scatter":
+        xs, ys = data["points"]
+        ax.scatter(xs, ys, s=8, alpha=0.6, color=color)
+    elif chart == "box":
+        ax.bxp(data["stats"], showfliers=False)
+    ax.set_xlabel(spec["x"] if chart != "box" else (spec.get("group") or ""))
+    if spec.get("y") and chart not in ("histogram", "pie"):
+        ax.set_ylabel(spec["y"] if chart != "bar" else f"{spec['agg']} of {spec['y']}")
+    ax.set_title(spec.get("title") or "")
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=figure_format, bbox_inches="tight")
+    return buffer.getvalue()
+
+
+def spec_hash(spec):
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def render_chart_spec(spec, df, figure_format="png", dataset_key=None):
+    """Aggregates `df` for the spec and draws it. Cached like render_plot on (spec, dataset, format)."""
+    key = ("spec:" + spec_hash(spec), dataset_key or frame_fingerprint(df), figure_format)
+    return cached_figures(key, lambda: [draw(spec, aggregate(spec, df), figure_format)])
+
+
+def render_chart_spec_async(spec, df, figure_format="png", dataset_key=None):
+    return submit(render_chart_spec, spec, df, figure_format, dataset_key)
@@ -0,0 +1,138 @@
+import os
+import re
+import traceback
+
+import numpy as np
+import pandas as pd
+
+from prompt_context import schema_section, stats_section, count_tokens
+from model_router import routed_response
+from sandbox import SAFE_BUILTINS
+
+MAX_REPAIRS = 2
+# Run generated code in the sandboxed worker pool rather than in this process.
+USE_EXEC_POOL = os.getenv("EXEC_POOL_DISABLE", "0").lower() not in ("1", "true", "yes")
+RESULT_TOKEN_LIMIT = 2000
+
+
+def extract_code(response):
+    match = re.search(r"```(?:python)?(.*?)```", response, re.DOTALL)
+    return (match.group(1) if match else response).strip()
+
+
+def _codegen_prompt(df, question):
+    system_prompt = f"""
+    You are a data analyst writing pandas code. You only see the schema of the dataset,
+    the code runs locally against the full DataFrame named `df`.
+    `pd` and `np` are already imported, do not import anything, do not read or write files.
+    Compute everything needed to answer the question and assign it to a variable named `result`
+    (a number, string, dict, list, Series or DataFrame). Keep `result` small: aggregate, filter
+    or take the top rows instead of returning the whole table.
+
+    Schema:
+    {schema_section(df)}
+
+    {stats_section(df)}
+
+    Return only python code in ```python  and ```.
+    """
+    return system_prompt, question
+
+
+def _repair_prompt(df, question, code, error):
+    system_prompt = f"""
+    The following pandas code failed. Fix it so that it answers the question and assigns
+    the answer to `result`. `df`, `pd` and `np` are available, do not import anything.
+
+    Schema:
+    {schema_section(df)}
+
+    Code:
+    ```python
+    {code}
+    ```
+
+    Error:
+    {error}
+
+    Return only the fixed python code in ```python  and ```.
+    """
+    return system_prompt, question
+
+
+def run_pandas_code(code, df):
+    """
+    Executes generated code against a copy of `df` and returns the value of `result`.
+    Builtins are restricted to a small whitelist, which keeps honest mistakes from touching
+    the file system; it is not a security boundary.
+    """
+    namespace = {"__builtins__": SAFE_BUILTINS, "df": df.copy(), "pd": pd, "np": np}
+    exec(code, namespace)
+    if "result" not in namespace:
+        raise ValueError("The code did not assign a variable named `result`.")
+    return namespace["result"]
+
+
+def format_result(result, token_limit=RESULT_TOKEN_LIMIT):
+    if isinstance(result, pd.DataFrame):
+        text = result.to_string(max_rows=50)
+    elif isinstance(result, pd.Series):
+        text = result.to_string(max_rows=50)
+    else:
+        text = str(result)
+    while count_tokens(text) > token_limit:
+        text = text[: len(text) * 3 // 4] + "\n... (truncated)"
+    return text
+
+
+def compute_answer(df, question, run=None):
+    """
+    Asks the model for pandas code from the schema only, runs it locally and repairs it
+    with the error message if it fails. Returns (code, result).
+    """
+    if run is None:
+        if USE_EXEC_POOL:
+            from exec_pool import run_in_pool as run
+        else:
+            run = run_pandas_code
+    system_prompt, user_query = _codegen_prompt(df, question)
+    code = extract_code(routed_response("code_gen", system_prompt, user_query))
+    for attempt in range(MAX_REPAIRS + 1):
+        try:
+            return code, run(code, df)
+        except Exception:
+            if attempt == MAX_REPAIRS:
+                raise
+            error = traceback.format_exc(limit=2)
+            system_prompt, user_query = _repair_prompt(df, question, code, error)
+            code = extract_code(routed_response("code_repair", system_prompt, user_query))
+
+
+def narrate(question, code, result, language="python"):
+    label = "SQL query" if language == "sql" else "pandas code"
+    system_prompt = f"""
+    You are a data analyst. The question below was answered by running this {label}
+    on the full dataset:
+    ```{language}
+    {code}
+    ```
+    Computed result:
+    {format_result(result)}
+
+    Explain the answer to the user in a professional tone, using only the computed result.
+    Do not recompute or guess numbers that are not in the result.
+
+    Output Format:
+    A. Steps taken.
+    B. Final result and conclusion.
+    """
+    return routed_response("narrate", system_prompt, question)
+
+
+def answer_with_code(df, question):
+    """Code interpreter answer: prompt size depends on the schema, never on the row count."""
+    try:
+        code, result = compute_answer(df, question)
+    except Exception as e:
+        return f"❌ Could not compute the answer locally: {e}"
+    return narrate(question, code, result)
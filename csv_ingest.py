@@ -0,0 +1,223 @@
+import os
+import sys
+import time
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+# The reader parses several blocks in parallel, so peak memory grows with the block size.
+BLOCK_MB = int(os.getenv("CSV_BLOCK_MB", "4"))
+# A string column becomes categorical when its distinct values are at most this share of its rows.
+CATEGORY_MAX_FRACTION = float(os.getenv("CSV_CATEGORY_MAX_FRACTION", "0.5"))
+# float64 -> float32 changes values like 3.57, and int8 columns wrap in arithmetic (df["Age"] * 12),
+# so both downcasts are opt-in.
+DOWNCAST_FLOATS = os.getenv("CSV_DOWNCAST_FLOATS", "") not in ("", "0", "false")
+DOWNCAST_INTS = os.getenv("CSV_DOWNCAST_INTS", "") not in ("", "0", "false")
+
+
+def _peak_rss_mb():
+    """Peak resident memory of this process in MB, or None where the resource module is missing (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB elsewhere.
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def _round_mb(mb):
+    return None if mb is None else round(mb, 1)
+
+
+def _is_string(s):
+    return pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s)
+
+
+def _shrink_chunk(chunk, categorical):
+    """Turns the chosen string columns of one chunk into categoricals and downcasts numbers when enabled."""
+    for col in chunk.columns:
+        s = chunk[col]
+        if col in categorical:
+            chunk[col] = s.astype("category")
+        elif DOWNCAST_INTS and pd.api.types.is_integer_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            chunk[col] = pd.to_numeric(s, downcast="integer")
+        elif DOWNCAST_FLOATS and pd.api.types.is_float_dtype(s):
+            chunk[col] = pd.to_numeric(s, downcast="float")
+    return chunk
+
+
+def _categorical_columns(first_chunk):
+    return {
+        col for col in first_chunk.columns
+        if isinstance(first_chunk[col].dtype, pd.CategoricalDtype)
+        or (_is_string(first_chunk[col])
+            and first_chunk[col].nunique(dropna=True) <= CATEGORY_MAX_FRACTION * max(1, len(first_chunk)))
+    }
+
+
+def optimize_dtypes(df):
+    """The same categorical conversion (and downcasting) for a frame that was read in one piece (Excel, DB)."""
+    return _shrink_chunk(df, _categorical_columns(df))
+
+
+def _open_arrow_csv(source, block_size):
+    """
+    Streaming reader whose column types match pd.read_csv: Arrow infers dates and timestamps,
+    which would reach pandas as datetime.date objects, so those columns are re-read as strings.
+    """
+    read_options = pa_csv.ReadOptions(block_size=block_size)
+    reader = pa_csv.open_csv(source, read_options=read_options)
+    temporal = {field.name: pa.string() for field in reader.schema if pa.types.is_temporal(field.type)}
+    if not temporal or not (isinstance(source, (str, os.PathLike)) or hasattr(source, "seek")):
+        return reader, temporal
+    reader.close()
+    if hasattr(source, "seek"):
+        source.seek(0)
+    convert_options = pa_csv.ConvertOptions(column_types=temporal)
+    return pa_csv.open_csv(source, read_options=read_options, convert_options=convert_options), {}
+
+
+def _arrow_chunks(source, block_size):
+    reader, temporal = _open_arrow_csv(source, block_size)
+    categorical = None
+    for batch in reader:
+        if temporal:
+            # A source that cannot be re-read: cast the parsed values back to their ISO text.
+            batch = pa.RecordBatch.from_arrays(
+                [col.cast(pa.string()) if name in temporal else col
+                 for name, col in zip(batch.schema.names, batch.columns)],
+                names=batch.schema.names)
+        if categorical is None:
+            limit = CATEGORY_MAX_FRACTION * max(1, batch.num_rows)
+            categorical = {
+                name for name, col in zip(batch.schema.names, batch.columns)
+                if pa.types.is_string(col.type) and pc.count_distinct(col).as_py() <= limit
+            }
+        # Dictionary-encoding in Arrow hands pandas categoricals directly, without a string column in between.
+        arrays = [col.dictionary_encode() if name in categorical else col
+                  for name, col in zip(batch.schema.names, batch.columns)]
+        yield pa.RecordBatch.from_arrays(arrays, names=batch.schema.names).to_pandas(split_blocks=True)
+
+
+def _pandas_chunks(source, block_size):
+    # Roughly block_size bytes per chunk for typical rows of ~100 bytes.
+    yield from pd.read_csv(source, chunksize=max(10_000, block_size // 100))
+
+
+def _read_chunks(chunks):
+    parts, categorical, n_rows = {}, None, 0
+    for chunk in chunks:
+        if categorical is None:
+            categorical = _categorical_columns(chunk)
+        chunk = _shrink_chunk(chunk, categorical)
+        n_rows += len(chunk)
+        for col in chunk.columns:
+            parts.setdefault(col, []).append(chunk[col].reset_index(drop=True))
+
+    columns = {}
+    for col in list(parts):
+        pieces = parts.pop(col)
+        if col in categorical:
+            merged = pd.Series(union_categoricals(pieces), name=col)
+            # A column that only looked repetitive in the first chunk is kept as plain strings.
+            if len(merged.cat.categories) > CATEGORY_MAX_FRACTION * max(1, n_rows):
+                merged = merged.astype(str)
+        else:
+            merged = pd.concat(pieces, ignore_index=True)
+            if DOWNCAST_INTS and pd.api.types.is_integer_dtype(merged) and not pd.api.types.is_bool_dtype(merged):
+                merged = pd.to_numeric(merged, downcast="integer")
+        columns[col] = merged
+    return pd.DataFrame(columns, copy=False)
+
+
+def read_csv_chunked(source, block_size=None):
+    """
+    Reads a CSV path or file object chunk by chunk with the pyarrow reader (pandas chunks when
+    pyarrow is missing or the streaming reader rejects a later block), storing low-cardinality
+    string columns as categoricals (and downcasting numbers when enabled) as it goes, so the full
+    object-dtype frame never exists. Returns (df, stats) where stats has rows, seconds,
+    the frame's deep memory and the process peak RSS.
+    """
+    block_size = block_size or BLOCK_MB * 1024 * 1024
+    start = time.perf_counter()
+    peak_before = _peak_rss_mb()
+    df, engine = None, "pyarrow"
+    if pa is not None:
+        try:
+            df = _read_chunks(_arrow_chunks(source, block_size))
+        except pa.ArrowInvalid:
+            # The streaming reader fixes column types from the first block; re-read with pandas if a later one disagrees.
+            if hasattr(source, "seek"):
+                source.seek(0)
+    if df is None:
+        engine = "c"
+        df = _read_chunks(_pandas_chunks(source, block_size))
+    peak_after = _peak_rss_mb()
+    stats = {
+        "engine": engine,
+        "rows": len(df),
+        "seconds": round(time.perf_counter() - start, 3),
+        "frame_mb": round(float(df.memory_usage(deep=True).sum()) / 2**20, 1),
+        "peak_rss_mb": _round_mb(peak_after),
+        "peak_rss_growth_mb": _round_mb(None if peak_after is None else peak_after - peak_before),
+        "categorical": [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)],
+    }
+    return df, stats
+
+
+def _measure(path, optimized, queue):
+    start = time.perf_counter()
+    if optimized:
+        df, _ = read_csv_chunked(path)
+    else:
+        df = pd.read_csv(path)
+    queue.put((time.perf_counter() - start, df.memory_usage(deep=True).sum() / 2**20, _peak_rss_mb()))
+
+
+def _write_sample_csv(path, n_rows):
+    """Student-like CSV for benchmarks."""
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    departments = np.array(["Economics", "Physics", "Biology", "Computer Science", "Mathematics"])
+    pd.DataFrame({
+        "Student_ID": [f"S{i}" for i in range(n_rows)],
+        "Age": rng.integers(18, 30, n_rows),
+        "Gender": rng.choice(["Male", "Female", "Other"], n_rows),
+        "Department": departments[rng.integers(0, 5, n_rows)],
+        "Year": rng.integers(1, 5, n_rows),
+        "GPA": rng.uniform(0, 4, n_rows).round(2),
+        "Credits_Completed": rng.integers(0, 160, n_rows),
+        "Scholarship": rng.choice(["Yes", "No"], n_rows),
+        "Attendance_%": rng.uniform(50, 100, n_rows).round(2),
+    }).to_csv(path, index=False)
+
+
+def _run_benchmark(n_rows=5_000_000, path="/tmp/ingest_benchmark.csv"):
+    import multiprocessing as mp
+
+    if not os.path.exists(path):
+        _write_sample_csv(path, n_rows)
+    print(f"{os.path.getsize(path) / 2**20:.0f} MB CSV, {n_rows:,} rows")
+
+    # Each reader runs in a fresh process so peak RSS is not shared between them.
+    ctx = mp.get_context("spawn")
+    for label, optimized in [("pd.read_csv", False), ("read_csv_chunked", True)]:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_measure, args=(path, optimized, queue))
+        proc.start()
+        seconds, frame_mb, peak_mb = queue.get()
+        proc.join()
+        print(f"{label:17s}: {seconds:6.2f}s  frame {frame_mb:7.1f} MB  peak RSS {peak_mb:7.1f} MB")
+
+
+if __name__ == "__main__":
+    _run_benchmark()
@@ -0,0 +1,240 @@
+import numpy as np
+import pandas as pd
+
+# A changed column is stored as a row patch when at most this share of its rows changed.
+PATCH_MAX_FRACTION = 0.2
+# Patches and row selections stacked deeper than this are stored materialized, so rebuilding
+# a column never walks a long chain of versions.
+MAX_CHAIN_DEPTH = 8
+
+
+def _depth(column):
+    return column.depth if isinstance(column, (ColumnPatch, RowSelection)) else 0
+
+
+def _materialize(column):
+    return column.materialize() if isinstance(column, (ColumnPatch, RowSelection)) else column
+
+
+class ColumnPatch:
+    """New values for a few rows of a parent column, by row position."""
+
+    def __init__(self, base, positions, values):
+        self.base = base
+        self.positions = positions
+        self.values = values
+        self.depth = _depth(base) + 1
+
+    def materialize(self):
+        column = _materialize(self.base).copy()
+        column.iloc[self.positions] = self.values
+        return column
+
+
+class RowSelection:
+    """
+    The rows of a parent column at `positions`, for versions that filtered, sorted or
+    deduplicated rows. All columns of a version share one positions array.
+    """
+
+    def __init__(self, base, positions, index):
+        self.base = base
+        self.positions = positions
+        self.index = index
+        self.depth = _depth(base) + 1
+
+    def materialize(self):
+        column = _materialize(self.base).take(self.positions)
+        column.index = self.index
+        return column
+
+
+class DatasetVersion:
+    def __init__(self, columns, index, description, parent=None, changed=()):
+        # columns: name -> pd.Series, ColumnPatch or RowSelection. Unchanged columns are the parent's objects.
+        self.columns = columns
+        self.index = index
+        self.description = description
+        self.parent = parent
+        self.changed = list(changed)
+
+    def column(self, name):
+        return _materialize(self.columns[name])
+
+    def to_frame(self):
+        # No copy: the frame shares the stored columns, so it must not be modified in place.
+        return pd.DataFrame({name: self.column(name) for name in self.columns}, index=self.index, copy=False)
+
+
+def _row_positions(old_index, new_index):
+    """Positions in `old_index` of each label of `new_index`, or None unless every label is found once."""
+    if not (old_index.is_unique and new_index.is_unique):
+        return None
+    positions = old_index.get_indexer(new_index)
+    return positions if (positions >= 0).all() else None
+
+
+def editable_frame(df):
+    """
+    `df` with categorical columns turned back into plain values, so update code can assign
+    values that are not existing categories (df.loc[0, "Department"] = "Law").
+    """
+    categorical = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+    if not categorical:
+        return df
+    return df.astype({c: df[c].cat.categories.dtype for c in categorical})
+
+
+def restore_categoricals(updated, original):
+    """
+    Re-encodes the string columns that were categorical in `original` with its categories
+    (plus any new values at the end), so unchanged columns compare equal to the original.
+    """
+    for col in original.columns:
+        if col not in updated.columns or not isinstance(original[col].dtype, pd.CategoricalDtype):
+            continue
+        values = updated[col]
+        if not (pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)):
+            continue
+        categories = original[col].cat.categories
+        new = pd.Index(values.dropna().unique()).difference(categories)
+        updated[col] = pd.Categorical(values, categories=categories.append(new) if len(new) else categories)
+    return updated
+
+
+def _same(a, b):
+    return a is b or (a.dtype == b.dtype and a.equals(b))
+
+
+def _changed_mask(old, new):
+    """Rows where two aligned columns differ, treating NaN as equal to NaN."""
+    if old.dtype != new.dtype:
+        # Categoricals with different categories cannot be compared directly.
+        old, new = old.astype(object), new.astype(object)
+    return ~((old == new) | (old.isna() & new.isna())).to_numpy()
+
+
+class DatasetStore:
+    """
+    Version history of a dataset for update_data. Each update records only what changed:
+    new or rewritten columns in full, lightly edited columns as row patches, and every
+    untouched column by reference to the previous version's object (through a shared row
+    selection when the update filtered, sorted or deduplicated rows), so history costs
+    memory proportional to the edits, not to the table. Supports undo/redo and diffs.
+    current() shares memory with the history, so callers must not modify it in place.
+    """
+
+    def __init__(self, df, description="Loaded dataset"):
+        columns = {name: df[name] for name in df.columns}
+        self.versions = [DatasetVersion(columns, df.index, description, changed=list(df.columns))]
+        self.position = 0
+        self._frame = df
+
+    @property
+    def version(self):
+        return self.versions[self.position]
+
+    def current(self):
+        if self._frame is None:
+            self._frame = self.version.to_frame()
+        return self._frame
+
+    def apply(self, new_df, description):
+        """Records `new_df` as the next version and drops any redo history."""
+        base = self.version
+        base_frame = self.current()
+        same_rows = new_df.index.equals(base.index)
+        # A filtered, sorted or deduplicated frame keeps referring to the parent's rows.
+        positions = None if same_rows else _row_positions(base.index, new_df.index)
+        columns, changed = {}, []
+        for name in new_df.columns:
+            new_col = new_df[name]
+            if name not in base.columns or (not same_rows and positions is None):
+                columns[name] = new_col
+                changed.append(name)
+                continue
+            old_ref, old_col = base.columns[name], base_frame[name]
+            if positions is not None:
+                old_ref = RowSelection(old_ref, positions, new_df.index)
+                old_col = old_col.take(positions)
+                old_col.index = new_df.index
+            if _same(old_col, new_col):
+                # Past MAX_CHAIN_DEPTH the values are stored again instead of adding another layer.
+                columns[name] = old_ref if _depth(old_ref) <= MAX_CHAIN_DEPTH else new_col
+                continue
+            changed.append(name)
+            if old_col.dtype == new_col.dtype and _depth(old_ref) < MAX_CHAIN_DEPTH:
+                rows = np.flatnonzero(_changed_mask(old_col, new_col))
+                if len(rows) <= PATCH_MAX_FRACTION * len(new_col):
+                    columns[name] = ColumnPatch(old_ref, rows, new_col.iloc[rows].to_numpy())
+                    continue
+            columns[name] = new_col
+        changed += [name for name in base.columns if name not in new_df.columns]
+
+        del self.versions[self.position + 1:]
+        self.versions.append(DatasetVersion(columns, new_df.index, description, parent=base, changed=changed))
+        self.position += 1
+        # Rebuilt from the stored columns, so new_df's copies of unchanged columns can be freed.
+        self._frame = None
+        return changed
+
+    def can_undo(self):
+        return self.position > 0
+
+    def can_redo(self):
+        return self.position < len(self.versions) - 1
+
+    def undo(self):
+        if self.can_undo():
+            self.position -= 1
+            self._frame = None
+        return self.current()
+
+    def redo(self):
+        if self.can_redo():
+            self.position += 1
+            self._frame = None
+        return self.current()
+
+    def history(self):
+        return [
+            {"version": i, "description": v.description, "changed": v.changed, "rows": len(v.index),
+             "current": i == self.position}
+            for i, v in enumerate(self.versions)
+        ]
+
+    def diff(self, a, b):
+        """
+        Columns added, removed and changed between versions a and b, with changed-row counts
+        over the rows both versions have, and how many rows were removed and added.
+        """
+        va, vb = self.versions[a], self.versions[b]
+        added = [c for c in vb.columns if c not in va.columns]
+        removed = [c for c in va.columns if c not in vb.columns]
+        changed = {}
+        same_rows = va.index.equals(vb.index)
+        if same_rows:
+            old_rows = new_rows = slice(None)
+            rows_removed = rows_added = 0
+        elif va.index.is_unique and vb.index.is_unique:
+            positions = va.index.get_indexer(vb.index)
+            new_rows = np.flatnonzero(positions >= 0)
+            old_rows = positions[new_rows]
+            rows_removed, rows_added = len(va.index) - len(new_rows), len(vb.index) - len(new_rows)
+        else:
+            old_rows = new_rows = None
+            rows_removed, rows_added = len(va.index), len(vb.index)
+        for name in vb.columns:
+            if name not in va.columns or va.columns[name] is vb.columns[name]:
+                continue
+            if old_rows is None:
+                changed[name] = None
+                continue
+            old_col = va.column(name).iloc[old_rows].reset_index(drop=True)
+            new_col = vb.column(name).iloc[new_rows].reset_index(drop=True)
+            if not _same(old_col, new_col):
+                n_changed = int(_changed_mask(old_col, new_col).sum())
+                if n_changed:
+                    changed[name] = n_changed
+        return {"added": added, "removed": removed, "changed": changed,
+                "rows": (len(va.index), len(vb.index)), "rows_removed": rows_removed, "rows_added": rows_added}
@@ -0,0 +1,445 @@
+"""
+Out-of-core query engine: a large CSV/Parquet file is registered as a DuckDB view and
+every computation is pushed into SQL, so only aggregates and small results reach pandas.
+DuckDB streams the file and spills to DUCKDB_TEMP_DIR, which keeps memory bounded by
+DUCKDB_MEMORY_LIMIT rather than by the size of the data.
+"""
+import os
+import re
+import time
+import threading
+import traceback
+
+import numpy as np
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Errors a query on a valid engine can raise (a type mismatch in a filter, a failed cast).
+SQL_ERRORS = (duckdb.Error,) if duckdb is not None else ()
+
+# Paths opened by DuckEngine must lie under this directory; relative paths are resolved inside it.
+DATA_DIR = os.getenv("DUCKDB_DATA_DIR", "data")
+MEMORY_LIMIT = os.getenv("DUCKDB_MEMORY_LIMIT", "")
+TEMP_DIR = os.getenv("DUCKDB_TEMP_DIR", ".duckdb_tmp")
+THREADS = os.getenv("DUCKDB_THREADS", "")
+# CSVs are converted once to Parquet next to the Arrow sidecars, so later scans read only the needed columns.
+CSV_TO_PARQUET = os.getenv("DUCKDB_CSV_TO_PARQUET", "1").lower() not in ("0", "false", "no")
+# The Parquet copies are the size of the files people open here, so they do not share SIDECAR_MAX_MB,
+# where one copy would evict every sidecar and then be evicted itself by the next one.
+PARQUET_MAX_MB = int(os.getenv("DUCKDB_PARQUET_MAX_MB", "20480"))
+SAMPLE_ROWS = int(os.getenv("DUCKDB_SAMPLE_ROWS", "5000"))
+MAX_CHART_ROWS = 1_000_000
+MAX_RESULT_ROWS = 1000
+MAX_LISTED_VALUES = 1000
+MAX_CORR_COLUMNS = 30
+MAX_REPAIRS = 2
+VIEW = "data"
+
+NUMERIC_TYPE = re.compile(r"^(TINYINT|SMALLINT|INTEGER|BIGINT|HUGEINT|UTINYINT|USMALLINT|UINTEGER|UBIGINT|FLOAT|DOUBLE|DECIMAL)")
+SQL_AGG = {"mean": "avg", "sum": "sum", "count": "count", "median": "median", "min": "min", "max": "max"}
+
+
+def duckdb_available():
+    return duckdb is not None
+
+
+def quote_ident(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _quote_literal(text):
+    return "'" + str(text).replace("'", "''") + "'"
+
+
+def resolve_data_path(path, data_dir=None):
+    """
+    Absolute form of `path` (a file or a glob) if it lies inside DATA_DIR, else PermissionError.
+    The path comes from the browser, so it must not reach the rest of the server's file system.
+    """
+    root = os.path.realpath(data_dir or DATA_DIR)
+    resolved = os.path.realpath(os.path.join(root, os.path.expanduser(path)))
+    if not resolved.startswith(root + os.sep):
+        raise PermissionError(f"Only files inside the data directory ({root}) can be opened.")
+    return resolved
+
+
+def is_engine(obj):
+    return isinstance(obj, DuckEngine)
+
+
+class DuckEngine:
+    """
+    One dataset queried through DuckDB. `source` is a path (CSV, Parquet, a glob of either,
+    or an Arrow sidecar) or an in-memory DataFrame/Arrow table. The analysis helpers mirror
+    the pandas handlers in req_functions and return results in the same shapes.
+    """
+
+    def __init__(self, source, database=":memory:"):
+        if duckdb is None:
+            raise ImportError("duckdb is not installed (pip install duckdb).")
+        self.con = duckdb.connect(database)
+        if MEMORY_LIMIT:
+            self.con.execute(f"SET memory_limit = {_quote_literal(MEMORY_LIMIT)}")
+        if THREADS:
+            self.con.execute(f"SET threads = {int(THREADS)}")
+        os.makedirs(TEMP_DIR, exist_ok=True)
+        self.con.execute(f"SET temp_directory = {_quote_literal(TEMP_DIR)}")
+        # One connection, serialised: DuckDB already parallelises each query internally.
+        self._lock = threading.Lock()
+        self._cache = {}
+        self.source = source
+        self.key, scanned = self._register(source)
+        # From here on SQL, including generated SELECTs, can read only the registered file
+        # (read_text, read_csv or ATTACH on other paths fail), and cannot undo that.
+        if scanned and re.search(r"[*?\[]", scanned):
+            # A glob reads several files, so its directory (up to the first wildcard) is allowed.
+            directory = os.path.dirname(re.split(r"[*?\[]", scanned, 1)[0])
+            self.con.execute(f"SET allowed_directories = [{_quote_literal(directory + os.sep)}]")
+        elif scanned:
+            self.con.execute(f"SET allowed_paths = [{_quote_literal(scanned)}]")
+        self.con.execute("SET enable_external_access = false")
+        self.con.execute("SET lock_configuration = true")
+
+    # ------------------------------
+    # Registration
+    # ------------------------------
+    def _register(self, source):
+        """Creates the view. Returns (cache key, path or glob the view scans, or None)."""
+        from sidecar import source_key, open_sidecar, mark_used, prune_sidecars, SIDECAR_DIR
+
+        if not isinstance(source, str):
+            self.con.register("source_frame", source)
+            self.con.execute(f"CREATE VIEW {VIEW} AS SELECT * FROM source_frame")
+            return source_key("frame", id(source)), None
+
+        path = resolve_data_path(source)
+        lower = path.lower()
+        stat = os.stat(path) if os.path.exists(path) else None
+        key = source_key("file", os.path.abspath(path), stat and stat.st_size, stat and stat.st_mtime)
+        if lower.endswith(".arrow"):
+            table = open_sidecar(os.path.basename(path)[:-len(".arrow")], os.path.dirname(path))
+            self.con.register("source_frame", table)
+            self.con.execute(f"CREATE VIEW {VIEW} AS SELECT * FROM source_frame")
+            return key, None
+        if lower.endswith(".parquet"):
+            self.con.execute(f"CREATE VIEW {VIEW} AS SELECT * FROM read_parquet({_quote_literal(path)})")
+            return key, path
+
+        scan, scanned = f"read_csv_auto({_quote_literal(path)})", path
+        if CSV_TO_PARQUET and stat is not None:
+            parquet_path = os.path.abspath(os.path.join(SIDECAR_DIR, f"{key}.parquet"))
+            if not os.path.exists(parquet_path):
+                os.makedirs(SIDECAR_DIR, exist_ok=True)
+                tmp_path = f"{parquet_path}.{os.getpid()}.tmp"
+                self.con.execute(f"COPY (SELECT * FROM {scan}) TO {_quote_literal(tmp_path)} (FORMAT parquet)")
+                os.replace(tmp_path, parquet_path)
+                prune_sidecars(PARQUET_MAX_MB * 2**20, keep=[parquet_path], suffixes=(".parquet",))
+            mark_used(parquet_path)
+            scan, scanned = f"read_parquet({_quote_literal(parquet_path)})", parquet_path
+        self.con.execute(f"CREATE VIEW {VIEW} AS SELECT * FROM {scan}")
+        return key, scanned
+
+    # ------------------------------
+    # Basic queries
+    # ------------------------------
+    def sql(self, query, params=None):
+        with self._lock:
+            return self.con.execute(query, params or []).df()
+
+    def _cached(self, name, compute):
+        if name not in self._cache:
+            self._cache[name] = compute()
+        return self._cache[name]
+
+    def dtypes(self):
+        """Column name -> DuckDB type, in table order."""
+        def compute():
+            described = self.sql(f"DESCRIBE {VIEW}")
+            return dict(zip(described["column_name"], described["column_type"]))
+        return self._cached("dtypes", compute)
+
+    @property
+    def columns(self):
+        return list(self.dtypes())
+
+    def numeric_columns(self):
+        return [c for c, t in self.dtypes().items() if NUMERIC_TYPE.match(t)]
+
+    def row_count(self):
+        return self._cached("rows", lambda: int(self.sql(f"SELECT count(*) AS n FROM {VIEW}")["n"].iloc[0]))
+
+    def sample(self, n=SAMPLE_ROWS):
+        """A reproducible reservoir sample, small enough for pandas-only helpers and previews."""
+        return self._cached(("sample", n), lambda: self.sql(
+            f"SELECT * FROM {VIEW} USING SAMPLE reservoir({int(n)} ROWS) REPEATABLE (42)"))
+
+    def distinct_values(self, max_unique=MAX_LISTED_VALUES):
+        """Every value of the low-cardinality string columns, for matching names in questions."""
+        def compute():
+            strings = [c for c, t in self.dtypes().items() if t in ("VARCHAR", "BOOLEAN") or t.startswith("ENUM")]
+            if not strings:
+                return {}
+            counts = self.sql("SELECT " + ", ".join(
+                f"approx_count_distinct({quote_ident(c)}) AS {quote_ident(c)}" for c in strings) + f" FROM {VIEW}")
+            values = {}
+            for col in strings:
+                if counts[col].iloc[0] <= max_unique:
+                    rows = self.sql(f"SELECT DISTINCT {quote_ident(col)} AS v FROM {VIEW} WHERE {quote_ident(col)} IS NOT NULL")
+                    values[col] = rows["v"].tolist()
+            return values
+        return self._cached("distinct", compute)
+
+    # ------------------------------
+    # Profiling (same keys as profile_cache.get_profile)
+    # ------------------------------
+    def profile(self):
+        return self._cached("profile", self._compute_profile)
+
+    def _compute_profile(self):
+        numeric = self.numeric_columns()
+        parts = ["count(*) AS __rows"]
+        for i, c in enumerate(self.columns):
+            parts.append(f"count({quote_ident(c)}) AS n{i}")
+        for i, c in enumerate(numeric):
+            q = quote_ident(c)
+            parts += [f"avg({q}) AS mean{i}", f"stddev_samp({q}) AS std{i}", f"min({q}) AS min{i}",
+                      f"max({q}) AS max{i}", f"approx_quantile({q}, [0.25, 0.5, 0.75]) AS q{i}"]
+        corr_cols = numeric[:MAX_CORR_COLUMNS]
+        pairs = [(a, b) for i, a in enumerate(corr_cols) for b in corr_cols[i + 1:]]
+        for j, (a, b) in enumerate(pairs):
+            parts.append(f"corr({quote_ident(a)}, {quote_ident(b)}) AS c{j}")
+        row = self.sql("SELECT " + ", ".join(parts) + f" FROM {VIEW}").iloc[0]
+
+        rows = int(row["__rows"])
+        non_null = {c: int(row[f"n{i}"]) for i, c in enumerate(self.columns)}
+        describe = pd.DataFrame({
+            c: [non_null[c], row[f"mean{i}"], row[f"std{i}"], row[f"min{i}"], *list(row[f"q{i}"]), row[f"max{i}"]]
+            for i, c in enumerate(numeric)
+        }, index=["count", "mean", "std", "min", "25%", "50%", "75%", "max"], dtype=float)
+        corr = pd.DataFrame(np.eye(len(corr_cols)), index=corr_cols, columns=corr_cols)
+        for j, (a, b) in enumerate(pairs):
+            corr.loc[a, b] = corr.loc[b, a] = row[f"c{j}"]
+        return {
+            "describe": describe,
+            "corr": corr,
+            "numeric_summary": describe.to_string(),
+            "correlation": corr.to_string(),
+            "nulls": pd.Series({c: rows - n for c, n in non_null.items()}),
+            "dtypes": pd.Series(self.dtypes()),
+        }
+
+    def schema_section(self):
+        profile = self.profile()
+        lines = [f"Table `{VIEW}`: {self.row_count()} rows, {len(self.columns)} columns",
+                 "Columns (name: type, nulls):"]
+        lines += [f"- {c}: {t}, nulls={int(profile['nulls'][c])}" for c, t in self.dtypes().items()]
+        return "\n".join(lines)
+
+    # ------------------------------
+    # Backend commands (same results as req_functions)
+    # ------------------------------
+    def list_col_names(self, col_names):
+        result = {}
+        for col in col_names:
+            try:
+                counts = self.sql(
+                    f"SELECT {quote_ident(col)} AS v, count(*) AS n FROM {VIEW} WHERE {quote_ident(col)} IS NOT NULL "
+                    f"GROUP BY 1 ORDER BY 2 DESC LIMIT {MAX_LISTED_VALUES}")
+                result[col] = dict(zip(counts["v"], counts["n"].astype(int)))
+            except Exception as e:
+                result[col] = f"Error: {e}"
+        return result
+
+    def is_primary_key(self, col_names):
+        result = {}
+        for col in col_names:
+            q = quote_ident(col)
+            row = self.sql(f"SELECT count(*) - count({q}) AS nulls, count(DISTINCT {q}) AS uniq, count(*) AS n FROM {VIEW}").iloc[0]
+            if row["nulls"] > 0:
+                result[col] = "❌ Contains nulls"
+            elif row["uniq"] == row["n"]:
+                result[col] = "✅ Likely Primary Key"
+            else:
+                result[col] = "❌ Not unique"
+        return result
+
+    def is_dependent(self, col_names):
+        result = {}
+        for col in col_names:
+            dep_cols = []
+            for other_col in self.columns:
+                if other_col == col:
+                    continue
+                # `col` depends on `other_col` when no value of other_col maps to two values of col.
+                row = self.sql(
+                    f"SELECT coalesce(max(n), 0) AS m FROM (SELECT count(DISTINCT {quote_ident(col)}) AS n FROM {VIEW} "
+                    f"WHERE {quote_ident(other_col)} IS NOT NULL GROUP BY {quote_ident(other_col)})")
+                if row["m"].iloc[0] <= 1:
+                    dep_cols.append(other_col)
+            result[col] = dep_cols if dep_cols else None
+        return result
+
+    # ------------------------------
+    # Planner and charts
+    # ------------------------------
+    def run_plan(self, plan):
+        """Executes a query_planner Plan in SQL and returns what Plan.execute would return."""
+        query, params = plan.to_sql(VIEW)
+        result = self.sql(query, params)
+        if plan.kind == "rank":
+            return result
+        if plan.group:
+            return result.set_index(plan.group).iloc[:, 0]
+        value = result.iloc[0, 0]
+        return int(value) if plan.kind == "count" else value
+
+    def chart_data(self, spec):
+        """The arrays chart_spec.draw expects, aggregated in SQL (histogram, bar, pie, line) or from a sample."""
+        from chart_spec import aggregate
+
+        chart, x, y, group = spec["chart"], spec["x"], spec.get("y"), spec.get("group")
+        if chart == "histogram":
+            qx = quote_ident(x)
+            lo, hi = self.sql(f"SELECT min({qx})::DOUBLE AS lo, max({qx})::DOUBLE AS hi FROM {VIEW}").iloc[0]
+            bins = spec["bins"]
+            if pd.isna(lo):
+                return {"counts": np.zeros(bins, dtype=np.int64), "edges": np.linspace(0, 1, bins + 1)}
+            width = (hi - lo) / bins or 1.0
+            counts = self.sql(
+                f"SELECT least(floor(({qx} - ?) / ?)::BIGINT, ?) AS b, count(*) AS n FROM {VIEW} "
+                f"WHERE {qx} IS NOT NULL GROUP BY 1", [lo, width, bins - 1])
+            hist = np.zeros(bins, dtype=np.int64)
+            hist[counts["b"].to_numpy(dtype=np.int64)] = counts["n"].to_numpy()
+            return {"counts": hist, "edges": lo + width * np.arange(bins + 1)}
+
+        if chart in ("bar", "pie", "line"):
+            keys = [x] + ([group] if group and chart != "pie" else [])
+            value = "count(*)" if y is None else f"{SQL_AGG[spec['agg']]}({quote_ident(y)})"
+            key_sql = ", ".join(quote_ident(k) for k in keys)
+            grouped = self.sql(f"SELECT {key_sql}, {value} AS __value FROM {VIEW} GROUP BY {key_sql}")
+            # One row per key, so summing again in aggregate() leaves the SQL values unchanged.
+            return aggregate(dict(spec, y="__value", agg="sum"), grouped)
+
+        columns = ", ".join(quote_ident(c) for c in dict.fromkeys(c for c in (x, y, group) if c))
+        sample = f" USING SAMPLE reservoir({MAX_CHART_ROWS} ROWS) REPEATABLE (42)" if self.row_count() > MAX_CHART_ROWS else ""
+        return aggregate(spec, self.sql(f"SELECT {columns} FROM {VIEW}{sample}"))
+
+    def render_chart(self, spec, figure_format="png"):
+        from chart_render import cached_figures
+        from chart_spec import draw, spec_hash
+
+        key = ("spec:" + spec_hash(spec), self.key, figure_format)
+        return cached_figures(key, lambda: [draw(spec, self.chart_data(spec), figure_format)])
+
+    def render_chart_async(self, spec, figure_format="png"):
+        from chart_render import submit
+
+        return submit(self.render_chart, spec, figure_format)
+
+    # ------------------------------
+    # SQL code interpreter
+    # ------------------------------
+    def _sql_prompt(self, question):
+        system_prompt = f"""
+    You are a data analyst writing DuckDB SQL. You only see the schema and summary of the table,
+    the query runs against the full table named `{VIEW}`.
+    Write a single SELECT statement (CTEs allowed) that computes everything needed to answer the question.
+    Keep the result small: aggregate, filter or use LIMIT instead of returning the whole table.
+    Quote column names with double quotes.
+
+    {self.schema_section()}
+
+    Numeric summary:
+    {self.profile()["numeric_summary"]}
+
+    Return only the SQL in ```sql  and ```.
+    """
+        return system_prompt, question
+
+    def _sql_repair_prompt(self, question, query, error):
+        system_prompt = f"""
+    The following DuckDB SQL failed. Fix it so that it answers the question. The table is `{VIEW}`.
+
+    {self.schema_section()}
+
+    SQL:
+    ```sql
+    {query}
+    ```
+
+    Error:
+    {error}
+
+    Return only the fixed SQL in ```sql  and ```.
+    """
+        return system_prompt, question
+
+    def run_select(self, query):
+        """Runs one generated SELECT with its result capped at MAX_RESULT_ROWS rows."""
+        query = query.strip().rstrip(";").strip()
+        if not re.match(r"(?is)^(select|with)\b", query) or ";" in query:
+            raise ValueError("Only a single SELECT statement can be run.")
+        return self.sql(f"SELECT * FROM ({query}) AS result LIMIT {MAX_RESULT_ROWS}")
+
+    def compute_answer(self, question):
+        """Like code_interpreter.compute_answer, with SQL run inside DuckDB. Returns (query, result)."""
+        from code_interpreter import extract_code
+        from model_router import routed_response
+
+        system_prompt, user_query = self._sql_prompt(question)
+        query = extract_code(routed_response("code_gen", system_prompt, user_query))
+        for attempt in range(MAX_REPAIRS + 1):
+            try:
+                return query, self.run_select(query)
+            except Exception:
+                if attempt == MAX_REPAIRS:
+                    raise
+                error = traceback.format_exc(limit=2)
+                system_prompt, user_query = self._sql_repair_prompt(question, query, error)
+                query = extract_code(routed_response("code_repair", system_prompt, user_query))
+
+    def answer(self, question):
+        from code_interpreter import narrate
+
+        try:
+            query, result = self.compute_answer(question)
+        except Exception as e:
+            return f"❌ Could not compute the answer in DuckDB: {e}"
+        return narrate(question, query, result, language="sql")
+
+
+def _run_benchmark(n_rows=5_000_000, path="/tmp/ingest_benchmark.csv"):
+    global DATA_DIR
+    import tempfile
+    import sidecar
+    from csv_ingest import _write_sample_csv
+
+    if not os.path.exists(path):
+        _write_sample_csv(path, n_rows)
+    sidecar.SIDECAR_DIR = tempfile.mkdtemp()
+    DATA_DIR = os.path.dirname(path)
+    print(f"{os.path.getsize(path) / 2**20:.0f} MB CSV")
+
+    def timed(label, fn):
+        start = time.perf_counter()
+        result = fn()
+        print(f"{label:34s}: {time.perf_counter() - start:.3f}s")
+        return result
+
+    engine = timed("register (CSV -> Parquet once)", lambda: DuckEngine(path))
+    timed("row count", engine.row_count)
+    timed("profile", engine.profile)
+    timed("is_primary_key(Student_ID)", lambda: engine.is_primary_key(["Student_ID"]))
+    timed("list_col_names(Department)", lambda: engine.list_col_names(["Department"]))
+    timed("average GPA by Department", lambda: engine.sql(
+        f'SELECT "Department", avg("GPA") FROM {VIEW} GROUP BY 1'))
+    spec = {"chart": "histogram", "x": "GPA", "bins": 20, "agg": "mean"}
+    timed("histogram data", lambda: engine.chart_data(spec))
+
+
+if __name__ == "__main__":
+    _run_benchmark()
@@ -0,0 +1,72 @@
+import os
+import time
+from io import BytesIO
+
+import pandas as pd
+
+from csv_ingest import optimize_dtypes
+
+try:
+    import python_calamine  # noqa: F401
+    _CALAMINE = True
+except ImportError:
+    _CALAMINE = False
+
+# calamine (Rust) reads .xlsx many times faster than openpyxl; pandas supports it from 2.2.
+EXCEL_ENGINE = os.getenv("EXCEL_ENGINE") or ("calamine" if _CALAMINE else "openpyxl")
+
+
+def list_sheets(data, engine=None):
+    """Sheet names of a workbook. Only the workbook index is read, no cells are parsed."""
+    with pd.ExcelFile(BytesIO(data), engine=engine or EXCEL_ENGINE) as workbook:
+        return workbook.sheet_names
+
+
+def read_sheet(data, sheet=0, engine=None):
+    """
+    Parses one sheet (by name or position) with the fast engine and applies the same dtype
+    optimisation as CSV ingestion. Returns (df, stats).
+    """
+    engine = engine or EXCEL_ENGINE
+    start = time.perf_counter()
+    df = pd.read_excel(BytesIO(data), sheet_name=sheet, engine=engine)
+    df = optimize_dtypes(df)
+    stats = {"engine": engine, "sheet": sheet, "rows": len(df), "seconds": round(time.perf_counter() - start, 3)}
+    return df, stats
+
+
+def _write_sample_workbook(path, n_rows, n_sheets=3):
+    from csv_ingest import _write_sample_csv
+
+    csv_path = path + ".csv"
+    _write_sample_csv(csv_path, n_rows)
+    frame = pd.read_csv(csv_path)
+    os.unlink(csv_path)
+    with pd.ExcelWriter(path) as writer:
+        for i in range(n_sheets):
+            frame.to_excel(writer, sheet_name=f"Sheet{i + 1}", index=False)
+
+
+def _run_benchmark(n_rows=200_000, path="/tmp/ingest_benchmark.xlsx"):
+    if not os.path.exists(path):
+        _write_sample_workbook(path, n_rows)
+    with open(path, "rb") as f:
+        data = f.read()
+    print(f"{len(data) / 2**20:.0f} MB workbook")
+
+    engines = (["calamine"] if _CALAMINE else []) + ["openpyxl"]
+    for engine in engines:
+        try:
+            start = time.perf_counter()
+            sheets = list_sheets(data, engine)
+            listed = time.perf_counter() - start
+            _, stats = read_sheet(data, sheets[-1], engine)
+        except ImportError as e:
+            print(f"{engine:9s}: not installed ({e})")
+            continue
+        print(f"{engine:9s}: list {len(sheets)} sheets {listed:.3f}s, "
+              f"read '{stats['sheet']}' ({stats['rows']:,} rows) {stats['seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    _run_benchmark()
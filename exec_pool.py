@@ -0,0 +1,298 @@
+import io
+import os
+import queue
+import threading
+import traceback
+import contextlib
+import multiprocessing as mp
+
+from fingerprint import frame_fingerprint
+from shared_frame import arrow_available, publish, attach
+from sandbox import POOL_IMPORTS, AuditGuard, check_code, make_builtins
+
+POOL_SIZE = int(os.getenv("EXEC_POOL_SIZE", "2"))
+JOB_TIMEOUT = float(os.getenv("EXEC_JOB_TIMEOUT", "30"))
+JOB_CPU_SECONDS = int(os.getenv("EXEC_JOB_CPU_SECONDS", "20"))
+WORKER_MEMORY_MB = int(os.getenv("EXEC_WORKER_MEMORY_MB", "4096"))
+PRELOAD_MODULES = ["pandas", "numpy", "matplotlib", "matplotlib.pyplot"]
+# The only environment variables a worker keeps; everything else (GROQ_API_KEY and whatever
+# else load_dotenv put there) is removed before the first job could read os.environ.
+WORKER_ENV = {"PATH", "HOME", "LANG", "LC_ALL", "LC_CTYPE", "TZ", "TMPDIR", "TEMP", "TMP",
+              "SYSTEMROOT", "MPLCONFIGDIR", "MPLBACKEND"}
+
+
+class ExecResult:
+    def __init__(self, ok, result=None, stdout="", error=None, figures=None):
+        self.ok = ok
+        self.result = result
+        self.stdout = stdout
+        self.error = error
+        self.figures = figures or []
+
+    def __repr__(self):
+        return f"ExecResult(ok={self.ok}, error={self.error!r})"
+
+
+# ------------------------------
+# Worker side
+# ------------------------------
+def _sandbox(memory_mb):
+    import socket
+    try:
+        import resource
+    except ImportError:
+        # Windows has no resource limits; jobs there are bounded by the wall-time only.
+        resource = None
+
+    kept = {k: v for k, v in os.environ.items() if k in WORKER_ENV}
+    os.environ.clear()
+    os.environ.update(kept)
+    if memory_mb and resource is not None:
+        # RLIMIT_DATA counts heap and anonymous memory but not the read-only mapping of the
+        # shared Arrow file, which RLIMIT_AS would charge in full against every worker.
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+    # A private network namespace has no interfaces at all; it needs privileges, so
+    # fall back to refusing socket creation inside the worker.
+    try:
+        os.unshare(os.CLONE_NEWNET)
+    except (AttributeError, OSError):
+        def _no_network(*args, **kwargs):
+            raise PermissionError("Network access is disabled in the execution sandbox.")
+        socket.socket = _no_network
+        socket.create_connection = _no_network
+
+
+def _set_cpu_budget(seconds):
+    try:
+        import resource
+    except ImportError:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = used + seconds
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _collect_figures(plt, figure_format="png"):
+    figures = []
+    for number in plt.get_fignums():
+        buffer = io.BytesIO()
+        plt.figure(number).savefig(buffer, format=figure_format, bbox_inches="tight")
+        figures.append(buffer.getvalue())
+    plt.close("all")
+    return figures
+
+
+def _worker_main(conn, memory_mb):
+    _sandbox(memory_mb)
+    import numpy as np
+    import pandas as pd
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    # Jobs get restricted builtins and imports, may not name underscore attributes, and run
+    # under an audit hook that refuses processes, sockets, listings and file access outside
+    # the Python installation, including through modules reached via attributes.
+    guard = AuditGuard(readable=[matplotlib.get_data_path(), matplotlib.get_cachedir(), matplotlib.get_configdir()])
+    job_builtins = make_builtins(POOL_IMPORTS)
+
+    # With copy-on-write a shallow copy per job is enough to keep jobs from seeing each
+    # other's edits, and the read-only memory-mapped columns are only copied when written to.
+    try:
+        pd.options.mode.copy_on_write = True
+    except (AttributeError, KeyError, pd.errors.OptionError):
+        pass
+
+    df = None
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        kind = message[0]
+        if kind == "stop":
+            return
+        if kind == "load":
+            df = message[1]
+            conn.send(("loaded",))
+            continue
+        if kind == "attach":
+            df = attach(message[1])
+            conn.send(("loaded",))
+            continue
+
+        _, code, cpu_seconds, figure_format = message
+        _set_cpu_budget(cpu_seconds)
+        namespace = {"__builtins__": dict(job_builtins), "df": df.copy(deep=False) if df is not None else None,
+                     "pd": pd, "np": np, "plt": plt}
+        stdout = io.StringIO()
+        try:
+            compiled = check_code(code)
+            with contextlib.redirect_stdout(stdout), guard:
+                exec(compiled, namespace)
+                figures = _collect_figures(plt, figure_format)
+            result = namespace.get("result")
+            try:
+                conn.send(("ok", result, stdout.getvalue(), figures))
+            except Exception:
+                conn.send(("ok", repr(result), stdout.getvalue(), figures))
+        except BaseException:
+            plt.close("all")
+            conn.send(("error", traceback.format_exc(limit=3), stdout.getvalue()))
+
+
+# ------------------------------
+# Parent side
+# ------------------------------
+class _Worker:
+    def __init__(self, ctx, memory_mb):
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child, memory_mb), daemon=True)
+        self.process.start()
+        child.close()
+        self.dataset = None
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+
+class ExecPool:
+    """
+    Pre-started worker processes for running generated code. Workers import pandas, numpy and
+    matplotlib once, keep the current DataFrame loaded, and run every job under a CPU and
+    memory limit with networking disabled. A job that overruns its wall-time is killed
+    together with its worker, which is replaced from the warm fork server.
+    """
+
+    def __init__(self, size=POOL_SIZE, memory_mb=WORKER_MEMORY_MB):
+        methods = mp.get_all_start_methods()
+        self._ctx = mp.get_context("forkserver" if "forkserver" in methods else "spawn")
+        if "forkserver" in methods:
+            self._ctx.set_forkserver_preload(PRELOAD_MODULES)
+        self.memory_mb = memory_mb
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._dataset = None
+        for _ in range(size):
+            self._idle.put(_Worker(self._ctx, memory_mb))
+
+    def set_dataset(self, df):
+        """
+        Makes `df` the frame that jobs submitted without their own `df` see. The pool is shared
+        between Streamlit sessions, so callers that serve a session should pass `df` to run().
+        """
+        with self._lock:
+            self._dataset = df
+
+    def _ensure_loaded(self, worker, df, dataset_key=None):
+        """
+        Loads `df` into the worker unless it already holds it. Called while the worker is
+        checked out of the pool, so no other job can swap the dataset in between.
+        `dataset_key` is df's frame_fingerprint when the caller already has it.
+        """
+        if df is None:
+            if worker.dataset is not None:
+                worker.conn.send(("load", None))
+                worker.conn.recv()
+                worker.dataset = None
+            return
+        # Workers memory-map one shared Arrow copy; the reference held by publish() keeps
+        # the file from being unlinked until the worker has mapped it.
+        shared = publish(df, dataset_key) if arrow_available() else None
+        if shared is not None:
+            try:
+                if worker.dataset != shared.key:
+                    worker.conn.send(("attach", shared.path))
+                    worker.conn.recv()
+                    worker.dataset = shared.key
+            finally:
+                shared.release()
+            return
+        key = dataset_key or frame_fingerprint(df)
+        if worker.dataset != key:
+            worker.conn.send(("load", df))
+            worker.conn.recv()
+            worker.dataset = key
+
+    def run(self, code, df=None, timeout=JOB_TIMEOUT, cpu_seconds=JOB_CPU_SECONDS, figure_format="png",
+            dataset_key=None):
+        """Runs `code` with `df` (or the frame from set_dataset) bound to `df` in a worker."""
+        if df is None:
+            with self._lock:
+                df, dataset_key = self._dataset, None
+        worker = self._idle.get()
+        try:
+            self._ensure_loaded(worker, df, dataset_key)
+            worker.conn.send(("run", code, cpu_seconds, figure_format))
+            if not worker.conn.poll(timeout):
+                worker.kill()
+                worker = _Worker(self._ctx, self.memory_mb)
+                return ExecResult(False, error=f"Execution timed out after {timeout:.0f}s.")
+            reply = worker.conn.recv()
+        except (EOFError, BrokenPipeError, ConnectionResetError):
+            # The worker died, most likely from the CPU or memory limit.
+            worker.kill()
+            worker = _Worker(self._ctx, self.memory_mb)
+            return ExecResult(False, error="Execution was stopped: CPU or memory limit exceeded.")
+        finally:
+            self._idle.put(worker)
+
+        if reply[0] == "ok":
+            _, result, stdout, figures = reply
+            return ExecResult(True, result=result, stdout=stdout, figures=figures)
+        _, error, stdout = reply
+        return ExecResult(False, stdout=stdout, error=error)
+
+    def close(self):
+        while not self._idle.empty():
+            worker = self._idle.get()
+            try:
+                worker.conn.send(("stop",))
+            except OSError:
+                pass
+            worker.kill()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ExecPool()
+    return _pool
+
+
+def run_in_pool(code, df):
+    """Runner for code_interpreter: executes in the pool and returns `result` or raises."""
+    outcome = get_pool().run(code, df)
+    if not outcome.ok:
+        raise RuntimeError(outcome.error)
+    return outcome.result
+
+
+if __name__ == "__main__":
+    import time
+    import pandas as pd
+
+    pool = ExecPool(size=1)
+    pool.set_dataset(pd.read_csv("student_data.csv"))
+    pool.run("result = 1")
+    start = time.perf_counter()
+    for _ in range(20):
+        outcome = pool.run("result = df.groupby('Department')['GPA'].mean()")
+    print(f"warm job: {(time.perf_counter() - start) / 20 * 1000:.1f} ms")
+    print(pool.run("import socket; socket.socket()").error.splitlines()[-1])
+    print(pool.run("while True: pass", timeout=2).error)
+    pool.close()
@@ -0,0 +1,92 @@
+import os
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+# Rows hashed by sample=True, in evenly spaced blocks.
+SAMPLE_ROWS = int(os.getenv("FINGERPRINT_SAMPLE_ROWS", "200000"))
+BLOCK_ROWS = 1000
+
+
+def _digest(*parts):
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else repr(part).encode())
+    return h.hexdigest()
+
+
+def _sample_positions(n_rows, sample_rows=SAMPLE_ROWS, block_rows=BLOCK_ROWS):
+    """Row positions of evenly spaced blocks, always including the first and the last block."""
+    n_blocks = max(2, sample_rows // block_rows)
+    starts = np.linspace(0, max(0, n_rows - block_rows), n_blocks).astype(np.int64)
+    positions = (starts[:, None] + np.arange(block_rows)[None, :]).ravel()
+    return np.unique(positions[positions < n_rows])
+
+
+def _rows_for_hashing(df, sample):
+    if not sample or len(df) <= SAMPLE_ROWS:
+        return df, False
+    return df.iloc[_sample_positions(len(df))], True
+
+
+def column_fingerprints(df, sample=False):
+    """
+    {column: hash} of each column's dtype and values.
+    Comparing two of these tells which columns changed between dataset versions.
+    sample=True hashes only SAMPLE_ROWS rows; see frame_fingerprint.
+    """
+    rows, _ = _rows_for_hashing(df, sample)
+    return {
+        col: _digest(str(col), str(rows[col].dtype), len(df),
+                     pd.util.hash_pandas_object(rows[col], index=False).values.tobytes())
+        for col in df.columns
+    }
+
+
+def frame_fingerprint(df, sample=False):
+    """
+    Content hash of a DataFrame: columns, dtypes, index and values.
+    Two frames with the same fingerprint hold the same data. sample=True hashes only
+    evenly spaced row blocks, so a change that falls entirely outside them goes unnoticed;
+    it is an explicit opt-in for callers that can tolerate that, never a cache key.
+    """
+    rows, sampled = _rows_for_hashing(df, sample)
+    meta = (list(map(str, df.columns)), [str(t) for t in df.dtypes], df.shape, sampled)
+    values = pd.util.hash_pandas_object(rows, index=True).values.tobytes()
+    return _digest(meta, values)
+
+
+def changed_columns(old, new):
+    """Columns added, removed or modified between two column_fingerprints results."""
+    return sorted(c for c in set(old) | set(new) if old.get(c) != new.get(c))
+
+
+def _run_benchmark(n_rows=10_000_000):
+    import time
+
+    rng = np.random.default_rng(0)
+    departments = np.array(["Economics", "Physics", "Biology", "Computer Science", "History"])
+    df = pd.DataFrame({
+        "Student_ID": np.arange(n_rows),
+        # Object string columns (names, IDs read from CSV) dominate the hashing time.
+        "Name": [f"Student_{i}" for i in range(n_rows)],
+        "Age": rng.integers(18, 30, n_rows),
+        "GPA": rng.uniform(0, 4, n_rows).round(2),
+        "Attendance_%": rng.uniform(50, 100, n_rows).round(1),
+        "Department": pd.Categorical(departments[rng.integers(0, 5, n_rows)]),
+        "Scholarship": pd.Categorical(np.where(rng.random(n_rows) < 0.3, "Yes", "No")),
+    })
+    for label, fn in [
+        ("frame, full", lambda: frame_fingerprint(df, sample=False)),
+        ("frame, sampled", lambda: frame_fingerprint(df, sample=True)),
+        ("columns, full", lambda: column_fingerprints(df, sample=False)),
+        ("columns, sampled", lambda: column_fingerprints(df, sample=True)),
+    ]:
+        start = time.perf_counter()
+        fn()
+        print(f"{label:18s}: {time.perf_counter() - start:.3f}s for {n_rows:,} rows")
+
+
+if __name__ == "__main__":
+    _run_benchmark()
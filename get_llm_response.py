@@ -1,12 +1,22 @@
 import os
+import asyncio
+import weakref
 import openai
 from dotenv import load_dotenv
-from groq import Groq
+from llm_client import get_groq_client, get_async_groq_client
+from rate_limiter import get_scheduler, estimate_tokens, used_tokens
+from llm_cache import get_cache, cache_enabled, make_key
 
 load_dotenv()
+
+ASYNC_MAX_CONCURRENCY = int(os.getenv("LLM_ASYNC_MAX_CONCURRENCY", "16"))
+# One semaphore per event loop; weak keys so closed loops from asyncio.run() are dropped.
+_semaphores = weakref.WeakKeyDictionary()
+
 def get_response_groq_text(system_prompt, user_query, model = "llama-3.3-70b-versatile", temp = 0, top_p = 1, max_new_tokens = 2048):
-    client = Groq()
-    completion = client.chat.completions.create(
+    client = get_groq_client()
+    n_tokens = estimate_tokens(system_prompt, user_query, max_new_tokens=max_new_tokens)
+    completion = get_scheduler().run(model, n_tokens, lambda: client.chat.completions.create(
         model=model,
         messages=[
             {
@@ -23,13 +33,124 @@ def get_response_groq_text(system_prompt, user_query, model = "llama-3.3-70b-ver
         top_p=top_p,
         stream=False,
         stop=None,
-    )
+    ))
     return completion.choices[0].message.content
 
+def get_response_groq_stream(system_prompt, user_query, model = "llama-3.3-70b-versatile", temp = 0, top_p = 1, max_new_tokens = 2048):
+    client = get_groq_client()
+    n_tokens = estimate_tokens(system_prompt, user_query, max_new_tokens=max_new_tokens)
+    stream = get_scheduler().run(model, n_tokens, lambda: client.chat.completions.create(
+        model=model,
+        messages=[
+            {
+                "role": "system",
+                "content": system_prompt
+            },
+            {
+                "role": "user",
+                "content": user_query
+            }
+        ],
+        temperature= temp,
+        max_completion_tokens=max_new_tokens,
+        top_p=top_p,
+        stream=True,
+        stop=None,
+    ))
+    used = None
+    for chunk in stream:
+        # The last chunk carries the usage, which frees the unused part of the reservation.
+        used = used_tokens(chunk) or used
+        token = chunk.choices[0].delta.content if chunk.choices else None
+        if token:
+            yield token
+    get_scheduler().settle(model, n_tokens, used)
+
 def get_response_open_ai(system_prompt, user_query,model = "gpt-4o-mini", temp = 0, top_p = 1, max_new_tokens = 1024):
     pass
 
-def get_response(system_prompt, user_query,model = "llama-3.3-70b-versatile", temp = 0, top_p = 1, max_new_tokens = 2048):
-    return get_response_groq_text(system_prompt, user_query, model = "llama-3.3-70b-versatile", temp = 0, top_p = 1, max_new_tokens = 2048)
+def get_response(system_prompt, user_query,model = "llama-3.3-70b-versatile", temp = 0, top_p = 1, max_new_tokens = 2048, use_cache = True):
+    # Only deterministic calls are cached, a sampled answer is not worth replaying.
+    if not (use_cache and cache_enabled() and temp == 0):
+        return get_response_groq_text(system_prompt, user_query, model = model, temp = temp, top_p = top_p, max_new_tokens = max_new_tokens)
+
+    cache = get_cache()
+    key = make_key(model, system_prompt, user_query, temp, top_p, max_new_tokens)
+    response = cache.get(key)
+    if response is None:
+        response = get_response_groq_text(system_prompt, user_query, model = model, temp = temp, top_p = top_p, max_new_tokens = max_new_tokens)
+        cache.set(key, response)
+    return response
+
+def get_response_stream(system_prompt, user_query,model = "llama-3.3-70b-versatile", temp = 0, top_p = 1, max_new_tokens = 2048, use_cache = True):
+    """
+    Same contract as get_response, but yields the answer token by token.
+    A cache hit is yielded as a single chunk, a miss is stored once the stream completes.
+    """
+    if not (use_cache and cache_enabled() and temp == 0):
+        yield from get_response_groq_stream(system_prompt, user_query, model = model, temp = temp, top_p = top_p, max_new_tokens = max_new_tokens)
+        return
+
+    cache = get_cache()
+    key = make_key(model, system_prompt, user_query, temp, top_p, max_new_tokens)
+    response = cache.get(key)
+    if response is not None:
+        yield response
+        return
+
+    tokens = []
+    for token in get_response_groq_stream(system_prompt, user_query, model = model, temp = temp, top_p = top_p, max_new_tokens = max_new_tokens):
+        tokens.append(token)
+        yield token
+    cache.set(key, "".join(tokens))
+
+async def get_response_groq_text_async(system_prompt, user_query, model = "llama-3.3-70b-versatile", temp = 0, top_p = 1, max_new_tokens = 2048):
+    client = get_async_groq_client()
+    n_tokens = estimate_tokens(system_prompt, user_query, max_new_tokens=max_new_tokens)
+    completion = await get_scheduler().run_async(model, n_tokens, lambda: client.chat.completions.create(
+        model=model,
+        messages=[
+            {
+                "role": "system",
+                "content": system_prompt
+            },
+            {
+                "role": "user",
+                "content": user_query
+            }
+        ],
+        temperature= temp,
+        max_completion_tokens=max_new_tokens,
+        top_p=top_p,
+        stream=False,
+        stop=None,
+    ))
+    return completion.choices[0].message.content
+
+def _get_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(ASYNC_MAX_CONCURRENCY)
+    return semaphore
+
+async def get_response_async(system_prompt, user_query,model = "llama-3.3-70b-versatile", temp = 0, top_p = 1, max_new_tokens = 2048, use_cache = True):
+    """
+    Async counterpart of get_response. At most LLM_ASYNC_MAX_CONCURRENCY calls are
+    in flight per event loop, the rest wait on the semaphore.
+    """
+    cacheable = use_cache and cache_enabled() and temp == 0
+    if cacheable:
+        cache = get_cache()
+        key = make_key(model, system_prompt, user_query, temp, top_p, max_new_tokens)
+        response = cache.get(key)
+        if response is not None:
+            return response
+
+    async with _get_semaphore():
+        response = await get_response_groq_text_async(system_prompt, user_query, model = model, temp = temp, top_p = top_p, max_new_tokens = max_new_tokens)
+    if cacheable:
+        cache.set(key, response)
+    return response
 
-#print(get_response("Reply as a indian person", "What is the name of capital of india"))
\ No newline at end of file
+#print(get_response("Reply as a indian person", "What is the name of capital of india"))
\ No newline at end of file
@@ -0,0 +1,158 @@
+import os
+import weakref
+import threading
+
+import httpx
+from groq import Groq, AsyncGroq
+
+DEFAULT_POOL_SIZE = int(os.getenv("GROQ_POOL_SIZE", "10"))
+DEFAULT_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "60"))
+DEFAULT_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+DEFAULT_KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", "120"))
+
+_clients = {}
+# Async clients per event loop. Weak keys, because asyncio.run() creates a new loop each time
+# and a closed loop's id() can be reused by the next one.
+_async_clients = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def _make_http_client(pool_size, timeout, connect_timeout):
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+    )
+
+
+def get_groq_client(api_key=None, base_url=None, pool_size=DEFAULT_POOL_SIZE,
+                    timeout=DEFAULT_TIMEOUT, connect_timeout=DEFAULT_CONNECT_TIMEOUT):
+    """
+    Returns a long lived Groq client for the given credentials and endpoint.
+    The client wraps one keep-alive httpx pool, so every handler in req_functions
+    reuses warm TLS connections instead of opening a new one per call.
+    httpx clients are thread safe, so Streamlit sessions can share the same instance.
+    """
+    api_key = api_key or os.getenv("GROQ_API_KEY")
+    base_url = base_url or os.getenv("GROQ_BASE_URL")
+    key = (api_key, base_url, pool_size, timeout, connect_timeout)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = Groq(
+                    api_key=api_key,
+                    base_url=base_url,
+                    # Retries are handled by rate_limiter.RequestScheduler.
+                    max_retries=0,
+                    http_client=_make_http_client(pool_size, timeout, connect_timeout),
+                )
+                _clients[key] = client
+    return client
+
+
+def get_async_groq_client(api_key=None, base_url=None, pool_size=DEFAULT_POOL_SIZE,
+                          timeout=DEFAULT_TIMEOUT, connect_timeout=DEFAULT_CONNECT_TIMEOUT):
+    """
+    Async counterpart of get_groq_client. httpx async pools are tied to the event loop
+    that created them, so one client is kept per running loop.
+    """
+    import asyncio
+
+    api_key = api_key or os.getenv("GROQ_API_KEY")
+    base_url = base_url or os.getenv("GROQ_BASE_URL")
+    loop = asyncio.get_running_loop()
+    key = (api_key, base_url, pool_size, timeout, connect_timeout)
+    with _clients_lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = clients.get(key)
+            if client is None:
+                client = AsyncGroq(
+                    api_key=api_key,
+                    base_url=base_url,
+                    # Retries are handled by rate_limiter.RequestScheduler.
+                    max_retries=0,
+                    http_client=httpx.AsyncClient(
+                        limits=httpx.Limits(
+                            max_connections=pool_size,
+                            max_keepalive_connections=pool_size,
+                            keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY,
+                        ),
+                        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+                    ),
+                )
+                clients[key] = client
+    return client
+
+
+def close_clients():
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+        _async_clients.clear()
+
+
+def _run_benchmark(n_calls=200):
+    """
+    Per call overhead of a fresh Groq() client vs the pooled one,
+    measured against a local HTTP stand-in for the chat completions endpoint.
+    """
+    import json
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    body = json.dumps({
+        "id": "bench", "object": "chat.completion", "created": 0, "model": "bench",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": "TEXT"}}],
+    }).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    messages = [{"role": "user", "content": "ping"}]
+
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        client = Groq(api_key="bench", base_url=base_url)
+        client.chat.completions.create(model="bench", messages=messages)
+        client.close()
+    fresh = (time.perf_counter() - start) / n_calls
+
+    client = get_groq_client(api_key="bench", base_url=base_url)
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        client.chat.completions.create(model="bench", messages=messages)
+    pooled = (time.perf_counter() - start) / n_calls
+
+    server.shutdown()
+    close_clients()
+    print(f"fresh client per call : {fresh * 1000:.2f} ms/call")
+    print(f"pooled client         : {pooled * 1000:.2f} ms/call")
+    print(f"speedup               : {fresh / pooled:.1f}x")
+
+
+if __name__ == "__main__":
+    _run_benchmark()
@@ -0,0 +1,107 @@
+import os
+import time
+import threading
+import contextvars
+from collections import defaultdict
+
+from get_llm_response import get_response, get_response_stream, get_response_async
+from rate_limiter import estimate_tokens
+
+LIGHT_MODEL = os.getenv("LLM_LIGHT_MODEL", "llama-3.1-8b-instant")
+HEAVY_MODEL = os.getenv("LLM_HEAVY_MODEL", "llama-3.3-70b-versatile")
+
+# task -> (model tier, max new tokens). Light tasks produce a word or a short snippet,
+# heavy tasks need real reasoning over the data.
+ROUTES = {
+    "classify": ("light", 16),
+    "column_resolution": ("light", 256),
+    "code_repair": ("light", 1024),
+    "chart_spec": ("light", 256),
+    "plot": ("heavy", 2048),
+    "ask": ("heavy", 2048),
+    "insight": ("heavy", 2048),
+    "quality": ("heavy", 2048),
+    "update": ("heavy", 2048),
+    "single_call": ("heavy", 2048),
+    "code_gen": ("heavy", 1024),
+    "narrate": ("heavy", 1024),
+}
+
+# Per-run override of the heavy model, e.g. the model picked in the Streamlit sidebar.
+# A ContextVar keeps one session's choice from leaking into another running in the same process.
+_heavy_model_override = contextvars.ContextVar("heavy_model_override", default=None)
+
+_metrics = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0})
+_metrics_lock = threading.Lock()
+
+
+def set_route(task, tier=None, max_new_tokens=None):
+    """Moves a task to another tier ("light", "heavy" or an explicit model name) or changes its token budget."""
+    current_tier, current_tokens = ROUTES.get(task, ("heavy", 2048))
+    ROUTES[task] = (tier or current_tier, max_new_tokens or current_tokens)
+
+
+def use_heavy_model(model):
+    _heavy_model_override.set(model)
+
+
+def route(task):
+    """Returns (model, max_new_tokens) for a task. LLM_ROUTE_<TASK> in the environment pins a model."""
+    tier, max_new_tokens = ROUTES.get(task, ("heavy", 2048))
+    pinned = os.getenv(f"LLM_ROUTE_{task.upper()}")
+    if pinned:
+        return pinned, max_new_tokens
+    if tier == "light":
+        return LIGHT_MODEL, max_new_tokens
+    if tier == "heavy":
+        return _heavy_model_override.get() or HEAVY_MODEL, max_new_tokens
+    return tier, max_new_tokens
+
+
+def _record(task, model, seconds, system_prompt, user_query, response):
+    with _metrics_lock:
+        m = _metrics[(task, model)]
+        m["calls"] += 1
+        m["seconds"] += seconds
+        m["prompt_tokens"] += estimate_tokens(system_prompt, user_query)
+        m["completion_tokens"] += estimate_tokens(response)
+
+
+def routed_response(task, system_prompt, user_query):
+    model, max_new_tokens = route(task)
+    start = time.perf_counter()
+    response = get_response(system_prompt, user_query, model=model, max_new_tokens=max_new_tokens)
+    _record(task, model, time.perf_counter() - start, system_prompt, user_query, response)
+    return response
+
+
+def routed_response_stream(task, system_prompt, user_query):
+    model, max_new_tokens = route(task)
+    start = time.perf_counter()
+    tokens = []
+    for token in get_response_stream(system_prompt, user_query, model=model, max_new_tokens=max_new_tokens):
+        tokens.append(token)
+        yield token
+    _record(task, model, time.perf_counter() - start, system_prompt, user_query, "".join(tokens))
+
+
+async def routed_response_async(task, system_prompt, user_query):
+    model, max_new_tokens = route(task)
+    start = time.perf_counter()
+    response = await get_response_async(system_prompt, user_query, model=model, max_new_tokens=max_new_tokens)
+    _record(task, model, time.perf_counter() - start, system_prompt, user_query, response)
+    return response
+
+
+def route_metrics():
+    """Per (task, model) call count, mean latency and estimated token usage."""
+    with _metrics_lock:
+        return {
+            f"{task}:{model}": {
+                "calls": m["calls"],
+                "avg_latency_s": round(m["seconds"] / m["calls"], 3),
+                "prompt_tokens": m["prompt_tokens"],
+                "completion_tokens": m["completion_tokens"],
+            }
+            for (task, model), m in _metrics.items()
+        }
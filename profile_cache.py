@@ -0,0 +1,54 @@
+import os
+import threading
+from collections import OrderedDict
+
+from fingerprint import frame_fingerprint
+
+MAX_PROFILES = int(os.getenv("PROFILE_CACHE_MAX", "8"))
+
+_profiles = OrderedDict()
+_lock = threading.Lock()
+
+
+def _compute_profile(df):
+    describe = df.describe()
+    corr = df.corr(numeric_only=True)
+    return {
+        "describe": describe,
+        "corr": corr,
+        "numeric_summary": describe.to_string(),
+        "correlation": corr.to_string(),
+        "nulls": df.isnull().sum(),
+        "dtypes": df.dtypes,
+    }
+
+
+def get_profile(df):
+    """
+    describe(), corr() and other reused stats for `df`, computed once per dataset version.
+    Keyed by content fingerprint, so an edited frame gets a fresh profile and the
+    least recently used profiles are dropped once more than PROFILE_CACHE_MAX datasets are loaded.
+    """
+    key = frame_fingerprint(df)
+    with _lock:
+        profile = _profiles.get(key)
+        if profile is not None:
+            _profiles.move_to_end(key)
+            return profile
+
+    profile = _compute_profile(df)
+    with _lock:
+        _profiles[key] = profile
+        _profiles.move_to_end(key)
+        while len(_profiles) > MAX_PROFILES:
+            _profiles.popitem(last=False)
+    return profile
+
+
+def invalidate(df=None):
+    """Drops the profile of `df`, or every profile when called without arguments."""
+    with _lock:
+        if df is None:
+            _profiles.clear()
+        else:
+            _profiles.pop(frame_fingerprint(df), None)
@@ -0,0 +1,223 @@
+import os
+import re
+
+import pandas as pd
+
+from profile_cache import get_profile
+from row_index import get_row_index
+
+DEFAULT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+DICT_MAX_UNIQUE = 32
+FLOAT_DECIMALS = 3
+PREVIEW_ROWS = 60
+
+try:
+    import tiktoken
+    # Llama 3 uses a tiktoken-style BPE; cl100k_base is the closest encoding that ships with tiktoken.
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+# count_tokens is only exact with tiktoken; without it it is the estimate below.
+TOKEN_COUNT_EXACT = _encoding is not None
+
+# Approximation of cl100k_base's pre-tokenizer: letter runs, 1-3 digit groups, symbol runs and
+# whitespace. Every piece is at least one token, so unlike len/4 this does not undercount the
+# digit- and separator-heavy text of compact_encode.
+_PIECE_RE = re.compile(
+    r"'(?:s|t|re|ve|m|ll|d)|[^\r\n\w]?[^\W\d_]+|\d{1,3}| ?(?:[^\s\w]|_)+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+",
+    re.IGNORECASE,
+)
+
+
+def count_tokens(text):
+    """
+    Token count of `text`: exact with tiktoken installed, otherwise an estimate from the
+    pre-tokenizer pieces, with long pieces counted as several tokens.
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return sum(1 + len(piece) // 8 for piece in _PIECE_RE.findall(text))
+
+
+def _format_values(s):
+    if pd.api.types.is_float_dtype(s):
+        rounded = s.round(FLOAT_DECIMALS)
+        return [
+            "" if pd.isna(v) else f"{v:.{FLOAT_DECIMALS}f}".rstrip("0").rstrip(".")
+            for v in rounded
+        ]
+    return ["" if pd.isna(v) else _quote(str(v)) for v in s]
+
+
+def _quote(value):
+    value = value.replace("\r", " ").replace("\n", " ")
+    if "," in value or '"' in value:
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def _common_prefix(values):
+    """Non-numeric prefix shared by every non-empty value ("Student_" of Student_0, Student_1, ...), or ""."""
+    present = [v for v in values if v]
+    if len(present) < 2:
+        return ""
+    prefix = os.path.commonprefix(present).rstrip("0123456789")
+    if prefix.startswith('"') or any(len(v) == len(prefix) for v in present):
+        return ""
+    return prefix
+
+
+def _dictionary(values):
+    """{value: code} for repeated values that take more tokens than their code, or {} for high-cardinality columns."""
+    counts = pd.Series([v for v in values if v], dtype=object).value_counts(sort=False)
+    if len(counts) > DICT_MAX_UNIQUE:
+        return {}
+    codes = {}
+    for value, n in counts.items():
+        code = str(len(codes))
+        if n > 1 and count_tokens("," + value) > count_tokens("," + code):
+            codes[value] = code
+    return codes
+
+
+def compact_encode(df):
+    """
+    Token-lean CSV of a DataFrame for prompts, one line per row so the model never has to
+    realign columns. Floats are rounded to FLOAT_DECIMALS, a prefix shared by every value of a
+    text column ("Student_") is stated once and dropped from the values, and repeated text
+    values that take several tokens ("Computer Science") are written as codes with a legend.
+    """
+    notes, columns = [], []
+    for col in df.columns:
+        s = df[col]
+        values = _format_values(s)
+        if not pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+            codes = _dictionary(values)
+            if codes:
+                values = [codes.get(v, v) for v in values]
+                notes.append(f"{col} codes: " + ", ".join(f"{c}={v}" for v, c in codes.items()))
+            else:
+                prefix = _common_prefix(values)
+                if prefix:
+                    values = [v[len(prefix):] for v in values]
+                    notes.append(f'{col}: every value starts with "{prefix}", written without it')
+        columns.append(values)
+    lines = [f"TABLE rows={len(df)} cols={len(df.columns)}, CSV, empty = null."]
+    lines += notes
+    lines.append(",".join(_quote(str(c)) for c in df.columns))
+    lines += [",".join(row) for row in zip(*columns)]
+    return "\n".join(lines)
+
+
+def compact_frame(df, max_rows=PREVIEW_ROWS):
+    """
+    Compact encoding used in place of the pandas repr in prompts: every row for small
+    frames, otherwise the first rows plus the full dictionaries of categorical columns.
+    """
+    if len(df) <= max_rows:
+        return compact_encode(df)
+    head = df.head(max_rows // 6)
+    lines = [f"(first {len(head)} of {len(df)} rows)", compact_encode(head)]
+    values = []
+    for col in df.columns:
+        s = df[col]
+        if not pd.api.types.is_numeric_dtype(s) and s.nunique(dropna=True) <= DICT_MAX_UNIQUE:
+            values.append(f"{col}: " + "|".join(map(str, s.dropna().unique())))
+    if values:
+        lines.append("All values of categorical columns:\n" + "\n".join(values))
+    return "\n".join(lines)
+
+
+def schema_section(df):
+    lines = [f"Rows: {len(df)}, Columns: {len(df.columns)}", "Columns (name: dtype, nulls, unique):"]
+    for col in df.columns:
+        s = df[col]
+        lines.append(f"- {col}: {s.dtype}, nulls={int(s.isna().sum())}, unique={int(s.nunique(dropna=True))}")
+    return "\n".join(lines)
+
+
+def stats_section(df, top_n=5):
+    describe = get_profile(df)["describe"]
+    lines = ["Column statistics:"]
+    for col in df.columns:
+        s = df[col]
+        if col in describe.columns and pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            d = describe[col]
+            lines.append(
+                f"- {col}: min={d['min']:.4g}, max={d['max']:.4g}, mean={d['mean']:.4g}, "
+                f"std={d['std']:.4g}, median={d['50%']:.4g}"
+            )
+        else:
+            top = s.value_counts(dropna=True).head(top_n)
+            values = ", ".join(f"{k} ({v})" for k, v in top.items())
+            lines.append(f"- {col}: top values: {values}")
+    return "\n".join(lines)
+
+
+def _stratified_sample(df, n, random_state=0):
+    """Sample of n rows that keeps every group of the lowest cardinality categorical column represented."""
+    if n >= len(df):
+        return df
+    if n <= 0:
+        return df.iloc[0:0]
+    categorical = [
+        c for c in df.select_dtypes(include=["object", "category", "string", "bool"]).columns
+        if 1 < df[c].nunique() <= 50
+    ]
+    if not categorical:
+        return df.sample(n=n, random_state=random_state).sort_index()
+    strata = min(categorical, key=lambda c: df[c].nunique())
+    one_per_group = df.drop_duplicates(subset=strata)
+    proportional = df.groupby(strata, observed=True).sample(frac=n / len(df), random_state=random_state)
+    sample = pd.concat([one_per_group, proportional])
+    sample = sample[~sample.index.duplicated()]
+    return sample.head(n).sort_index()
+
+
+def build_context(df, question=None, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Schema, per-column statistics and as many rows as fit in `token_budget`.
+    Rows the question points at (named values, numeric conditions) come first, ranked by
+    the row index, the rest is a stratified sample.
+    When the whole table fits, it is included as is.
+    """
+    # Rough tokens-per-row from a small slice, so huge frames are never serialised in full.
+    per_row = max(1, count_tokens(compact_encode(df.head(50))) / max(1, min(50, len(df))))
+    if per_row * len(df) <= token_budget * 1.2:
+        full = compact_encode(df)
+        if count_tokens(full) <= token_budget:
+            return f"Data (all {len(df)} rows):\n{full}"
+
+    header = schema_section(df) + "\n\n" + stats_section(df)
+    remaining = token_budget - count_tokens(header)
+    if remaining <= 0:
+        return header
+
+    mentioned = get_row_index(df).search_rows(question) if question else df.iloc[0:0]
+    rest = df.drop(index=mentioned.index)
+    # Start from the estimate, then shrink until the sample actually fits.
+    n_rows = int(remaining / per_row)
+    while n_rows > 0:
+        rows = pd.concat([mentioned.head(n_rows), _stratified_sample(rest, n_rows - len(mentioned))])
+        sample = compact_encode(rows)
+        label = f"Sample rows ({len(rows)} of {len(df)}; {len(mentioned)} rows match the question and come first):"
+        if count_tokens(label + sample) <= remaining:
+            return f"{header}\n\n{label}\n{sample}"
+        n_rows = int(n_rows * 0.8)
+    return header
+
+
+def _run_benchmark(scale=200):
+    """Prompt tokens of the pandas repr, CSV and the compact encoding on student_data.csv scaled up."""
+    df = pd.read_csv("student_data.csv")
+    big = pd.concat([df] * scale, ignore_index=True)
+    for label, frame in [("original", df), (f"x{scale}", big)]:
+        csv_tokens = count_tokens(frame.to_csv(index=False))
+        compact_tokens = count_tokens(compact_encode(frame))
+        print(f"{label:8s} rows={len(frame):6d}  csv={csv_tokens:8d}  compact={compact_tokens:8d}  "
+              f"reduction={1 - compact_tokens / csv_tokens:.0%}")
+        print(f"{'':8s} repr={count_tokens(str(frame)):6d}  compact_frame={count_tokens(compact_frame(frame)):6d}")
+
+
+if __name__ == "__main__":
+    _run_benchmark()
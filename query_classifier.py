@@ -0,0 +1,239 @@
+"""
+Local fast-path for classify_query.
+
+Keyword rules catch the obvious cases, a TF-IDF nearest-centroid model trained on a small
+labelled corpus handles the rest, and only queries neither is confident about go to the LLM.
+"""
+import re
+import math
+import time
+from collections import Counter, defaultdict
+
+LABELS = ["graph", "insight", "quality_check", "update_data", "text"]
+
+RULES = {
+    "graph": [
+        r"\b(plot|chart|graph|histogram|scatter|heatmap|pie|bar ?chart|line ?chart|boxplot|box plot|visuali[sz]e|draw)\b",
+    ],
+    "quality_check": [
+        r"\b(missing|null|nan|duplicates?|outliers?|inconsisten\w*|invalid|wrong (type|format)|data quality|anomal\w*|typos?)\b",
+        r"\bissues? (with|in)\b",
+    ],
+    # Only an imperative at the start ("replace ...", "please drop ...") is an update; the same
+    # words elsewhere are usually part of a question ("which students had the biggest change").
+    "update_data": [
+        r"^(please |kindly |(can|could|would) you (please )?|i (want|need) to |i'd like to |let's )?"
+        r"(update|modify|change|replace|rename|delete|remove|drop|add (a )?(new )?(column|row)|insert|convert|rescale|fill)\b",
+    ],
+    "insight": [
+        r"\b(correlat\w*|relationship|relation|trend|pattern|insights?|impact|affect\w*|compare|comparison|distribution|factors?|driv\w+)\b",
+    ],
+}
+
+# Requests for a differently worded answer, not for changing the data ("convert this into a summary", "fill me in").
+NOT_UPDATE = re.compile(r"\b((in)?to (an? )?(short |brief )?(summary|report|paragraph|bullet points?|list|table|explanation)|fill (me|us) in)\b")
+
+TRAINING_QUERIES = [
+    ("plot the histogram for attendance with 10 buckets in blue color", "graph"),
+    ("show a bar chart of students per department", "graph"),
+    ("draw a scatter plot of GPA against attendance", "graph"),
+    ("visualize the age distribution as a histogram", "graph"),
+    ("make a pie chart of gender", "graph"),
+    ("line chart of average GPA by year", "graph"),
+    ("create a boxplot of GPA grouped by department", "graph"),
+    ("can you graph scholarship counts", "graph"),
+    ("what is the relation of student gender and department", "insight"),
+    ("is there a correlation between attendance and GPA", "insight"),
+    ("what patterns do you see in the data", "insight"),
+    ("which factors affect GPA the most", "insight"),
+    ("compare the performance of scholarship and non scholarship students", "insight"),
+    ("what trends exist across departments", "insight"),
+    ("does age impact attendance", "insight"),
+    ("give me insights about this dataset", "insight"),
+    ("is there any issue with GPA column", "quality_check"),
+    ("are there missing values in the data", "quality_check"),
+    ("find duplicate rows", "quality_check"),
+    ("check for outliers in attendance", "quality_check"),
+    ("are all the values in age valid", "quality_check"),
+    ("check data quality", "quality_check"),
+    ("are there inconsistent department names", "quality_check"),
+    ("do any columns have wrong types", "quality_check"),
+    ("update all the GPAs to scale of 10", "update_data"),
+    ("rename the column Attendance_% to attendance", "update_data"),
+    ("delete rows where GPA is missing", "update_data"),
+    ("add a new column for pass or fail", "update_data"),
+    ("replace Economics with Econ in department", "update_data"),
+    ("convert attendance to a fraction", "update_data"),
+    ("fill missing ages with the median", "update_data"),
+    ("drop the scholarship column", "update_data"),
+    ("how many students are in economics", "text"),
+    ("what is the average GPA", "text"),
+    ("list all students in the physics department", "text"),
+    ("who has the highest attendance", "text"),
+    ("what columns are in this dataset", "text"),
+    ("how many rows are there", "text"),
+    ("what is the name of the student with id 5", "text"),
+    ("hello, what can you do", "text"),
+    # Aggregations and orderings use "by" and "per" just like chart requests do.
+    ("what is the mean attendance per year", "text"),
+    ("number of students by department", "text"),
+    ("sort the students by GPA", "text"),
+    ("top 5 students by attendance", "text"),
+    ("total credits completed by scholarship status", "text"),
+    ("average age by gender", "text"),
+    ("list students ordered by age", "text"),
+    ("count of scholarship holders per department", "text"),
+]
+
+# Not used for training, only to measure the classifier in benchmark().
+HELD_OUT_QUERIES = [
+    ("plot GPA by department", "graph"),
+    ("show me a histogram of age", "graph"),
+    ("how does attendance relate to GPA", "insight"),
+    ("what drives scholarship awards", "insight"),
+    ("are there null values in the gender column", "quality_check"),
+    ("check if GPA has any outliers", "quality_check"),
+    ("change all department names to upper case", "update_data"),
+    ("remove students older than 30", "update_data"),
+    ("how many female students are there", "text"),
+    ("what is the maximum attendance", "text"),
+    ("give me the names of economics students", "text"),
+    ("which department has the most students", "text"),
+    ("average GPA by department", "text"),
+    ("sort by GPA", "text"),
+    ("median credits per year", "text"),
+    ("count students by gender", "text"),
+    ("bottom 3 departments by average attendance", "text"),
+    ("show students sorted by age", "text"),
+    ("make a line chart of attendance by year", "graph"),
+    ("visualise GPA per department", "graph"),
+    ("does scholarship status affect GPA", "insight"),
+    ("compare attendance between genders", "insight"),
+    ("are there students with an age below 0", "quality_check"),
+    ("fill missing GPA values with 0", "update_data"),
+]
+
+TOKEN_RE = re.compile(r"[a-z0-9_%]+")
+# Smallest gap between the best and second best centroid score for the model to answer locally.
+# Borderline queries ("average GPA by department" once scored 0.155 for graph) go to the LLM.
+MIN_MARGIN = 0.2
+
+
+def _tokens(text):
+    words = TOKEN_RE.findall(text.lower())
+    return words + [a + " " + b for a, b in zip(words, words[1:])]
+
+
+def rule_classify(query):
+    """Returns the label whose rules match, or None when no rule or several labels match."""
+    text = query.lower().strip()
+    matched = [label for label, patterns in RULES.items() if any(re.search(p, text) for p in patterns)]
+    if "update_data" in matched and NOT_UPDATE.search(text):
+        matched.remove("update_data")
+    if len(matched) == 1:
+        return matched[0]
+    # Plotting verbs win over the words they are usually combined with ("plot the trend of ...").
+    if "graph" in matched:
+        return "graph"
+    # An imperative update names what it changes ("drop rows with missing GPA").
+    if "update_data" in matched:
+        return "update_data"
+    return None
+
+
+class TfidfCentroidClassifier:
+    """
+    TF-IDF vectors with one L2-normalised centroid per label, scored by cosine similarity.
+    Small enough to train at import time and score in microseconds.
+    """
+
+    def __init__(self, examples=TRAINING_QUERIES):
+        docs = [(_tokens(q), label) for q, label in examples]
+        df_counts = Counter(t for tokens, _ in docs for t in set(tokens))
+        n_docs = len(docs)
+        self.idf = {t: math.log((1 + n_docs) / (1 + c)) + 1 for t, c in df_counts.items()}
+        sums = defaultdict(Counter)
+        for tokens, label in docs:
+            for t, w in self._vector(tokens).items():
+                sums[label][t] += w
+        self.centroids = {label: self._normalise(vec) for label, vec in sums.items()}
+
+    @staticmethod
+    def _normalise(vec):
+        norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+        return {t: w / norm for t, w in vec.items()}
+
+    def _vector(self, tokens):
+        tf = Counter(t for t in tokens if t in self.idf)
+        return self._normalise({t: c * self.idf[t] for t, c in tf.items()})
+
+    def scores(self, query):
+        vec = self._vector(_tokens(query))
+        return {
+            label: sum(w * centroid.get(t, 0.0) for t, w in vec.items())
+            for label, centroid in self.centroids.items()
+        }
+
+    def predict(self, query):
+        """Returns (label, margin) where margin is the gap between the best and second best score."""
+        ranked = sorted(self.scores(query).items(), key=lambda kv: kv[1], reverse=True)
+        (best, s1), (_, s2) = ranked[0], ranked[1]
+        return best, s1 - s2
+
+
+_model = None
+
+
+def local_classify(query, min_margin=MIN_MARGIN):
+    """
+    Local label for `query`, or None when neither the rules nor the model are confident
+    and the caller should ask the LLM instead.
+    """
+    global _model
+    label = rule_classify(query)
+    if label is not None:
+        return label
+    if _model is None:
+        _model = TfidfCentroidClassifier()
+    label, margin = _model.predict(query)
+    # Updates change the data, so they are only taken locally from an explicit imperative.
+    if label == "update_data":
+        return None
+    return label if margin >= min_margin else None
+
+
+def benchmark(queries=None, use_llm=False):
+    """
+    Accuracy and latency of the local classifier. Reference labels come from the
+    LLM classifier when use_llm is set, otherwise from the labelled corpus.
+    """
+    queries = queries or HELD_OUT_QUERIES
+    confident = correct = 0
+    local_time = llm_time = 0.0
+    for query, label in queries:
+        start = time.perf_counter()
+        predicted = local_classify(query)
+        local_time += time.perf_counter() - start
+        if use_llm:
+            from req_functions import classify_query
+            start = time.perf_counter()
+            label = classify_query(query, use_local=False)
+            llm_time += time.perf_counter() - start
+        if predicted is not None:
+            confident += 1
+            correct += predicted == label
+    n = len(queries)
+    report = {
+        "queries": n,
+        "coverage": round(confident / n, 3),
+        "accuracy_when_confident": round(correct / max(1, confident), 3),
+        "local_us_per_query": round(local_time / n * 1e6, 1),
+    }
+    if use_llm:
+        report["llm_ms_per_query"] = round(llm_time / n * 1e3, 1)
+    return report
+
+
+if __name__ == "__main__":
+    import sys
+    print(benchmark(use_llm="--llm" in sys.argv))
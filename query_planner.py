@@ -0,0 +1,330 @@
+"""
+Deterministic NL-to-pandas planner for the common question shapes:
+counts ("how many students in Economics"), aggregations ("average GPA by Department"),
+rankings ("top 5 by Attendance_%") and the filters attached to them.
+Anything it cannot parse completely is left to classify_query and the LLM handlers.
+"""
+import re
+import time
+import threading
+
+import pandas as pd
+
+from duckdb_engine import SQL_ERRORS
+from row_index import column_aliases, find_numeric_conditions
+
+AGGREGATES = [
+    (r"average|mean|avg", "mean"),
+    (r"total|sum of|sum", "sum"),
+    (r"median", "median"),
+    (r"maximum|max|highest", "max"),
+    (r"minimum|min|lowest", "min"),
+]
+# Questions with these words need reasoning, plotting or edits, never a lookup.
+OUT_OF_SCOPE = re.compile(
+    r"\b(plot|chart|graph|histogram|why|correlat\w*|relation\w*|trend|insight|update|change|delete|remove|"
+    r"rename|replace|missing|null|outlier|duplicate|quality|compare|explain|predict)\b"
+)
+MAX_FILTER_UNIQUE = 1000
+# What executing a parsed plan can raise on data it does not fit (comparing strings with
+# numbers, a column the engine types differently); these make the planner pass, anything
+# else is a bug and is raised.
+PLAN_ERRORS = (KeyError, TypeError, ValueError) + SQL_ERRORS
+# Words a question may contain besides the parts a plan consumes; anything else means the plan would ignore it.
+FILLER = set("""
+a an the of in on for with from to and or at as is are was were be do does did there here that this these those
+what whats how many much which who show me give list find tell get compute calculate please
+students student rows row records record people persons entries items data dataset table all overall
+have has had got their our its by total number count average mean value values whole entire
+""".split())
+
+_stats = {"hits": 0, "misses": 0, "hit_seconds": 0.0, "miss_seconds": 0.0}
+_stats_lock = threading.Lock()
+
+
+class Plan:
+    def __init__(self, kind, description, filters, column=None, agg=None, group=None, n=None, ascending=False):
+        self.kind = kind
+        self.description = description
+        self.filters = filters
+        self.column = column
+        self.agg = agg
+        self.group = group
+        self.n = n
+        self.ascending = ascending
+
+    def execute(self, df):
+        mask = pd.Series(True, index=df.index)
+        for col, op, value in self.filters:
+            s = df[col]
+            if op == "in":
+                mask &= s.astype(str).str.lower().isin(value)
+            elif op == ">":
+                mask &= s > value
+            elif op == ">=":
+                mask &= s >= value
+            elif op == "<":
+                mask &= s < value
+            elif op == "<=":
+                mask &= s <= value
+            else:
+                mask &= s == value
+        data = df[mask]
+
+        if self.kind == "count":
+            if self.group:
+                return data.groupby(self.group, observed=True).size().rename("Count").sort_values(ascending=False)
+            return int(len(data))
+        if self.kind == "aggregate":
+            if self.group:
+                grouped = data.groupby(self.group, observed=True)[self.column].agg(self.agg).round(4)
+                grouped = grouped.sort_values(ascending=self.ascending)
+                return grouped.head(self.n) if self.n else grouped
+            return data[self.column].agg(self.agg)
+        if self.kind == "rank":
+            ranked = data.sort_values(self.column, ascending=self.ascending, kind="stable")
+            return ranked.head(self.n)
+        raise ValueError(f"Unknown plan kind: {self.kind}")
+
+    def to_sql(self, table):
+        """The same plan as (query, params) for duckdb_engine, returning the same rows as execute()."""
+        from duckdb_engine import quote_ident, SQL_AGG
+
+        where, params = [], []
+        for col, op, value in self.filters:
+            if op == "in":
+                where.append(f"lower(CAST({quote_ident(col)} AS VARCHAR)) IN ({', '.join('?' * len(value))})")
+                params += sorted(value)
+            else:
+                where.append(f"{quote_ident(col)} {'=' if op == '==' else op} ?")
+                params.append(value)
+        where_sql = f" WHERE {' AND '.join(where)}" if where else ""
+
+        if self.kind == "rank":
+            order = "ASC" if self.ascending else "DESC"
+            return (f"SELECT * FROM {table}{where_sql} ORDER BY {quote_ident(self.column)} {order} NULLS LAST "
+                    f"LIMIT {int(self.n)}"), params
+        if self.kind == "count":
+            value, name = "count(*)", "Count"
+        else:
+            value, name = f"{SQL_AGG[self.agg]}({quote_ident(self.column)})", self.column
+            if self.group:
+                value = f"round({value}, 4)"
+        if self.group:
+            g = quote_ident(self.group)
+            limit = f" LIMIT {int(self.n)}" if self.n else ""
+            return (f"SELECT {g}, {value} AS {quote_ident(name)} FROM {table}{where_sql} "
+                    f"GROUP BY {g} ORDER BY 2 {'ASC' if self.ascending else 'DESC'}{limit}"), params
+        return f"SELECT {value} AS {quote_ident(name)} FROM {table}{where_sql}", params
+
+
+def _alias_pattern(columns):
+    """Regex alternation of every alias of the given columns, longest first, mapped back to the column."""
+    mapping = {}
+    for col in columns:
+        for alias in column_aliases(col):
+            mapping.setdefault(alias, col)
+    aliases = sorted(mapping, key=len, reverse=True)
+    return "|".join(re.escape(a) for a in aliases), mapping
+
+
+def _value_filters(df, text, values_by_column=None):
+    """
+    Categorical values named in the question, e.g. "Economics" -> (Department, in, {"economics"}),
+    with the spans of text they account for.
+    """
+    filters, spans = [], []
+    if values_by_column is None:
+        values_by_column = {
+            col: df[col].dropna().unique()
+            for col in df.select_dtypes(include=["object", "category", "string", "bool"]).columns
+        }
+    for col, values in values_by_column.items():
+        if len(values) > MAX_FILTER_UNIQUE:
+            continue
+        named = set()
+        for v in values:
+            if len(str(v)) < 2:
+                continue
+            for m in re.finditer(r"(?<![\w])" + re.escape(str(v).lower()) + r"(?![\w])", text):
+                named.add(str(v).lower())
+                spans.append(m.span())
+        if named:
+            filters.append((col, "in", named))
+    return filters, spans
+
+
+def _fully_used(text, spans):
+    """True when every word outside the matched spans is filler, so the plan answers the whole question."""
+    chars = list(text)
+    for start, end in spans:
+        chars[start:end] = " " * (end - start)
+    leftover = re.findall(r"[a-z]+|\d+(?:\.\d+)?|[^\sa-z\d?.,!']", "".join(chars))
+    return all(word in FILLER for word in leftover)
+
+
+def plan_query(df, question, values_by_column=None):
+    """
+    Returns a Plan when the question matches a known shape over this schema and every other
+    word in it is filler, otherwise None: "how many students are not in Economics" or
+    "average GPA of students older than 21" carry conditions the plan cannot express.
+    `values_by_column` replaces the values read from `df` when `df` is only a sample of the data.
+    """
+    text = question.lower().strip()
+    if OUT_OF_SCOPE.search(text):
+        return None
+
+    numeric_cols = [c for c in df.select_dtypes(include="number").columns]
+    group_cols = [c for c in df.columns if c not in numeric_cols or df[c].nunique() <= 50]
+    num_pattern, num_map = _alias_pattern(numeric_cols)
+    group_pattern, group_map = _alias_pattern(group_cols)
+    if not num_pattern and not group_pattern:
+        return None
+
+    filters, used = _value_filters(df, text, values_by_column)
+    for col, op, value, span in find_numeric_conditions(text, numeric_cols):
+        filters.append((col, op, value))
+        used.append(span)
+
+    group = None
+    if group_pattern:
+        m = re.search(rf"\b(?:by|per|for each|for every|across|in each)\s+({group_pattern})(?!\w)", text)
+        if m:
+            group = group_map[m.group(1)]
+            used.append(m.span())
+            # "by Department" is a grouping, not a filter on the word "department".
+            filters = [f for f in filters if f[0] != group]
+
+    plan = None
+    # "which department has the highest GPA" ranks the groups, not the rows.
+    if num_pattern and group_pattern:
+        m = re.search(rf"\bwhich\s+({group_pattern})\s+(?:has|have|had|got)\s+the\s+(highest|lowest|most|least|best|worst)"
+                      rf"\s+(?:(?:average|mean|avg)\s+)?({num_pattern})(?!\w)", text)
+        if m:
+            by, col = group_map[m.group(1)], num_map[m.group(3)]
+            ascending = m.group(2) in ("lowest", "least", "worst")
+            used.append(m.span())
+            plan = Plan("aggregate", f"{by} with the {m.group(2)} mean {col}",
+                        [f for f in filters if f[0] != by], column=col, agg="mean", group=by, n=1, ascending=ascending)
+
+    # Rankings: "top 5 by Attendance_%", "bottom 3 students by GPA", "who has the highest GPA"
+    if plan is None and num_pattern:
+        m = re.search(rf"\b(top|bottom|highest|lowest|best|worst)\s+(\d+)\b.*?\bby\s+({num_pattern})(?!\w)", text)
+        if not m:
+            m = re.search(rf"\b(top|bottom|highest|lowest|best|worst)\s+(\d+)\s+({num_pattern})(?!\w)", text)
+        if m:
+            ascending = m.group(1) in ("bottom", "lowest", "worst")
+            col = num_map[m.group(3)]
+            # Only the ranking words are consumed; whatever sits between them and "by" must still be filler.
+            used += [m.span(1), m.span(2), m.span(3)]
+            plan = Plan("rank", f"{m.group(1)} {m.group(2)} rows by {col}", filters,
+                        column=col, n=int(m.group(2)), ascending=ascending)
+    if plan is None and num_pattern:
+        m = re.search(rf"\b(?:who|which (?:student|person|row|record))\s+(?:has|have|had|got)\s+the\s+"
+                      rf"(highest|lowest|most|least)\s+({num_pattern})(?!\w)", text)
+        if m:
+            ascending = m.group(1) in ("lowest", "least")
+            col = num_map[m.group(2)]
+            used.append(m.span())
+            plan = Plan("rank", f"row with the {m.group(1)} {col}", filters, column=col, n=1, ascending=ascending)
+
+    # Aggregations: "average GPA by Department", "total credits_completed in Physics"
+    if plan is None and num_pattern:
+        for words, agg in AGGREGATES:
+            m = re.search(rf"\b(?:{words})\s+(?:of\s+|the\s+)*({num_pattern})(?!\w)", text)
+            if m:
+                col = num_map[m.group(1)]
+                used.append(m.span())
+                where = f" by {group}" if group else ""
+                plan = Plan("aggregate", f"{agg} of {col}{where}", filters, column=col, agg=agg, group=group)
+                break
+
+    # Counts: "how many students are in Economics", "number of students per Department"
+    if plan is None:
+        m = re.search(r"\b(how many|count of|count|number of)\b", text)
+        if m:
+            used.append(m.span())
+            where = f" by {group}" if group else ""
+            plan = Plan("count", f"count of rows{where}", filters, group=group)
+
+    if plan is None or not _fully_used(text, used):
+        return None
+    return plan
+
+
+def _describe_filters(filters):
+    parts = []
+    for col, op, value in filters:
+        if op == "in":
+            parts.append(f"{col} in {sorted(value)}")
+        else:
+            parts.append(f"{col} {op} {value:g}")
+    return " and ".join(parts)
+
+
+def _cell(value):
+    return ("" if pd.isna(value) else str(value)).replace("|", "\\|").replace("\n", " ")
+
+
+def _markdown_table(frame, index=True):
+    """Markdown table of a small frame; DataFrame.to_markdown would need tabulate."""
+    if index:
+        frame = frame.reset_index()
+    lines = ["| " + " | ".join(_cell(c) for c in frame.columns) + " |",
+             "|" + "|".join("---" for _ in frame.columns) + "|"]
+    lines += ["| " + " | ".join(_cell(v) for v in row) + " |" for row in frame.itertuples(index=False)]
+    return "\n".join(lines)
+
+
+def format_result(plan, result):
+    where = _describe_filters(plan.filters)
+    header = f"**Computed locally:** {plan.description}" + (f" where {where}" if where else "")
+    if isinstance(result, pd.DataFrame):
+        body = _markdown_table(result, index=False)
+    elif isinstance(result, pd.Series):
+        body = _markdown_table(result.to_frame())
+    elif isinstance(result, float):
+        body = f"**{result:.4g}**"
+    else:
+        body = f"**{result}**"
+    return f"{header}\n\n{body}"
+
+
+def try_answer(df, question, engine=None):
+    """
+    Answers the question without the LLM when the planner recognises it.
+    Returns the formatted answer, or None so the caller falls back to classify_query.
+    With a duckdb_engine.DuckEngine, `df` is its sample and the plan runs as SQL on the full table.
+    """
+    start = time.perf_counter()
+    try:
+        if engine is None:
+            plan = plan_query(df, question)
+            answer = format_result(plan, plan.execute(df)) if plan is not None else None
+        else:
+            plan = plan_query(df, question, engine.distinct_values())
+            answer = format_result(plan, engine.run_plan(plan)) if plan is not None else None
+    except PLAN_ERRORS:
+        answer = None
+    elapsed = time.perf_counter() - start
+    with _stats_lock:
+        if answer is None:
+            _stats["misses"] += 1
+            _stats["miss_seconds"] += elapsed
+        else:
+            _stats["hits"] += 1
+            _stats["hit_seconds"] += elapsed
+    return answer
+
+
+def planner_stats():
+    """Hit rate of the planner and its mean latency for hits and misses."""
+    with _stats_lock:
+        total = _stats["hits"] + _stats["misses"]
+        return {
+            "queries": total,
+            "hits": _stats["hits"],
+            "hit_rate": round(_stats["hits"] / total, 3) if total else 0.0,
+            "avg_hit_ms": round(_stats["hit_seconds"] / max(1, _stats["hits"]) * 1000, 2),
+            "avg_miss_ms": round(_stats["miss_seconds"] / max(1, _stats["misses"]) * 1000, 2),
+        }
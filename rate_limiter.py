@@ -0,0 +1,371 @@
+import os
+import time
+import random
+import weakref
+import threading
+
+# Requests per minute and tokens per minute for each model. GROQ_MODEL_LIMITS overrides single
+# models ("llama-3.3-70b-versatile=30/12000,llama-3.1-8b-instant=30/6000"), GROQ_RPM / GROQ_TPM all others.
+DEFAULT_LIMITS = {
+    "llama-3.3-70b-versatile": (30, 12000),
+    "llama-3.1-8b-instant": (30, 6000),
+}
+FALLBACK_LIMITS = (30, 6000)
+MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "5"))
+BASE_BACKOFF = float(os.getenv("GROQ_BASE_BACKOFF", "1.0"))
+MAX_BACKOFF = float(os.getenv("GROQ_MAX_BACKOFF", "60"))
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to `capacity` units and refills at `rate` units per second.
+    """
+
+    def __init__(self, capacity, rate):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount):
+        """Seconds until `amount` units are available (0 if they already are)."""
+        self._refill(time.monotonic())
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def give(self, amount):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def drain(self):
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, 0.0)
+
+
+class ModelBudget:
+    """Requests-per-minute and tokens-per-minute buckets for one model."""
+
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm, rpm / 60.0)
+        self.tokens = TokenBucket(tpm, tpm / 60.0)
+        self.lock = threading.Lock()
+        # Holding `turn` while waiting keeps callers of the same model in arrival order.
+        self.turn = threading.Lock()
+        # The same for coroutines, one asyncio.Lock per event loop.
+        self._async_turns = weakref.WeakKeyDictionary()
+
+    def try_acquire(self, n_tokens):
+        """Takes one request and `n_tokens` if both are available and returns 0, else the seconds to wait."""
+        with self.lock:
+            wait = max(self.requests.time_until(1), self.tokens.time_until(n_tokens))
+            if wait <= 0:
+                self.requests.take(1)
+                self.tokens.take(n_tokens)
+                return 0.0
+            return wait
+
+    def acquire(self, n_tokens):
+        with self.turn:
+            while True:
+                wait = self.try_acquire(n_tokens)
+                if wait <= 0:
+                    return
+                time.sleep(wait)
+
+    async def acquire_async(self, n_tokens):
+        """
+        acquire for coroutines: waits with asyncio.sleep instead of holding a thread, and a
+        cancelled caller takes nothing from the budget.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            turn = self._async_turns.get(loop)
+            if turn is None:
+                turn = self._async_turns[loop] = asyncio.Lock()
+        async with turn:
+            while True:
+                wait = self.try_acquire(n_tokens)
+                if wait <= 0:
+                    return
+                await asyncio.sleep(wait)
+
+    def refund(self, n_tokens):
+        """Returns tokens that were reserved but not used, e.g. the unused part of max_new_tokens."""
+        with self.lock:
+            self.tokens.give(n_tokens)
+
+    def penalize(self):
+        """The provider said we are over budget, so stop issuing until the buckets refill."""
+        with self.lock:
+            self.requests.drain()
+
+
+def _is_rate_limited(exc):
+    status = getattr(exc, "status_code", None)
+    if status is None and getattr(exc, "response", None) is not None:
+        status = getattr(exc.response, "status_code", None)
+    return status == 429 or status == 503
+
+
+def parse_model_limits(text):
+    """{model: (rpm, tpm)} from "model=rpm/tpm,model=rpm/tpm"."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        model, _, values = item.rpartition("=")
+        rpm, _, tpm = values.partition("/")
+        limits[model.strip()] = (int(rpm), int(tpm))
+    return limits
+
+
+def used_tokens(response):
+    """Prompt plus completion tokens reported in a completion's (or final stream chunk's) usage, or None."""
+    usage = getattr(response, "usage", None) or getattr(getattr(response, "x_groq", None), "usage", None)
+    total = getattr(usage, "total_tokens", None)
+    return total if isinstance(total, int) else None
+
+
+def _retry_after(exc):
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+class RequestScheduler:
+    """
+    Paces LLM calls per model against RPM/TPM budgets and retries provider 429s
+    with jittered exponential backoff, honoring Retry-After when present.
+    """
+
+    def __init__(self, limits=None, max_retries=MAX_RETRIES, base_backoff=BASE_BACKOFF, max_backoff=MAX_BACKOFF):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._budgets = {}
+        self._lock = threading.Lock()
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.completed = 0
+        self.retries = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _budget(self, model):
+        with self._lock:
+            budget = self._budgets.get(model)
+            if budget is None:
+                overrides = parse_model_limits(os.getenv("GROQ_MODEL_LIMITS"))
+                if model in overrides:
+                    rpm, tpm = overrides[model]
+                else:
+                    rpm, tpm = self.limits.get(model, FALLBACK_LIMITS)
+                    rpm = int(os.getenv("GROQ_RPM", rpm))
+                    tpm = int(os.getenv("GROQ_TPM", tpm))
+                budget = self._budgets[model] = ModelBudget(rpm, tpm)
+            return budget
+
+    def settle(self, model, reserved, used):
+        """
+        Refunds the difference once a call reports its usage, so the unused part of the
+        max_new_tokens reservation is available to the next request right away.
+        """
+        if used is not None and used < reserved:
+            self._budget(model).refund(reserved - used)
+
+    def _backoff(self, attempt, exc):
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            return retry_after
+        delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+        return random.uniform(0, delay)
+
+    def run(self, model, n_tokens, call):
+        """
+        Waits for budget, then runs `call()`. Rate limit errors return the reservation and are
+        retried up to max_retries times, anything else is raised immediately. When the result
+        reports its usage, the unused part of `n_tokens` is refunded.
+        """
+        budget = self._budget(model)
+        attempt = 0
+        while True:
+            with self._lock:
+                self.queue_depth += 1
+                self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+            start = time.monotonic()
+            try:
+                budget.acquire(n_tokens)
+            finally:
+                waited = time.monotonic() - start
+                with self._lock:
+                    self.queue_depth -= 1
+                    self.total_wait += waited
+                    self.max_wait = max(self.max_wait, waited)
+
+            try:
+                result = call()
+            except Exception as exc:
+                if not _is_rate_limited(exc):
+                    raise
+                # The rejected request used no tokens, and a retry reserves them again.
+                budget.refund(n_tokens)
+                if attempt >= self.max_retries:
+                    raise
+                budget.penalize()
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self._backoff(attempt, exc))
+                attempt += 1
+                continue
+
+            with self._lock:
+                self.completed += 1
+            self.settle(model, n_tokens, used_tokens(result))
+            return result
+
+    async def run_async(self, model, n_tokens, call):
+        """Async variant of run, `call()` must return an awaitable."""
+        import asyncio
+
+        budget = self._budget(model)
+        attempt = 0
+        while True:
+            with self._lock:
+                self.queue_depth += 1
+                self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+            start = time.monotonic()
+            try:
+                await budget.acquire_async(n_tokens)
+            finally:
+                waited = time.monotonic() - start
+                with self._lock:
+                    self.queue_depth -= 1
+                    self.total_wait += waited
+                    self.max_wait = max(self.max_wait, waited)
+
+            try:
+                result = await call()
+            except Exception as exc:
+                if not _is_rate_limited(exc):
+                    raise
+                # The rejected request used no tokens, and a retry reserves them again.
+                budget.refund(n_tokens)
+                if attempt >= self.max_retries:
+                    raise
+                budget.penalize()
+                with self._lock:
+                    self.retries += 1
+                await asyncio.sleep(self._backoff(attempt, exc))
+                attempt += 1
+                continue
+
+            with self._lock:
+                self.completed += 1
+            self.settle(model, n_tokens, used_tokens(result))
+            return result
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "queue_depth": self.queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "completed": self.completed,
+                "retries": self.retries,
+                "avg_wait_s": round(self.total_wait / max(1, self.completed), 4),
+                "max_wait_s": round(self.max_wait, 4),
+            }
+
+
+def estimate_tokens(*texts, max_new_tokens=0):
+    """
+    Rough TPM reservation for a request: ~4 characters per prompt token plus the completion
+    budget. RequestScheduler refunds what the response's usage shows was not needed.
+    """
+    return sum(len(t) for t in texts if t) // 4 + max_new_tokens
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RequestScheduler()
+    return _scheduler
+
+
+def _run_fake_server_demo(n_calls=20):
+    """
+    Drives the scheduler against a local server that answers every third request with 429.
+    """
+    import json
+    from concurrent.futures import ThreadPoolExecutor
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from groq import Groq
+
+    body = json.dumps({
+        "id": "fake", "object": "chat.completion", "created": 0, "model": "fake",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": "TEXT"}}],
+    }).encode()
+    counter = {"n": 0}
+    counter_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with counter_lock:
+                counter["n"] += 1
+                throttled = counter["n"] % 3 == 0
+            if throttled:
+                self.send_response(429)
+                self.send_header("Retry-After", "0.2")
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b'{"error": {"message": "rate limited"}}')
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = Groq(api_key="fake", base_url=f"http://127.0.0.1:{server.server_address[1]}", max_retries=0)
+    scheduler = RequestScheduler(limits={"fake": (120, 100000)})
+
+    def one_call(_):
+        return scheduler.run("fake", 100, lambda: client.chat.completions.create(
+            model="fake", messages=[{"role": "user", "content": "ping"}]))
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(one_call, range(n_calls)))
+    server.shutdown()
+    print(f"{len(results)} calls in {time.monotonic() - start:.2f}s, {counter['n']} HTTP requests")
+    print(scheduler.metrics())
+
+
+if __name__ == "__main__":
+    _run_fake_server_demo()
@@ -2,8 +2,18 @@ import pandas as pd
 import sys
 import numpy as np
 import matplotlib.pyplot as plt
-from get_llm_response import get_response
+from query_classifier import local_classify
+from prompt_context import build_context, compact_frame
+from profile_cache import get_profile
+from code_interpreter import answer_with_code
+from csv_ingest import read_csv_chunked
+from duckdb_engine import is_engine
+from dataset_store import editable_frame, restore_categoricals
+from model_router import routed_response, routed_response_stream, routed_response_async
 import re
+import json
+import time
+import asyncio
 
 def extract_python_code(response: str) -> str:
     """
@@ -17,14 +27,15 @@ def extract_python_code(response: str) -> str:
 
 def load_csv(file_path):
     try:
-        df = pd.read_csv(file_path)
-        print("CSV loaded successfully.")
+        df, stats = read_csv_chunked(file_path)
+        print(f"CSV loaded successfully: {stats['rows']} rows, {stats['frame_mb']} MB in memory, "
+              f"peak RSS {stats['peak_rss_mb']} MB, {stats['seconds']}s.")
         return df
     except Exception as e:
         print(f"Error loading CSV: {e}")
         sys.exit(1)
 
-def generate_plot(df, query):
+def _plot_prompt(df, query):
     system_prompt = f"""
     Given a Dataframe, and a user query, your job is to return the most appropriate python code
     That can be used to plot the data/graph that is being asked by the query.
@@ -42,6 +53,7 @@ def generate_plot(df, query):
 
     Don't add columns that are not required.
     Make sure to use proper columns names, values etc, so that code doesn't fail.
+    The data is already loaded in a pandas DataFrame named `df`, don't read it from a file.
 
     Output Format :
     A. Steps taken to solve the problem.
@@ -49,14 +61,22 @@ def generate_plot(df, query):
     return python code in ```python  and ```.
     """
 
-    user_query = f""" DATAFRAME : {df} \n\n QUERY :: {query} """
-    response = get_response(system_prompt, user_query)
+    user_query = f""" DATAFRAME : {compact_frame(df)} \n\n QUERY :: {query} """
+    return system_prompt, user_query
+
+def generate_plot(df, query):
+    if is_engine(df):
+        # Plot code needs the whole frame in memory; a DuckDB dataset is charted from a spec aggregated in SQL.
+        from chart_spec import generate_chart_spec
+        return generate_chart_spec(df.sample(), query)
+    system_prompt, user_query = _plot_prompt(df, query)
+    response = routed_response("plot", system_prompt, user_query)
     code = extract_python_code(response)
     return response, code
 
-def ask_question(df, question):
-    # Convert a sample of the dataframe to string for token limits
-    data = df.to_csv(index=False)
+def _ask_prompt(df, question):
+    # Whole table when it fits the token budget, otherwise schema, stats and a relevant sample
+    data = build_context(df, question)
     
     system_prompt = f"""
     You are a data analyst. Answer the following question based on the data.
@@ -70,6 +90,7 @@ def ask_question(df, question):
 
     Verify your answer, that it is correct with respect to the data.
     Make sure you don't miss any data point and output in correct format.
+    If only sample rows are given, use the column statistics for totals and say that the rows are a sample.
     Seprate your steps from actual final output.
 
     Data :
@@ -86,20 +107,29 @@ def ask_question(df, question):
     """
 
     user_query = question
-    response = get_response(system_prompt, user_query)
+    return system_prompt, user_query
+
+def ask_question(df, question, stream=False, code_interpreter=False):
+    if is_engine(df):
+        return df.answer(question)
+    if code_interpreter:
+        return answer_with_code(df, question)
+    system_prompt, user_query = _ask_prompt(df, question)
+    if stream:
+        return routed_response_stream("ask", system_prompt, user_query)
+    response = routed_response("ask", system_prompt, user_query)
     
     return response
 
-def generate_insight(df, query):
-    print("\n[Insight generation triggered based on query]")
-    
-    # Simple automatic insights from the data
-    numeric_summary = df.describe().to_string()
-    correlation = df.corr(numeric_only=True).to_string()
+def _insight_prompt(df, query):
+    # Simple automatic insights from the data, cached per dataset version
+    profile = get_profile(df)
+    numeric_summary = profile["numeric_summary"]
+    correlation = profile["correlation"]
 
     system_prompt = f"""You are a data analyst. Extract insights from the following dataset.
         Data Frame :
-                {df}
+                {compact_frame(df)}
         Data Summary:
                 {numeric_summary}
         Correlation Matrix:
@@ -126,20 +156,29 @@ def generate_insight(df, query):
         Make sure final concluson and reuslts only conatains the requrired information asked by the User, nothing extra
     """
     user_query = f"{query}" 
+    return system_prompt, user_query
 
-    insights = get_response(system_prompt, user_query)
+def generate_insight(df, query, stream=False, code_interpreter=False):
+    print("\n[Insight generation triggered based on query]")
+    if is_engine(df):
+        return df.answer(query)
+    if code_interpreter:
+        return answer_with_code(df, query)
+    system_prompt, user_query = _insight_prompt(df, query)
+    if stream:
+        return routed_response_stream("insight", system_prompt, user_query)
+    insights = routed_response("insight", system_prompt, user_query)
     return insights
 
-def check_data_quality(df, query):
-    print("\n[Quality Check triggered based on query]")
-    
-    # Simple automatic insights from the data
-    numeric_summary = df.describe().to_string()
-    correlation = df.corr(numeric_only=True).to_string()
+def _quality_prompt(df, query):
+    # Simple automatic insights from the data, cached per dataset version
+    profile = get_profile(df)
+    numeric_summary = profile["numeric_summary"]
+    correlation = profile["correlation"]
 
     system_prompt = f"""You are a data analyst. Extract insights from the following dataset.
         Data Frame :
-                {df}
+                {compact_frame(df)}
         Data Summary:
                 {numeric_summary}
         Correlation Matrix:
@@ -171,17 +210,23 @@ def check_data_quality(df, query):
 
     """
     user_query = f"{query}" 
+    return system_prompt, user_query
 
-    quality_checks = get_response(system_prompt, user_query)
+def check_data_quality(df, query, stream=False):
+    print("\n[Quality Check triggered based on query]")
+    if is_engine(df):
+        return df.answer(query)
+    system_prompt, user_query = _quality_prompt(df, query)
+    if stream:
+        return routed_response_stream("quality", system_prompt, user_query)
+    quality_checks = routed_response("quality", system_prompt, user_query)
     return quality_checks
 
-def update_data(df, query):
-    print("\n[Data Updation triggered based on query]")
-    
+def _update_prompt(df, query):
     system_prompt = f"""
         Help user with data updaton.
         Given a DataFrame, give user the python code to do the updation.
-        Don't update the dataframe, just return the PYTHON code for updation, that creates new CSV File
+        The code runs with the data already loaded in a pandas DataFrame named `df`.
         Create a step by step plan to complete the plan.
 
         For example, 
@@ -193,8 +238,8 @@ def update_data(df, query):
         4. Apply formula for all rows.
         5. Update the Column
 
-        Always add the code to save the DataFrame to CSV.
-        And use "file_path" as variable name to read CSV.
+        Don't read or write any file.
+        Always end the code by assigning the updated DataFrame to a variable named `result`.
         Return Python code.
 
         Output Format :
@@ -203,13 +248,35 @@ def update_data(df, query):
     return python code in ```python  and ```.
     """
 
-    user_query = f""" DATAFRAME : {df} \n\n QUERY :: {query} """
-    response = get_response(system_prompt, user_query)
+    user_query = f""" DATAFRAME : {compact_frame(df)} \n\n QUERY :: {query} """
+    return system_prompt, user_query
+
+def update_data(df, query):
+    print("\n[Data Updation triggered based on query]")
+    if is_engine(df):
+        return "Updating data is not supported for datasets opened with DuckDB.", ""
+    system_prompt, user_query = _update_prompt(df, query)
+    response = routed_response("update", system_prompt, user_query)
     code = extract_python_code(response)
     return response, code
 
-
-def classify_query(user_query):
+def apply_update(store, code, description, run=None):
+    """
+    Runs update code from update_data against the store's current version and records
+    the result as a new version. Returns (updated DataFrame, changed columns).
+    """
+    if run is None:
+        from exec_pool import run_in_pool as run
+    current = store.current()
+    updated = run(code, editable_frame(current))
+    if not isinstance(updated, pd.DataFrame):
+        raise ValueError("The update code did not assign a DataFrame to `result`.")
+    updated = restore_categoricals(updated.copy(), current)
+    changed = store.apply(updated, description)
+    return store.current(), changed
+
+
+def _classify_prompt(user_query):
     system_prompt = """
         Given a user_query, classify the query into one of the following categories:
 
@@ -226,14 +293,241 @@ def classify_query(user_query):
 
         Respond with ONLY one word: GRAPH, INSIGHT, QUALITY_CHECK, UPDATE_DATA, TEXT
     """
-    decision = get_response(system_prompt, user_query).strip().lower()
+    return system_prompt, user_query
+
+def classify_query(user_query, use_local=True):
+    if use_local:
+        decision = local_classify(user_query)
+        if decision is not None:
+            return decision
+    system_prompt, user_query = _classify_prompt(user_query)
+    decision = routed_response("classify", system_prompt, user_query).strip().lower()
     return decision
 
 
+# ------------------------------
+# Single call mode
+# ------------------------------
+CATEGORIES = ["graph", "insight", "quality_check", "update_data", "text"]
+
+def _single_call_prompt(df, query):
+    # Whole table when it fits the token budget, otherwise schema, stats and a relevant sample
+    data = build_context(df, query)
+    numeric_summary = get_profile(df)["numeric_summary"]
+
+    system_prompt = f"""
+    You are a data analyst. Given a dataset and a user query, first classify the query and then answer it,
+    all in one response.
+
+    Categories:
+    1. "GRAPH" : the query asks for a visual aid, like graph, chart or plot.
+    2. "INSIGHT" : the query asks for underlying information like patterns or correlations.
+    3. "QUALITY_CHECK" : the query asks for issues like missing data, wrong types, outliers, or inconsistencies.
+    4. "UPDATE_DATA" : the query asks for modifying, adding, or deleting data.
+    5. "TEXT" : general questions, help requests, or anything not covered above.
+
+    For GRAPH return matplotlib code that plots the requested graph from a DataFrame named df.
+    For UPDATE_DATA return python code that updates the DataFrame `df` and assigns the updated DataFrame to `result`, without reading or writing files.
+    For every other category answer the query with proper calculations on the data, step by step.
+    Use only the columns present in the data.
+    If only sample rows are given, use the column statistics for totals and say that the rows are a sample.
+
+    Data :
+    {data}
+
+    Data Summary:
+    {numeric_summary}
+
+    Respond with ONLY a JSON object, no text before or after it:
+    {{"category": "<one of GRAPH, INSIGHT, QUALITY_CHECK, UPDATE_DATA, TEXT>",
+      "answer": "<steps taken and the final result, in markdown>",
+      "code": "<python code for GRAPH or UPDATE_DATA, otherwise empty string>"}}
+    """
+
+    user_query = f"{query}"
+    return system_prompt, user_query
+
+def _first_json_object(text):
+    # Scan for the first balanced {...}, skipping braces inside strings.
+    start = text.find("{")
+    while start != -1:
+        depth, in_string, escaped = 0, False, False
+        for i in range(start, len(text)):
+            ch = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    try:
+                        return json.loads(text[start:i + 1], strict=False)
+                    except json.JSONDecodeError:
+                        break
+        start = text.find("{", start + 1)
+    return None
+
+def parse_structured_response(response):
+    """
+    Parses the single call JSON reply into (category, answer, code).
+    Falls back to the raw text (and any ```python block in it) when the model
+    did not return valid JSON, so a malformed reply still produces an answer.
+    """
+    parsed = _first_json_object(response)
+    if not isinstance(parsed, dict):
+        return "text", response, extract_python_code(response)
+
+    category = str(parsed.get("category", "text")).strip().lower()
+    if category not in CATEGORIES:
+        category = "text"
+    answer = parsed.get("answer") or ""
+    if not isinstance(answer, str):
+        answer = json.dumps(answer, indent=2)
+    code = parsed.get("code") or ""
+    if not isinstance(code, str):
+        code = ""
+    code = extract_python_code(code) or code.strip()
+    return category, answer, code
+
+def answer_query(df, query):
+    """
+    One LLM round trip per chat turn: the reply carries the category and the answer/code.
+    Returns (category, answer, code).
+    """
+    if is_engine(df):
+        # The single-call prompt embeds rows from memory; DuckDB datasets go through the SQL handlers instead.
+        return answer_query_two_step(df, query)
+    system_prompt, user_query = _single_call_prompt(df, query)
+    response = routed_response("single_call", system_prompt, user_query)
+    return parse_structured_response(response)
+
+def answer_query_two_step(df, query):
+    """The classify-then-handle pipeline, with the same return shape as answer_query."""
+    decision = classify_query(query)
+    code = ""
+    if decision == "graph":
+        answer, code = generate_plot(df, query)
+    elif decision == "insight":
+        answer = generate_insight(df, query)
+    elif decision == "quality_check":
+        answer = check_data_quality(df, query)
+    elif decision == "update_data":
+        answer, code = update_data(df, query)
+    else:
+        answer = ask_question(df, query)
+    return decision, answer, code
+
+def compare_pipelines(df, queries):
+    """
+    Runs every query through both pipelines and reports latency and how often the
+    categories agree. Run with LLM_CACHE_DISABLE=1 so the timings are not cache hits.
+    """
+    rows = []
+    for query in queries:
+        start = time.perf_counter()
+        single_category, _, _ = answer_query(df, query)
+        single_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        two_step_category, _, _ = answer_query_two_step(df, query)
+        two_step_time = time.perf_counter() - start
+
+        rows.append({
+            "query": query,
+            "single_call_category": single_category,
+            "two_step_category": two_step_category,
+            "single_call_s": round(single_time, 3),
+            "two_step_s": round(two_step_time, 3),
+        })
+    report = pd.DataFrame(rows)
+    agreement = (report["single_call_category"] == report["two_step_category"]).mean()
+    print(f"Category agreement: {agreement:.0%}")
+    print(f"Mean latency single call: {report['single_call_s'].mean():.2f}s, two step: {report['two_step_s'].mean():.2f}s")
+    return report
+
+# ------------------------------
+# Async handlers
+# ------------------------------
+async def generate_plot_async(df, query):
+    if is_engine(df):
+        # DuckDB handlers run blocking SQL, so they go to a thread like answer_query_async does.
+        return await asyncio.to_thread(generate_plot, df, query)
+    system_prompt, user_query = _plot_prompt(df, query)
+    response = await routed_response_async("plot", system_prompt, user_query)
+    code = extract_python_code(response)
+    return response, code
+
+async def ask_question_async(df, question):
+    if is_engine(df):
+        return await asyncio.to_thread(ask_question, df, question)
+    system_prompt, user_query = _ask_prompt(df, question)
+    return await routed_response_async("ask", system_prompt, user_query)
+
+async def generate_insight_async(df, query):
+    if is_engine(df):
+        return await asyncio.to_thread(generate_insight, df, query)
+    system_prompt, user_query = _insight_prompt(df, query)
+    return await routed_response_async("insight", system_prompt, user_query)
+
+async def check_data_quality_async(df, query):
+    if is_engine(df):
+        return await asyncio.to_thread(check_data_quality, df, query)
+    system_prompt, user_query = _quality_prompt(df, query)
+    return await routed_response_async("quality", system_prompt, user_query)
+
+async def update_data_async(df, query):
+    if is_engine(df):
+        return update_data(df, query)
+    system_prompt, user_query = _update_prompt(df, query)
+    response = await routed_response_async("update", system_prompt, user_query)
+    code = extract_python_code(response)
+    return response, code
+
+async def classify_query_async(user_query, use_local=True):
+    if use_local:
+        decision = local_classify(user_query)
+        if decision is not None:
+            return decision
+    system_prompt, user_query = _classify_prompt(user_query)
+    decision = await routed_response_async("classify", system_prompt, user_query)
+    return decision.strip().lower()
+
+async def answer_query_async(df, query):
+    """
+    Full chat turn (classify, then the matching handler) without blocking the event loop.
+    Many of these can be gathered on one loop to keep several analyst requests in flight.
+    """
+    if is_engine(df):
+        decision, answer, _ = await asyncio.to_thread(answer_query_two_step, df, query)
+        return decision, answer
+    decision = await classify_query_async(query)
+    if decision == "graph":
+        answer, _ = await generate_plot_async(df, query)
+    elif decision == "insight":
+        answer = await generate_insight_async(df, query)
+    elif decision == "quality_check":
+        answer = await check_data_quality_async(df, query)
+    elif decision == "update_data":
+        answer, _ = await update_data_async(df, query)
+    else:
+        answer = await ask_question_async(df, query)
+    return decision, answer
+
+
 def check_col_values(df, col_name): 
     return col_name
 
 def list_col_names(df, col_names):
+    if is_engine(df):
+        return df.list_col_names(col_names)
     result = {}
     for col in col_names:
         try:
@@ -245,6 +539,8 @@ def list_col_names(df, col_names):
 
 
 def is_primary_key(df, col_names): 
+    if is_engine(df):
+        return df.is_primary_key(col_names)
     result = {}
     for col in col_names:
         if df[col].isnull().any():
@@ -256,6 +552,8 @@ def is_primary_key(df, col_names):
     return result
 
 def is_dependent(df, col_names):
+    if is_engine(df):
+        return df.is_dependent(col_names)
     result = {}
     for col in col_names:
         dep_cols = []
@@ -0,0 +1,211 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from fingerprint import frame_fingerprint
+
+MAX_INDEXES = int(os.getenv("ROW_INDEX_CACHE_MAX", "4"))
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+NUMBER = r"(-?\d+(?:\.\d+)?)"
+
+# Phrases mapped to comparison operators, longest first so "greater than or equal to" wins over "greater than".
+OPERATORS = [
+    ("greater than or equal to", ">="), ("less than or equal to", "<="),
+    ("at least", ">="), ("no less than", ">="), ("at most", "<="), ("no more than", "<="),
+    ("greater than", ">"), ("more than", ">"), ("higher than", ">"), ("above", ">"), ("over", ">"),
+    ("less than", "<"), ("lower than", "<"), ("below", "<"), ("under", "<"),
+    ("equal to", "=="), ("equals", "=="),
+    (">=", ">="), ("<=", "<="), (">", ">"), ("<", "<"), ("==", "=="), ("=", "=="), ("is", "=="),
+]
+
+
+def _tokens(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+
+def column_aliases(col):
+    """Ways a column can be written in a question: "Attendance_%" -> attendance_%, attendance %, attendance."""
+    name = str(col).lower()
+    spaced = name.replace("_", " ").strip()
+    bare = re.sub(r"[^a-z0-9 ]+", " ", spaced).strip()
+    return sorted({name, spaced, re.sub(r"\s+", " ", bare)} - {""}, key=len, reverse=True)
+
+
+def find_numeric_conditions(question, columns):
+    """
+    [(column, op, value, (start, end))] for phrases like "GPA above 3.5" or "age between 20 and 25"
+    over the given numeric columns; the span is where the phrase sits in question.lower().
+    Needs only the column names, no index.
+    """
+    text = question.lower()
+    conditions = []
+    for col in columns:
+        for alias in column_aliases(col):
+            a = re.escape(alias)
+            between = re.search(rf"\b{a}\s+(?:is\s+)?between\s+{NUMBER}\s+and\s+{NUMBER}", text)
+            if between:
+                lo, hi = sorted(float(x) for x in between.groups())
+                conditions += [(col, ">=", lo, between.span()), (col, "<=", hi, between.span())]
+                break
+            found = False
+            for phrase, op in OPERATORS:
+                m = re.search(rf"\b{a}\s*(?:is\s+|of\s+)?{re.escape(phrase)}\s*{NUMBER}", text)
+                if m:
+                    conditions.append((col, op, float(m.group(1)), m.span()))
+                    found = True
+                    break
+            if found:
+                break
+    return conditions
+
+
+def numeric_conditions(question, columns):
+    return [(col, op, value) for col, op, value, _ in find_numeric_conditions(question, columns)]
+
+
+def _column_tokens(series):
+    """
+    (row positions, token ids, vocabulary) with one entry per token occurrence in the column.
+    Only the distinct values are tokenized; their tokens are then spread to the rows with
+    array operations, so unique ID or name columns cost no Python loop per row.
+    """
+    codes, uniques = pd.factorize(series)
+    tokens = pd.Series(np.asarray(uniques, dtype=object)).astype(str).str.lower().str.findall(TOKEN_RE.pattern)
+    tokens = tokens.explode().dropna()
+    word_ids, vocab = pd.factorize(tokens)
+    per_value = np.bincount(tokens.index.to_numpy(dtype=np.int64), minlength=len(uniques))
+    first = np.cumsum(per_value) - per_value
+
+    rows = np.flatnonzero(codes >= 0)
+    counts = per_value[codes[rows]]
+    ends = np.cumsum(counts)
+    offsets = np.arange(ends[-1] if len(ends) else 0) - np.repeat(ends - counts, counts)
+    pairs = np.repeat(first[codes[rows]], counts) + offsets
+    return np.repeat(rows, counts), word_ids[pairs], np.asarray(vocab, dtype=object)
+
+
+def _tokenize_columns(df, columns):
+    """_column_tokens over several columns, with the token ids remapped to one shared vocabulary."""
+    rows, token_ids, vocabs = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)], []
+    offset = 0
+    for col in columns:
+        col_rows, col_ids, vocab = _column_tokens(df[col])
+        rows.append(col_rows)
+        token_ids.append(col_ids + offset)
+        vocabs.append(vocab)
+        offset += len(vocab)
+    shared, vocab = pd.factorize(np.concatenate(vocabs) if vocabs else np.zeros(0, dtype=object))
+    return np.concatenate(rows), shared[np.concatenate(token_ids)], list(vocab)
+
+
+class RowIndex:
+    """
+    In-memory retrieval index over one DataFrame, built once per loaded dataset.
+    String columns go into a BM25 inverted index, numeric columns get a sorted index
+    so range conditions like "GPA above 3.5" resolve with a binary search.
+    """
+
+    def __init__(self, df, k1=1.2, b=0.75):
+        self.df = df
+        self.n_rows = len(df)
+        self.k1 = k1
+        self.b = b
+        rows, token_ids, vocab = _tokenize_columns(df, df.select_dtypes(include=["object", "category", "string", "bool"]).columns)
+        doc_len = np.bincount(rows, minlength=self.n_rows).astype(np.float64)
+        # Row positions grouped by token with one sort; token i's rows are
+        # posting_rows[posting_start[i]:posting_start[i + 1]].
+        self.posting_rows = rows[np.argsort(token_ids, kind="stable")]
+        self.posting_start = np.concatenate([[0], np.cumsum(np.bincount(token_ids, minlength=len(vocab)))])
+        self.token_ids = dict(zip(vocab, range(len(vocab))))
+        self.doc_len = doc_len
+        self.avg_len = doc_len.mean() if self.n_rows else 0.0
+
+        self.sorted_values = {}
+        for col in df.select_dtypes(include="number").columns:
+            values = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            order = np.argsort(values, kind="stable")
+            order = order[~np.isnan(values[order])]
+            self.sorted_values[col] = (values[order], order)
+
+    def bm25(self, query):
+        """BM25 score of every row for the query terms (zeros where no term matches)."""
+        scores = np.zeros(self.n_rows, dtype=np.float64)
+        norm = self.k1 * (1 - self.b + self.b * self.doc_len / (self.avg_len or 1.0))
+        for token in set(_tokens(query)):
+            i = self.token_ids.get(token)
+            if i is None:
+                continue
+            positions = self.posting_rows[self.posting_start[i]:self.posting_start[i + 1]]
+            tf = np.bincount(positions, minlength=self.n_rows).astype(np.float64)
+            n_docs = np.count_nonzero(tf)
+            idf = np.log(1 + (self.n_rows - n_docs + 0.5) / (n_docs + 0.5))
+            hit = tf > 0
+            scores[hit] += idf * tf[hit] * (self.k1 + 1) / (tf[hit] + norm[hit])
+        return scores
+
+    def _range(self, col, op, value):
+        values, order = self.sorted_values[col]
+        if op == ">":
+            return order[np.searchsorted(values, value, side="right"):]
+        if op == ">=":
+            return order[np.searchsorted(values, value, side="left"):]
+        if op == "<":
+            return order[:np.searchsorted(values, value, side="left")]
+        if op == "<=":
+            return order[:np.searchsorted(values, value, side="right")]
+        lo = np.searchsorted(values, value, side="left")
+        hi = np.searchsorted(values, value, side="right")
+        return order[lo:hi]
+
+    def numeric_conditions(self, question):
+        """[(column, op, value)] parsed from phrases like "GPA above 3.5" or "age between 20 and 25"."""
+        return numeric_conditions(question, self.sorted_values)
+
+    def search(self, question, limit=None):
+        """
+        Row positions relevant to the question: rows satisfying every numeric condition,
+        ranked by BM25 over the string columns. If the question names values that exist
+        in the data, only rows matching them are returned.
+        """
+        candidates = None
+        for col, op, value in self.numeric_conditions(question):
+            rows = self._range(col, op, value)
+            candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+
+        scores = self.bm25(question)
+        if candidates is None:
+            candidates = np.flatnonzero(scores > 0)
+        elif scores.any():
+            matched = candidates[scores[candidates] > 0]
+            if len(matched):
+                candidates = matched
+
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return candidates[:limit] if limit is not None else candidates
+
+    def search_rows(self, question, limit=None):
+        return self.df.iloc[self.search(question, limit)]
+
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_row_index(df):
+    """RowIndex for `df`, built on first use and cached by fingerprint."""
+    key = frame_fingerprint(df)
+    with _lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    index = RowIndex(df)
+    with _lock:
+        _indexes[key] = index
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
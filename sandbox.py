@@ -0,0 +1,172 @@
+import os
+import re
+import ast
+import sys
+import string
+import builtins
+import importlib.machinery
+
+ALLOWED_IMPORTS = {"pandas", "numpy", "math", "statistics", "datetime", "re", "collections"}
+# Chart jobs in the execution pool also import the plotting libraries.
+POOL_IMPORTS = ALLOWED_IMPORTS | {"matplotlib", "seaborn"}
+
+# Audit events a job may never trigger: processes, signals, sockets, native code, directory
+# listings, file system changes and resource limits.
+BLOCKED_EVENT_PREFIXES = (
+    "os.", "subprocess.", "socket.", "ctypes.", "shutil.", "glob.", "pty.", "resource.",
+    "urllib.", "http.", "ftplib.", "smtplib.", "webbrowser.", "sys.addaudithook",
+)
+# Modules a job may not load, even indirectly through an allowed library.
+BLOCKED_MODULES = {
+    "socket", "_socket", "ssl", "_ssl", "subprocess", "_posixsubprocess", "ctypes", "_ctypes",
+    "multiprocessing", "_multiprocessing", "pty", "fcntl", "mmap", "signal", "_signal",
+    "pyarrow.csv", "pyarrow._csv", "pyarrow.json", "pyarrow._json", "pyarrow.parquet", "pyarrow._parquet",
+    "pyarrow.dataset", "pyarrow._dataset", "pyarrow.fs", "pyarrow._fs", "pyarrow.orc", "pyarrow._orc",
+    "pyarrow.feather",
+}
+# pyarrow opens paths in C++, which audit hooks do not see, so these are swapped out while a job runs.
+NATIVE_FILE_APIS = {
+    "pyarrow": ["memory_map", "create_memory_map", "OSFile", "input_stream", "output_stream"],
+    "pyarrow.lib": ["memory_map", "create_memory_map", "OSFile", "input_stream", "output_stream"],
+    "pyarrow.ipc": ["open_file", "open_stream", "new_file", "new_stream"],
+}
+_WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_TRUNC | os.O_APPEND
+_CODE_SUFFIXES = tuple(importlib.machinery.all_suffixes()) + (".pyc",)
+
+
+class SandboxViolation(PermissionError):
+    pass
+
+
+def _format_fields(text):
+    """Field names in a str.format template, including those nested in format specs."""
+    try:
+        parsed = list(string.Formatter().parse(text))
+    except ValueError:
+        return
+    for _, field, spec, _ in parsed:
+        if field:
+            yield field
+        if spec:
+            yield from _format_fields(spec)
+
+
+def make_import(allowed):
+    def _safe_import(name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name.split(".")[0] not in allowed:
+            raise ImportError(f"Import of '{name}' is not allowed in generated code.")
+        return __import__(name, globals, locals, fromlist, level)
+    return _safe_import
+
+
+def make_builtins(allowed=ALLOWED_IMPORTS):
+    safe = {
+        name: getattr(builtins, name)
+        for name in [
+            "abs", "all", "any", "bool", "dict", "enumerate", "filter", "float", "int", "isinstance",
+            "len", "list", "map", "max", "min", "range", "round", "set", "sorted", "str", "sum",
+            "tuple", "zip", "print", "ValueError", "KeyError", "TypeError", "Exception",
+        ]
+    }
+    safe["__import__"] = make_import(allowed)
+    return safe
+
+
+SAFE_BUILTINS = make_builtins()
+
+
+def check_code(code):
+    """
+    Rejects code that names anything starting with an underscore (`__class__`, `_socket`,
+    `__builtins__`), in code or in a format string field, which is how restricted builtins
+    are usually escaped.
+    Returns the compiled code object.
+    """
+    tree = ast.parse(code)
+    for node in ast.walk(tree):
+        name = None
+        if isinstance(node, ast.Attribute):
+            name = node.attr
+            # str.format looks attributes up itself ("{0.__class__}".format(df)), so it may only
+            # be called on a literal template, whose fields are checked below.
+            if name in ("format", "format_map") and not (
+                    isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)):
+                raise SandboxViolation(f"'{name}' may only be called on a string literal in generated code.")
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+            for field in _format_fields(node.value):
+                if any(part.startswith("_") for part in re.split(r"[.\[\]]", field)[1:]):
+                    raise SandboxViolation(f"'{{{field}}}' is not allowed in generated code.")
+        elif isinstance(node, ast.Name):
+            name = node.id
+        elif isinstance(node, ast.alias):
+            name = node.name.split(".")[-1]
+        if name and name.startswith("_") and name != "_":
+            raise SandboxViolation(f"'{name}' is not allowed in generated code.")
+    return compile(tree, "<generated>", "exec")
+
+
+class AuditGuard:
+    """
+    An audit hook (PEP 578) that, while a job runs, refuses the blocked events above, writes,
+    and reads outside the Python installation and the `readable` directories. Unlike the restricted
+    builtins it also covers modules reached through attributes (pd.io.common.os.system).
+    Audit hooks cannot be removed once installed, so this is for worker processes only.
+    """
+
+    def __init__(self, readable=()):
+        prefixes = {sys.prefix, sys.base_prefix, sys.exec_prefix}
+        self._roots = tuple(os.path.realpath(p) + os.sep for p in list(prefixes) + list(readable))
+        # Other sys.path entries (such as the app directory) only for lazily imported code, not data.
+        self._code_roots = tuple(os.path.realpath(p) + os.sep for p in sys.path if p and os.path.isdir(p))
+        self._active = False
+        sys.addaudithook(self._hook)
+
+    def _hook(self, event, args):
+        if not self._active:
+            return
+        if event == "open":
+            path, mode, flags = args
+            if mode is None:
+                writing = bool(flags & _WRITE_FLAGS)
+            else:
+                writing = bool(set(mode) & set("wax+"))
+            if writing:
+                raise SandboxViolation("Writing files is disabled in the execution sandbox.")
+            if not isinstance(path, (str, bytes)):
+                raise SandboxViolation("Opening file descriptors is disabled in the execution sandbox.")
+            path = os.path.realpath(os.fsdecode(path))
+            if path.startswith(self._roots) or (path.startswith(self._code_roots) and path.endswith(_CODE_SUFFIXES)):
+                return
+            raise SandboxViolation(f"Reading '{path}' is disabled in the execution sandbox.")
+        if event in ("os.listdir", "os.scandir") and isinstance(args[0], (str, bytes)):
+            # The import system lists sys.path entries to find lazily imported modules.
+            path = os.path.realpath(os.fsdecode(args[0])) + os.sep
+            if path.startswith(self._roots) or path in self._code_roots:
+                return
+        if event == "import":
+            if args[0] in BLOCKED_MODULES or args[0].split(".")[0] in BLOCKED_MODULES:
+                raise SandboxViolation(f"Import of '{args[0]}' is disabled in the execution sandbox.")
+            return
+        if event.startswith(BLOCKED_EVENT_PREFIXES):
+            raise SandboxViolation(f"'{event}' is disabled in the execution sandbox.")
+
+    def __enter__(self):
+        self._swapped = []
+        for module_name, names in NATIVE_FILE_APIS.items():
+            module = sys.modules.get(module_name)
+            for name in names if module is not None else ():
+                if hasattr(module, name):
+                    self._swapped.append((module, name, getattr(module, name)))
+                    setattr(module, name, _refuse_native_io)
+        self._active = True
+        return self
+
+    def __exit__(self, *exc):
+        self._active = False
+        for module, name, original in self._swapped:
+            setattr(module, name, original)
+
+
+def _refuse_native_io(*args, **kwargs):
+    raise SandboxViolation("File access is disabled in the execution sandbox.")
+
@@ -0,0 +1,135 @@
+import os
+import atexit
+import tempfile
+import itertools
+import threading
+from collections import OrderedDict
+
+from fingerprint import frame_fingerprint
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = None
+
+# Published frames kept mapped at once, e.g. the datasets of concurrent sessions.
+PUBLISHED_MAX = int(os.getenv("SHARED_FRAME_MAX", "4"))
+SHARED_DIR = os.getenv("SHARED_FRAME_DIR") or ("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+
+
+_serial = itertools.count()
+
+
+def arrow_available():
+    return pa is not None
+
+
+def to_arrow(df):
+    """Arrow table of `df` including the index, or None when a column cannot be represented in Arrow."""
+    try:
+        return pa.Table.from_pandas(df, preserve_index=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return None
+
+
+class SharedFrame:
+    """
+    A DataFrame published once as an Arrow IPC file in shared memory (/dev/shm when present).
+    Readers memory-map it read-only, so worker processes share the same pages instead of
+    each unpickling a private copy. The file is removed when the last reference is released.
+    """
+
+    def __init__(self, df, key=None, directory=SHARED_DIR, table=None):
+        self.key = key or frame_fingerprint(df)
+        # The serial number keeps a republished frame from sharing a path with an evicted one still in use.
+        self.path = os.path.join(directory, f"ai_analyst_{os.getpid()}_{self.key}_{next(_serial)}.arrow")
+        self.refs = 0
+        self._lock = threading.Lock()
+        if table is None:
+            table = pa.Table.from_pandas(df, preserve_index=True)
+        tmp_path = self.path + ".tmp"
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, self.path)
+
+    def acquire(self):
+        with self._lock:
+            self.refs += 1
+        return self
+
+    def release(self):
+        with self._lock:
+            self.refs -= 1
+            if self.refs <= 0:
+                self._unlink()
+
+    def _unlink(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def attach(path):
+    """
+    Reads a published frame through a read-only memory map. Numeric columns without nulls
+    are wrapped without copying; other columns are materialised by Arrow as usual.
+    Mapped pages stay valid even after the publisher unlinks the file.
+    """
+    source = pa.memory_map(path, "r")
+    table = ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True, zero_copy_only=False)
+
+
+_published = OrderedDict()
+_published_lock = threading.Lock()
+# Writing a frame takes a while; this keeps two threads from writing the same one.
+_writer_lock = threading.Lock()
+
+
+def publish(df, key=None):
+    """
+    Publishes `df`, or finds it among the PUBLISHED_MAX most recent frames (several sessions
+    can share one pool), and returns the SharedFrame with a reference already held for the
+    caller, who must release() it after handing the path to a reader. Frames pushed out of
+    the registry disappear once no job is still using them. Returns None when a column
+    cannot be represented in Arrow (e.g. mixed ints and strings); pickle the frame instead.
+    `key` is df's frame_fingerprint when the caller already has it.
+    """
+    key = key or frame_fingerprint(df)
+    with _published_lock:
+        shared = _published.get(key)
+        if shared is not None:
+            _published.move_to_end(key)
+            return shared.acquire()
+    evicted = []
+    with _writer_lock:
+        with _published_lock:
+            shared = _published.get(key)
+        if shared is None:
+            table = to_arrow(df)
+            if table is None:
+                return None
+            # The registry holds one reference, the caller the other.
+            shared = SharedFrame(df, key=key, table=table).acquire()
+            with _published_lock:
+                _published[key] = shared
+                while len(_published) > PUBLISHED_MAX:
+                    evicted.append(_published.popitem(last=False)[1])
+        shared.acquire()
+    for old in evicted:
+        old.release()
+    return shared
+
+
+def release_all():
+    with _published_lock:
+        frames = list(_published.values())
+        _published.clear()
+    for shared in frames:
+        shared.release()
+
+
+atexit.register(release_all)
@@ -0,0 +1,152 @@
+import os
+import time
+import hashlib
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:
+    pa = None
+
+SIDECAR_DIR = os.getenv("SIDECAR_DIR", ".dataset_cache")
+SIDECAR_DISABLE = os.getenv("SIDECAR_DISABLE", "") not in ("", "0", "false")
+# Least recently used sidecars are deleted above this total size. DuckDB's Parquet copies of
+# large files share the directory but have their own budget (DUCKDB_PARQUET_MAX_MB).
+SIDECAR_MAX_MB = int(os.getenv("SIDECAR_MAX_MB", "2048"))
+SIDECAR_SUFFIXES = (".arrow",)
+
+
+def sidecar_enabled():
+    return pa is not None and not SIDECAR_DISABLE
+
+
+def source_key(*parts):
+    """Key for a dataset that is not identified by its bytes, e.g. ("db", host, port, database, table)."""
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(repr(part).encode())
+    return h.hexdigest()
+
+
+def sidecar_path(key, directory=None):
+    return os.path.join(directory or SIDECAR_DIR, f"{key}.arrow")
+
+
+def mark_used(path):
+    """Records a use in the access time; the modification time stays the time it was written."""
+    try:
+        os.utime(path, (time.time(), os.stat(path).st_mtime))
+    except OSError:
+        pass
+
+
+def sidecar_age(key, directory=None):
+    """Seconds since the sidecar for `key` was written, or None if there is none."""
+    try:
+        return time.time() - os.stat(sidecar_path(key, directory)).st_mtime
+    except OSError:
+        return None
+
+
+def prune_sidecars(max_bytes=None, directory=None, keep=(), suffixes=SIDECAR_SUFFIXES):
+    """
+    Deletes the least recently used files ending in `suffixes` until they take at most
+    `max_bytes` (SIDECAR_MAX_MB by default), never the paths in `keep`. Frames already
+    memory-mapped stay readable after their file is deleted. Returns the deleted paths.
+    """
+    directory = directory or SIDECAR_DIR
+    max_bytes = SIDECAR_MAX_MB * 2**20 if max_bytes is None else max_bytes
+    keep = {os.path.abspath(p) for p in keep}
+    files = []
+    try:
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.endswith(suffixes):
+                stat = entry.stat()
+                files.append((stat.st_atime, stat.st_size, entry.path))
+    except FileNotFoundError:
+        return []
+    total = sum(size for _, size, _ in files)
+    removed = []
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if os.path.abspath(path) in keep:
+            continue
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed.append(path)
+    return removed
+
+
+def write_sidecar(key, df, directory=None):
+    """
+    Stores `df` as an uncompressed Arrow IPC file, the layout that can be memory-mapped and
+    read column by column without decoding. Returns the path, or None when pyarrow is missing,
+    sidecars are disabled or a column cannot be represented in Arrow.
+    """
+    if not sidecar_enabled():
+        return None
+    path = sidecar_path(key, directory)
+    try:
+        table = pa.Table.from_pandas(df)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    prune_sidecars(directory=directory, keep=[path])
+    return path
+
+
+def open_sidecar(key, directory=None):
+    """The stored table, memory-mapped (nothing is read until columns are used), or None."""
+    if not sidecar_enabled():
+        return None
+    path = sidecar_path(key, directory)
+    if not os.path.exists(path):
+        return None
+    mark_used(path)
+    return ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+
+def read_sidecar(key, columns=None, directory=None):
+    """DataFrame from the sidecar, limited to `columns` when given, or None if there is none."""
+    table = open_sidecar(key, directory)
+    if table is None:
+        return None
+    if columns is not None:
+        table = table.select([c for c in columns if c in table.column_names])
+    return table.to_pandas(split_blocks=True)
+
+
+def _run_benchmark(n_rows=5_000_000, path="/tmp/ingest_benchmark.csv"):
+    import tempfile
+    import pandas as pd
+    from csv_ingest import read_csv_chunked, _write_sample_csv
+
+    if not os.path.exists(path):
+        _write_sample_csv(path, n_rows)
+    print(f"{os.path.getsize(path) / 2**20:.0f} MB CSV")
+    directory = tempfile.mkdtemp()
+
+    def timed(label, fn):
+        start = time.perf_counter()
+        result = fn()
+        print(f"{label:32s}: {time.perf_counter() - start:.3f}s")
+        return result
+
+    timed("cold pd.read_csv", lambda: pd.read_csv(path))
+    df, _ = timed("cold read_csv_chunked", lambda: read_csv_chunked(path))
+    timed("write sidecar", lambda: write_sidecar("bench", df, directory))
+    timed("warm sidecar, all columns", lambda: read_sidecar("bench", directory=directory))
+    timed("warm sidecar, GPA + Department", lambda: read_sidecar("bench", ["GPA", "Department"], directory))
+
+
+if __name__ == "__main__":
+    _run_benchmark()
@@ -1,11 +1,22 @@
 import streamlit as st
 import pandas as pd
 import sqlalchemy
-from io import StringIO
+from io import StringIO, BytesIO
 from get_llm_response import get_response
+from dataset_store import DatasetStore
+from csv_ingest import read_csv_chunked
+from excel_ingest import list_sheets, read_sheet
+from upload_cache import load_upload
+from sidecar import source_key, read_sidecar, write_sidecar, sidecar_age
+from duckdb_engine import DuckEngine, duckdb_available, DATA_DIR as DUCKDB_DATA_DIR
+from chart_render import render_plot_async, RenderError
+from fingerprint import frame_fingerprint
+from chart_spec import generate_chart_spec, render_chart_spec_async
+from model_router import use_heavy_model, route_metrics
+from query_planner import try_answer, planner_stats
 from req_functions import (
     classify_query, generate_plot, generate_insight, check_data_quality, update_data, ask_question,
-    check_col_values, is_primary_key, is_dependent, list_col_names)
+    check_col_values, is_primary_key, is_dependent, list_col_names, answer_query, apply_update)
 
 # ------------------------------
 # Session State Initialization
@@ -13,9 +24,33 @@ from req_functions import (
 if "df" not in st.session_state:
     st.session_state.df = None
 
+if "store" not in st.session_state:
+    st.session_state.store = None
+
+if "upload_id" not in st.session_state:
+    st.session_state.upload_id = None
+
+if "duck_engine" not in st.session_state:
+    st.session_state.duck_engine = None
+
+if "sheet_names" not in st.session_state:
+    st.session_state.sheet_names = (None, [])
+
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
+if "dataset_fingerprint" not in st.session_state:
+    st.session_state.dataset_fingerprint = (None, None)
+
+
+def dataset_key(df):
+    """frame_fingerprint of `df`, computed once per loaded dataset or version instead of once per chart and rerun."""
+    frame, key = st.session_state.dataset_fingerprint
+    if frame is not df:
+        key = frame_fingerprint(df)
+        st.session_state.dataset_fingerprint = (df, key)
+    return key
+
 if "model_name" not in st.session_state:
     st.session_state.model_name = "llama-3.3-70b-versatile"
 if "temp" not in st.session_state:
@@ -24,6 +59,12 @@ if "top_p" not in st.session_state:
     st.session_state.top_p = 1.0
 if "max_tokens" not in st.session_state:
     st.session_state.max_tokens = 300
+if "single_call" not in st.session_state:
+    st.session_state.single_call = False
+if "code_interpreter" not in st.session_state:
+    st.session_state.code_interpreter = False
+if "chart_spec" not in st.session_state:
+    st.session_state.chart_spec = True
 
 # ------------------------------
 # Helper Functions
@@ -127,6 +168,13 @@ def load_table_from_db(connection_string, table_name):
     with engine.connect() as conn:
         return pd.read_sql_table(table_name, conn)
 
+def format_age(seconds):
+    for unit, size in (("day", 86400), ("hour", 3600), ("minute", 60)):
+        if seconds >= size:
+            n = int(seconds // size)
+            return f"{n} {unit}{'s' if n != 1 else ''}"
+    return "less than a minute"
+
 # ------------------------------
 # Streamlit UI
 # ------------------------------
@@ -147,6 +195,15 @@ with st.sidebar:
         st.session_state.temp = st.slider("Temperature", 0.0, 1.0, st.session_state.temp, step=0.05)
         st.session_state.top_p = st.slider("Top-p", 0.0, 1.0, st.session_state.top_p, step=0.05)
         st.session_state.max_tokens = st.number_input("Max New Tokens", min_value=50, max_value=2048, value=st.session_state.max_tokens)
+        st.session_state.single_call = st.checkbox("Single-call mode (route and answer in one request)", value=st.session_state.single_call)
+        st.session_state.code_interpreter = st.checkbox("Code interpreter mode (send schema only, compute locally)", value=st.session_state.code_interpreter)
+        st.session_state.chart_spec = st.checkbox("Chart-spec mode (aggregate locally before plotting)", value=st.session_state.chart_spec)
+    with st.expander("LLM Route Metrics"):
+        st.json(route_metrics())
+        st.json({"planner": planner_stats()})
+
+# Heavy reasoning tasks use the selected model, routing and repair stay on the light model.
+use_heavy_model(st.session_state.model_name)
 
 uploaded_file = st.file_uploader("Upload CSV or Excel file", type=["csv", "xlsx"])
 
@@ -168,27 +225,91 @@ with st.expander("🔌 Database Connector"):
                 inspector = sqlalchemy.inspect(conn)
                 tables = inspector.get_table_names()
                 table_selected = st.selectbox("Select a table", tables)
+                table_key = source_key("db", db_user, db_host, db_port, db_name, table_selected)
+                cached_age = sidecar_age(table_key)
+                # The local copy is not checked against the database, so it is only used when asked for.
+                use_cached = False
+                if cached_age is not None:
+                    use_cached = st.checkbox("Use the local copy (faster, may be out of date)", value=False, key="use_table_copy")
+                    st.caption(f"Local copy saved {format_age(cached_age)} ago.")
                 if st.button("Load Table"):
-                    df = load_table_from_db(db_url, table_selected)
+                    df = read_sidecar(table_key) if use_cached else None
+                    from_cache = df is not None
+                    if df is None:
+                        df = load_table_from_db(db_url, table_selected)
+                        write_sidecar(table_key, df)
                     st.session_state.df = df
+                    st.session_state.store = DatasetStore(df, f"Loaded table '{table_selected}'")
+                    st.session_state.duck_engine = None
                     st.session_state.chat_history = []
-                    st.success(f"Loaded table '{table_selected}' from database!")
+                    if from_cache:
+                        st.success(f"Loaded table '{table_selected}' from the local copy saved {format_age(cached_age)} ago.")
+                    else:
+                        st.success(f"Loaded table '{table_selected}' from database!")
         except Exception as e:
             st.error(f"Database connection error: {e}")
 
+with st.expander("🦆 Large File (DuckDB, out of core)"):
+    # Files larger than memory stay on disk; questions, commands and profiling run as SQL in DuckDB.
+    large_path = st.text_input(f"CSV or Parquet path inside {DUCKDB_DATA_DIR}/ (globs like *.parquet work)", key="duck_path")
+    if st.button("Open with DuckDB", disabled=not duckdb_available()) and large_path.strip():
+        try:
+            duck = DuckEngine(large_path.strip())
+            st.session_state.duck_engine = duck
+            st.session_state.df = duck.sample()
+            st.session_state.store = None  # Updates need the data in memory.
+            st.session_state.chat_history = []
+            st.success(f"Opened {large_path} ({duck.row_count():,} rows) with DuckDB.")
+        except Exception as e:
+            st.error(f"Error opening file with DuckDB: {e}")
+    if not duckdb_available():
+        st.caption("Install duckdb to analyse files larger than memory.")
+
+def parse_upload(name, data, sheet=None):
+    if name.endswith(".csv"):
+        df, ingest_stats = read_csv_chunked(BytesIO(data))
+        st.caption(f"Read {ingest_stats['rows']:,} rows in {ingest_stats['seconds']}s: "
+                   f"{ingest_stats['frame_mb']} MB in memory, peak RSS {ingest_stats['peak_rss_mb']} MB, "
+                   f"categorical: {', '.join(ingest_stats['categorical']) or 'none'}")
+        return df
+    df, ingest_stats = read_sheet(data, sheet if sheet is not None else 0)
+    st.caption(f"Read sheet '{ingest_stats['sheet']}' ({ingest_stats['rows']:,} rows) "
+               f"with {ingest_stats['engine']} in {ingest_stats['seconds']}s")
+    return df
+
+
+# Streamlit reruns this script on every click; only a different upload is parsed and resets the session.
 if uploaded_file is not None:
-    try:
-        if uploaded_file.name.endswith(".csv"):
-            df = pd.read_csv(uploaded_file)
-        else:
-            df = pd.read_excel(uploaded_file)
+    upload_id = getattr(uploaded_file, "file_id", None) or (uploaded_file.name, uploaded_file.size)
+    sheet = None
+    if not uploaded_file.name.endswith(".csv"):
+        # Sheet names come from the workbook index; only the selected sheet is parsed.
+        if st.session_state.sheet_names[0] != upload_id:
+            try:
+                st.session_state.sheet_names = (upload_id, list_sheets(uploaded_file.getvalue()))
+            except Exception as e:
+                st.error(f"Error reading workbook: {e}")
+        sheets = st.session_state.sheet_names[1]
+        if len(sheets) > 1:
+            sheet = st.selectbox("Sheet", sheets, key="excel_sheet")
+        elif sheets:
+            sheet = sheets[0]
+        upload_id = (upload_id, sheet)
+    if st.session_state.upload_id != upload_id:
+        try:
+            df, source = load_upload(uploaded_file.name, uploaded_file.getvalue(),
+                                     lambda data: parse_upload(uploaded_file.name, data, sheet), variant=sheet)
 
-        st.session_state.df = df
-        st.session_state.chat_history = []  # Clear chat history on new upload
-        st.success("File uploaded successfully!")
+            st.session_state.df = df
+            label = uploaded_file.name + (f" [{sheet}]" if sheet is not None else "")
+            st.session_state.store = DatasetStore(df, f"Uploaded {label}")
+            st.session_state.duck_engine = None
+            st.session_state.chat_history = []  # Clear chat history on new upload
+            st.session_state.upload_id = upload_id
+            st.success("File uploaded successfully!" if source == "parsed" else f"File loaded from the {source} cache.")
 
-    except Exception as e:
-        st.error(f"Error reading file: {e}")
+        except Exception as e:
+            st.error(f"Error reading file: {e}")
 
 # ------------------------------
 # Data Summary and Chat Section
@@ -230,8 +351,14 @@ def render_output(obj):
 
 if st.session_state.df is not None:
     df = st.session_state.df
+    # With DuckDB, `df` is a sample for previews and handlers get the engine, which queries the whole file.
+    duck = st.session_state.duck_engine
+    data = duck if duck is not None else df
     st.markdown("### 🔍 Initial Data Summary")
-    st.info(f"**Total Rows:** {len(df)}  |  **Total Columns:** {len(df.columns)}")
+    if duck is not None:
+        st.info(f"**Total Rows:** {duck.row_count():,}  |  **Total Columns:** {len(df.columns)}  |  summary below from a {len(df):,}-row sample")
+    else:
+        st.info(f"**Total Rows:** {len(df)}  |  **Total Columns:** {len(df.columns)}")
     
     summaries, base_filename = generate_column_summary(df)
     summary_df = pd.DataFrame.from_dict(summaries, orient='index').map(str).reset_index()
@@ -251,12 +378,60 @@ if st.session_state.df is not None:
     if st.session_state.chat_history:
         st.markdown("---")
         st.subheader("💬 Chat History")
-        for user_query, bot_reply in st.session_state.chat_history:
+        # Start every chart render up front, they run in the execution pool while the text is drawn.
+        # Charts already rendered for this dataset come straight from the figure cache.
+        charts = [(i, entry[2]) for i, entry in enumerate(st.session_state.chat_history) if len(entry) > 2 and entry[2]]
+        key = dataset_key(df) if charts else None
+        renders = {
+            i: (duck.render_chart_async(chart) if duck is not None else render_chart_spec_async(chart, df, "png", key))
+            if isinstance(chart, dict) else render_plot_async(chart, df, "png", key)
+            for i, chart in charts
+        }
+        for i, (user_query, bot_reply, *_) in enumerate(st.session_state.chat_history):
             with st.container():
                 st.markdown(f"**🧑 User:** {user_query}")
                 st.markdown(f"**🤖 AI:** {bot_reply}")
+                if i in renders:
+                    try:
+                        for figure in renders[i].result():
+                            st.image(figure)
+                    except Exception as e:
+                        st.warning(f"Could not render the chart: {e}")
                 st.markdown("---")
 
+    # ------------------------------
+    # Dataset versions (update_data edits)
+    # ------------------------------
+    def set_current_df(new_df):
+        st.session_state.df = new_df
+
+    def apply_update_answer(answer, code, description):
+        if not code:
+            return answer
+        try:
+            new_df, changed = apply_update(st.session_state.store, code, description)
+        except Exception as e:
+            return f"{answer}\n\n❌ Update was not applied: {e}"
+        set_current_df(new_df)
+        return f"{answer}\n\n✅ Update applied (version {st.session_state.store.position}), changed columns: {', '.join(changed) or 'none'}, rows: {len(new_df)}"
+
+    store = st.session_state.store
+    if store is not None:
+        undo_col, redo_col, history_col = st.columns([1, 1, 4])
+        with undo_col:
+            if st.button("↩️ Undo", disabled=not store.can_undo(), key="undo_btn"):
+                set_current_df(store.undo())
+                st.rerun()
+        with redo_col:
+            if st.button("↪️ Redo", disabled=not store.can_redo(), key="redo_btn"):
+                set_current_df(store.redo())
+                st.rerun()
+        with history_col:
+            with st.expander("🕘 Version History"):
+                st.dataframe(pd.DataFrame(store.history()))
+                if store.position > 0:
+                    st.json(store.diff(store.position - 1, store.position))
+
     st.markdown("### 🛠️ Run Backend Command")
     command_options = {
         "Check Column Values": "check_col_values",
@@ -274,7 +449,7 @@ if st.session_state.df is not None:
     if st.button("Run Command", key="run_command_btn"):
         func_name = command_options[selected_command]
         try:
-            result = globals()[func_name](df, selected_columns)
+            result = globals()[func_name](data, selected_columns)
         except Exception as e:
             result = f"❌ Error running `{func_name}`: {e}"
         displayable_result = render_output(result)
@@ -285,20 +460,45 @@ if st.session_state.df is not None:
     user_input = st.text_input("Ask a question about your data:", key="chat_input")
 
     if st.button("Send", key="chat_send_btn") and user_input.strip():
-        decision = classify_query(user_input)
-        code = None
-        if decision == "graph":
-            answer, code = generate_plot(df, user_input)
-        elif decision == "insight":
-            answer = generate_insight(df, user_input)
-        elif decision == "quality_check":
-            answer = check_data_quality(df, user_input)
-        elif decision == "update_data":
-            answer, code_updation = update_data(df, user_input)
+        # Counts, aggregations and rankings are answered by the local planner without an LLM call.
+        planned = try_answer(df, user_input, engine=duck)
+        if planned is not None:
+            decision, answer, code = "text", planned, None
+        elif st.session_state.single_call:
+            decision, answer, code = answer_query(data, user_input)
+            if decision == "update_data":
+                answer = apply_update_answer(answer, code, user_input)
         else:
-            answer = ask_question(df, user_input)
-
-        st.session_state.chat_history.append((user_input, answer))
+            decision = classify_query(user_input)
+            code = None
+            if decision == "graph" and st.session_state.chart_spec:
+                # A declarative spec is aggregated with pandas/numpy, so large tables plot quickly.
+                try:
+                    answer, code = generate_chart_spec(df, user_input)
+                except RenderError:
+                    answer, code = generate_plot(data, user_input)
+            elif decision == "graph":
+                answer, code = generate_plot(data, user_input)
+            elif decision == "update_data":
+                answer, code_updation = update_data(data, user_input)
+                answer = apply_update_answer(answer, code_updation, user_input)
+            elif duck is not None:
+                answer = ask_question(duck, user_input)
+            elif st.session_state.code_interpreter and decision in ("insight", "text"):
+                answer = ask_question(df, user_input, code_interpreter=True)
+            else:
+                # Text answers are streamed so the first tokens show up while the rest is generated.
+                if decision == "insight":
+                    tokens = generate_insight(df, user_input, stream=True)
+                elif decision == "quality_check":
+                    tokens = check_data_quality(df, user_input, stream=True)
+                else:
+                    tokens = ask_question(df, user_input, stream=True)
+                st.markdown(f"**🧑 User:** {user_input}")
+                answer = st.write_stream(tokens)
+
+        # Plot code is kept with the answer so the chart can be rendered (and re-shown from cache).
+        st.session_state.chat_history.append((user_input, answer, code if decision == "graph" else None))
         st.rerun()
     
 
@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def students():
+    return pd.read_csv(os.path.join(ROOT, "student_data.csv"))
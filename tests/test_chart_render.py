@@ -0,0 +1,32 @@
+import pytest
+
+import chart_render
+import chart_spec
+import shared_frame
+from chart_render import render_plot
+from chart_spec import render_chart_spec
+from fingerprint import frame_fingerprint
+
+
+@pytest.fixture
+def no_fingerprinting(monkeypatch):
+    def refuse(df, sample=False):
+        raise AssertionError("the dataset was fingerprinted again")
+
+    for module in (chart_render, chart_spec, shared_frame):
+        monkeypatch.setattr(module, "frame_fingerprint", refuse)
+
+
+def test_render_plot_uses_the_given_dataset_key(students, no_fingerprinting):
+    key = frame_fingerprint(students)
+    code = "import matplotlib.pyplot as plt\nplt.plot(df['GPA'].to_numpy())"
+    first = render_plot(code, students, dataset_key=key)
+    assert len(first) == 1
+    assert render_plot(code, students, dataset_key=key) is first
+
+
+def test_render_chart_spec_uses_the_given_dataset_key(students, no_fingerprinting):
+    key = frame_fingerprint(students)
+    spec = chart_spec.validate_spec({"chart": "bar", "x": "Department", "y": "GPA"}, students)
+    first = render_chart_spec(spec, students, dataset_key=key)
+    assert render_chart_spec(spec, students, dataset_key=key) is first
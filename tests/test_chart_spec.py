@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from chart_render import RenderError
+from chart_spec import MAX_BARS, aggregate, lttb, validate_spec
+
+
+@pytest.mark.parametrize("spec", [
+    {"chart": "scatter", "x": "GPA"},
+    {"chart": "scatter", "x": "GPA", "y": "Department"},
+    {"chart": "histogram", "x": "Department"},
+    {"chart": "box", "x": "Department"},
+    {"chart": "bar", "x": "Department", "y": "Gender", "agg": "mean"},
+    {"chart": "bar", "x": "Nope"},
+    {"chart": "radar", "x": "GPA"},
+    {"chart": "bar", "x": "Department", "agg": "mode"},
+    {"chart": "histogram", "x": "GPA", "bins": 0},
+    {"chart": "histogram", "x": "GPA", "bins": "many"},
+])
+def test_validate_spec_rejects(students, spec):
+    with pytest.raises(RenderError):
+        validate_spec(spec, students)
+
+
+def test_validate_spec_normalises(students):
+    spec = validate_spec({"chart": "Bar", "x": "Department", "y": "GPA", "agg": "Average"}, students)
+    assert (spec["chart"], spec["agg"], spec["bins"]) == ("bar", "mean", 20)
+    assert validate_spec({"chart": "bar", "x": "Department", "y": "Gender", "agg": "count"}, students)
+    assert validate_spec({"chart": "box", "x": "Department", "y": "GPA", "group": "Gender"}, students)
+
+
+def test_aggregate_histogram(students):
+    data = aggregate(validate_spec({"chart": "histogram", "x": "GPA", "bins": 7}, students), students)
+    assert data["counts"].sum() == students["GPA"].notna().sum()
+    assert len(data["edges"]) == 8
+
+
+def test_aggregate_bar(students):
+    data = aggregate(validate_spec({"chart": "bar", "x": "Department", "y": "GPA"}, students), students)
+    assert data["table"].round(6).equals(students.groupby("Department")["GPA"].mean().round(6))
+
+
+def test_aggregate_bar_keeps_the_largest_groups():
+    df = pd.DataFrame({"k": np.arange(200) % 100, "v": np.arange(200)})
+    data = aggregate(validate_spec({"chart": "bar", "x": "k", "y": "v", "agg": "sum"}, df), df)
+    assert len(data["table"]) == MAX_BARS
+    assert data["table"].index[0] == 99
+
+
+def test_aggregate_large_scatter_becomes_a_density_grid():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"a": rng.normal(size=50_000), "b": rng.normal(size=50_000)})
+    data = aggregate(validate_spec({"chart": "scatter", "x": "a", "y": "b"}, df), df)
+    assert data["density"].sum() == len(df)
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    x = np.arange(10_000, dtype=np.float64)
+    y = np.sin(x / 500)
+    y[4321] = 50
+    dx, dy = lttb(x, y, 100)
+    assert len(dx) == 100
+    assert (dx[0], dx[-1]) == (0, 9999)
+    assert np.all(np.diff(dx) > 0)
+    assert 50 in dy
+
+
+def test_lttb_returns_short_series_unchanged():
+    x, y = np.arange(5.0), np.arange(5.0)
+    assert lttb(x, y, 10)[0] is x
@@ -0,0 +1,91 @@
+import pandas as pd
+import pytest
+
+import code_interpreter
+from code_interpreter import compute_answer, extract_code, format_result, run_pandas_code
+
+
+@pytest.fixture
+def replies(monkeypatch):
+    """Queues model replies and records (task, system prompt) for every call."""
+    queue, calls = [], []
+
+    def fake(task, system_prompt, user_query):
+        calls.append((task, system_prompt))
+        return queue.pop(0)
+
+    monkeypatch.setattr(code_interpreter, "routed_response", fake)
+    monkeypatch.setattr(code_interpreter, "USE_EXEC_POOL", False)
+    return queue, calls
+
+
+def test_extract_code():
+    assert extract_code("Here:\n```python\nresult = 1\n```\nDone") == "result = 1"
+    assert extract_code("```\nresult = 2\n```") == "result = 2"
+    assert extract_code("  result = 3  ") == "result = 3"
+
+
+def test_run_pandas_code_works_on_a_copy(students):
+    result = run_pandas_code("df['GPA'] = 0\nresult = df['GPA'].sum()", students)
+    assert result == 0
+    assert students["GPA"].sum() > 0
+
+
+def test_run_pandas_code_needs_a_result(students):
+    with pytest.raises(ValueError, match="result"):
+        run_pandas_code("x = df['GPA'].mean()", students)
+
+
+def test_run_pandas_code_restricts_imports(students):
+    assert run_pandas_code("import math\nresult = math.floor(2.5)", students) == 2
+    with pytest.raises(ImportError):
+        run_pandas_code("import os\nresult = os.getcwd()", students)
+    with pytest.raises(NameError):
+        run_pandas_code("result = open('student_data.csv').read()", students)
+
+
+def test_format_result_stays_under_the_token_limit():
+    frame = pd.DataFrame({"a": range(10), "b": ["x" * 50] * 10})
+    assert format_result(frame) == frame.to_string(max_rows=50)
+    text = format_result("word " * 5000, token_limit=100)
+    assert text.endswith("... (truncated)")
+    assert code_interpreter.count_tokens(text) <= 100
+
+
+def test_first_answer_is_used_when_it_runs(students, replies):
+    queue, calls = replies
+    queue.append("```python\nresult = df['GPA'].max()\n```")
+    code, result = compute_answer(students, "Highest GPA?", run=run_pandas_code)
+    assert code == "result = df['GPA'].max()"
+    assert result == students["GPA"].max()
+    assert [task for task, _ in calls] == ["code_gen"]
+    # Only the schema is sent, never the rows.
+    assert students["Student_ID"].iloc[-1] not in calls[0][1]
+
+
+def test_failing_code_is_repaired_with_the_error(students, replies):
+    queue, calls = replies
+    queue.extend(["result = df['gpa'].max()", "```python\nresult = df['GPA'].max()\n```"])
+    code, result = compute_answer(students, "Highest GPA?", run=run_pandas_code)
+    assert result == students["GPA"].max()
+    assert [task for task, _ in calls] == ["code_gen", "code_repair"]
+    assert "KeyError" in calls[1][1] and "df['gpa']" in calls[1][1]
+
+
+def test_repairs_are_limited(students, replies):
+    queue, calls = replies
+    queue.extend(["result = df['missing'].max()"] * (code_interpreter.MAX_REPAIRS + 1))
+    with pytest.raises(KeyError):
+        compute_answer(students, "Highest?", run=run_pandas_code)
+    assert len(calls) == code_interpreter.MAX_REPAIRS + 1
+    queue.extend(["result = df['missing'].max()"] * (code_interpreter.MAX_REPAIRS + 1))
+    assert code_interpreter.answer_with_code(students, "Highest?").startswith("❌")
+
+
+def test_answer_is_narrated_from_the_computed_result(students, replies):
+    queue, calls = replies
+    queue.extend(["result = round(df['GPA'].mean(), 3)", "The mean GPA is given above."])
+    assert code_interpreter.answer_with_code(students, "Mean GPA?") == "The mean GPA is given above."
+    task, system_prompt = calls[-1]
+    assert task == "narrate"
+    assert str(round(students["GPA"].mean(), 3)) in system_prompt
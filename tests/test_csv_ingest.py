@@ -0,0 +1,67 @@
+import io
+import sys
+
+import pandas as pd
+import pytest
+
+import csv_ingest
+from csv_ingest import optimize_dtypes, read_csv_chunked
+
+
+def _csv(df):
+    return io.BytesIO(df.to_csv(index=False).encode())
+
+
+def test_integers_keep_their_width_by_default(students):
+    df, _ = read_csv_chunked(_csv(students))
+    assert df["Age"].dtype == "int64"
+    assert (df["Age"] * 12).equals(students["Age"] * 12)
+
+
+def test_integer_downcast_is_opt_in(students, monkeypatch):
+    monkeypatch.setattr(csv_ingest, "DOWNCAST_INTS", True)
+    df, _ = read_csv_chunked(_csv(students))
+    assert df["Age"].dtype.itemsize < 8
+
+
+def test_repetitive_strings_become_categoricals(students):
+    df, stats = read_csv_chunked(_csv(students))
+    assert "Department" in stats["categorical"]
+    assert "Student_ID" not in stats["categorical"]
+    assert df["Department"].astype(str).equals(students["Department"])
+    assert df["GPA"].equals(students["GPA"])
+
+
+@pytest.mark.parametrize("block_size", [1 << 10, 1 << 20])
+def test_small_blocks_give_the_same_frame(students, block_size):
+    df, stats = read_csv_chunked(_csv(students), block_size=block_size)
+    assert stats["rows"] == len(students)
+    assert df.astype(object).equals(students.astype(object))
+
+
+def test_falls_back_to_pandas_when_a_later_block_changes_type():
+    text = "a,b\n" + "1,x\n" * 2000 + "oops,y\n"
+    df, stats = read_csv_chunked(io.BytesIO(text.encode()), block_size=1 << 10)
+    assert stats["engine"] == "c"
+    assert len(df) == 2001
+
+
+def test_optimize_dtypes(students):
+    df = optimize_dtypes(students.copy())
+    assert isinstance(df["Gender"].dtype, pd.CategoricalDtype)
+    assert df["Credits_Completed"].dtype == "int64"
+
+
+def test_dates_stay_strings_like_pd_read_csv():
+    text = "Enrolled,Seen,Name\n" + "2024-01-05,2024-01-05T10:00:00,a\n2023-09-01,2023-09-01 08:30,b\n" * 50
+    expected = pd.read_csv(io.BytesIO(text.encode()))
+    df, stats = read_csv_chunked(io.BytesIO(text.encode()))
+    assert stats["engine"] == "pyarrow"
+    assert df.astype(object).equals(expected.astype(object))
+
+
+def test_stats_without_the_resource_module(students, monkeypatch):
+    monkeypatch.setitem(sys.modules, "resource", None)
+    df, stats = read_csv_chunked(_csv(students))
+    assert len(df) == len(students)
+    assert stats["peak_rss_mb"] is None and stats["peak_rss_growth_mb"] is None
@@ -0,0 +1,105 @@
+import numpy as np
+
+from csv_ingest import optimize_dtypes
+import dataset_store
+from dataset_store import DatasetStore, RowSelection, editable_frame, restore_categoricals
+
+
+def _update(store, edit):
+    current = store.current()
+    df = editable_frame(current).copy()
+    edit(df)
+    return store.apply(restore_categoricals(df, current), "edit")
+
+
+def test_loc_assignment_of_new_category(students):
+    store = DatasetStore(optimize_dtypes(students.copy()))
+
+    def edit(df):
+        df.loc[0, "Department"] = "Law"
+
+    assert _update(store, edit) == ["Department"]
+    assert store.current().loc[0, "Department"] == "Law"
+
+
+def test_unchanged_categoricals_are_shared(students):
+    store = DatasetStore(optimize_dtypes(students.copy()))
+
+    def edit(df):
+        df["GPA"] = df["GPA"] + 0.1
+
+    assert _update(store, edit) == ["GPA"]
+    assert store.version.columns["Gender"] is store.versions[0].columns["Gender"]
+
+
+def test_undo_redo(students):
+    store = DatasetStore(students.copy())
+
+    def edit(df):
+        df.loc[3, "Age"] = 99
+
+    _update(store, edit)
+    assert store.undo().loc[3, "Age"] == students.loc[3, "Age"]
+    assert store.redo().loc[3, "Age"] == 99
+    assert store.diff(0, 1)["changed"] == {"Age": 1}
+
+
+def test_diff_with_new_categories(students):
+    store = DatasetStore(optimize_dtypes(students.copy()))
+
+    def edit(df):
+        df.loc[[0, 1], "Department"] = "Law"
+
+    _update(store, edit)
+    assert store.diff(0, 1)["changed"] == {"Department": 2}
+
+
+def test_current_is_built_from_the_stored_columns(students):
+    store = DatasetStore(students.copy())
+
+    def edit(df):
+        df["GPA"] = df["GPA"] * 2
+
+    _update(store, edit)
+    assert store.current()["GPA"].equals(students["GPA"] * 2)
+    assert np.shares_memory(store.current()["Age"].to_numpy(), store.version.columns["Age"].to_numpy())
+
+
+def _filter(store, keep):
+    return store.apply(restore_categoricals(editable_frame(store.current()).loc[keep], store.current()), "filter")
+
+
+def test_row_filter_refers_to_the_parent_rows(students):
+    store = DatasetStore(optimize_dtypes(students.copy()))
+    assert _filter(store, lambda df: df["GPA"] > 3) == []
+    expected = students[students["GPA"] > 3]
+    assert all(isinstance(col, RowSelection) for col in store.version.columns.values())
+    assert store.current().astype(object).equals(expected.astype(object))
+    assert store.diff(0, 1) == {"added": [], "removed": [], "changed": {}, "rows": (len(students), len(expected)),
+                                "rows_removed": len(students) - len(expected), "rows_added": 0}
+    assert store.undo().equals(store.versions[0].to_frame())
+
+
+def test_edits_after_a_filter_are_patches(students):
+    store = DatasetStore(students.copy())
+    _filter(store, lambda df: df.sort_values("GPA").drop_duplicates("Department").index)
+
+    def edit(df):
+        df.iloc[0, df.columns.get_loc("Age")] = 99
+
+    assert _update(store, edit) == ["Age"]
+    assert store.current()["Age"].iloc[0] == 99
+    assert store.diff(1, 2)["changed"] == {"Age": 1}
+    assert store.diff(0, 2)["changed"] == {"Age": 1}
+
+
+def test_long_chains_are_compacted(students, monkeypatch):
+    monkeypatch.setattr(dataset_store, "MAX_CHAIN_DEPTH", 3)
+    store = DatasetStore(students.copy())
+    for i in range(10):
+        def edit(df, i=i):
+            df.loc[df.index[0], "Age"] = i
+        _update(store, edit)
+        _filter(store, lambda df: df.index[1:])
+    assert max(dataset_store._depth(col) for col in store.version.columns.values()) <= 3
+    assert store.current()["GPA"].equals(students["GPA"].iloc[10:])
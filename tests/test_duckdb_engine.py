@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+pytest.importorskip("duckdb")
+
+import duckdb_engine  # noqa: E402
+from duckdb_engine import DuckEngine, resolve_data_path  # noqa: E402
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch, students):
+    import sidecar
+
+    monkeypatch.setattr(duckdb_engine, "DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setattr(sidecar, "SIDECAR_DIR", str(tmp_path / "sidecars"))
+    os.makedirs(tmp_path / "data")
+    students.to_csv(tmp_path / "data" / "students.csv", index=False)
+    students.to_parquet(tmp_path / "data" / "part1.parquet")
+    students.to_parquet(tmp_path / "data" / "part2.parquet")
+    (tmp_path / "secret.txt").write_text("secret")
+    return tmp_path
+
+
+def test_paths_outside_the_data_directory_are_refused(data_dir):
+    with pytest.raises(PermissionError):
+        resolve_data_path("../secret.txt")
+    with pytest.raises(PermissionError):
+        resolve_data_path(str(data_dir / "secret.txt"))
+    with pytest.raises(PermissionError):
+        DuckEngine("/etc/passwd")
+    assert resolve_data_path("students.csv") == os.path.realpath(data_dir / "data" / "students.csv")
+
+
+@pytest.mark.parametrize("source", ["students.csv", "part1.parquet", "part*.parquet"])
+def test_generated_sql_cannot_read_other_files(data_dir, students, source):
+    engine = DuckEngine(source)
+    expected = len(students) * (2 if "*" in source else 1)
+    assert engine.row_count() == expected
+    secret = str(data_dir / "secret.txt")
+    for query in [f"SELECT * FROM read_text('{secret}')", f"SELECT * FROM read_csv('{secret}')"]:
+        with pytest.raises(Exception):
+            engine.run_select(query)
+    with pytest.raises(Exception):
+        engine.sql("SET enable_external_access = true")
+
+
+def test_parquet_copies_do_not_share_the_sidecar_budget(data_dir, students, monkeypatch):
+    import sidecar
+
+    directory = str(data_dir / "sidecars")
+    sidecar.write_sidecar("first", students, directory)
+    # A budget that one sidecar fills: the Parquet copy must not evict it, nor be evicted by the next one.
+    monkeypatch.setattr(sidecar, "SIDECAR_MAX_MB", os.path.getsize(sidecar.sidecar_path("first", directory)) / 2**20)
+    engine = DuckEngine("students.csv")
+    parquet = [name for name in os.listdir(directory) if name.endswith(".parquet")]
+    assert len(parquet) == 1
+    assert os.path.exists(sidecar.sidecar_path("first", directory))
+    sidecar.write_sidecar("second", students, directory)
+    assert os.path.exists(os.path.join(directory, parquet[0]))
+    assert engine.row_count() == len(students)
+
+
+def test_async_handlers_dispatch_on_engines(data_dir, monkeypatch):
+    import asyncio
+
+    import chart_spec
+    import req_functions
+
+    engine = DuckEngine("students.csv")
+    monkeypatch.setattr(DuckEngine, "answer", lambda self, question: f"sql answer to {question}")
+    monkeypatch.setattr(chart_spec, "generate_chart_spec", lambda df, query: ("{}", {"chart": "bar"}))
+
+    async def main():
+        return await asyncio.gather(
+            req_functions.generate_plot_async(engine, "plot GPA"),
+            req_functions.ask_question_async(engine, "q1"),
+            req_functions.generate_insight_async(engine, "q2"),
+            req_functions.check_data_quality_async(engine, "q3"),
+            req_functions.update_data_async(engine, "q4"),
+        )
+
+    plot, ask, insight, quality, update = asyncio.run(main())
+    assert plot == ("{}", {"chart": "bar"})
+    assert (ask, insight, quality) == ("sql answer to q1", "sql answer to q2", "sql answer to q3")
+    assert update[1] == ""
@@ -0,0 +1,44 @@
+import io
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("openpyxl")
+
+from excel_ingest import list_sheets, read_sheet  # noqa: E402
+
+
+@pytest.fixture
+def workbook(students):
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        students.to_excel(writer, sheet_name="Students", index=False)
+        students.head(5)[["Student_ID", "GPA"]].to_excel(writer, sheet_name="Top", index=False)
+    return buffer.getvalue()
+
+
+def test_list_sheets(workbook):
+    assert list_sheets(workbook, engine="openpyxl") == ["Students", "Top"]
+
+
+def test_read_sheet_by_name_and_position(workbook, students):
+    df, stats = read_sheet(workbook, "Top", engine="openpyxl")
+    assert list(df.columns) == ["Student_ID", "GPA"]
+    assert stats == {"engine": "openpyxl", "sheet": "Top", "rows": 5, "seconds": stats["seconds"]}
+    df, stats = read_sheet(workbook, engine="openpyxl")
+    assert stats["rows"] == len(students)
+    assert df["GPA"].equals(students["GPA"])
+
+
+def test_read_sheet_optimizes_dtypes_like_csv(workbook, students):
+    df, _ = read_sheet(workbook, "Students", engine="openpyxl")
+    assert isinstance(df["Department"].dtype, pd.CategoricalDtype)
+    assert df.astype(object).equals(students.astype(object))
+
+
+def test_calamine_reads_the_same_frame(workbook):
+    pytest.importorskip("python_calamine")
+    fast, _ = read_sheet(workbook, "Students", engine="calamine")
+    slow, _ = read_sheet(workbook, "Students", engine="openpyxl")
+    assert fast.astype(object).equals(slow.astype(object))
+    assert list_sheets(workbook, engine="calamine") == ["Students", "Top"]
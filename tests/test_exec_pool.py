@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from exec_pool import ExecPool
+from sandbox import SandboxViolation, check_code
+
+
+@pytest.fixture(scope="module")
+def pool():
+    os.environ.setdefault("GROQ_API_KEY", "gsk_test_secret")
+    pool = ExecPool(size=1)
+    yield pool
+    pool.close()
+
+
+def test_runs_pandas_code(pool, students):
+    pool.set_dataset(students)
+    outcome = pool.run("result = round(df['GPA'].mean(), 4)")
+    assert outcome.ok
+    assert outcome.result == round(students["GPA"].mean(), 4)
+
+
+def test_draws_figures(pool, students):
+    pool.set_dataset(students)
+    outcome = pool.run("import matplotlib.pyplot as plt\ndf['GPA'].hist()\nresult = 1")
+    assert outcome.ok and len(outcome.figures) == 1
+
+
+@pytest.mark.parametrize("code", [
+    "import _socket; _socket.socket()",
+    "import socket",
+    "import subprocess",
+    "result = pd.io.common.os.listdir('/root')",
+    "result = pd.io.common.os.system('true')",
+    "result = pd.read_csv('/etc/passwd')",
+    "result = open('/etc/passwd').read()",
+    "df.to_csv('/tmp/exec_pool_escape.csv')",
+    "result = ().__class__.__base__.__subclasses__()",
+    "result = pd.core.arrays.arrow.array.pa.memory_map('/etc/passwd')",
+    "result = open('/proc/self/environ').read()",
+    "result = '{0.__class__.__mro__}'.format(df)",
+    "template = '{0.' + 'x}'\nresult = template.format(df)",
+    "result = '{0:{1.__class__}}'.format(1, df)",
+])
+def test_sandbox_refuses(pool, students, code):
+    pool.set_dataset(students)
+    outcome = pool.run(code)
+    assert not outcome.ok
+
+
+def test_generated_code_cannot_read_secrets(pool, students):
+    pool.set_dataset(students)
+    outcome = pool.run("result = pd.io.common.os.environ.get('GROQ_API_KEY')")
+    assert outcome.ok and outcome.result is None
+    outcome = pool.run("result = [k for k in pd.io.common.os.environ if 'KEY' in k]")
+    assert outcome.ok and outcome.result == []
+
+
+def test_check_code_rejects_underscore_names():
+    with pytest.raises(SandboxViolation):
+        check_code("x = df.__class__")
+    with pytest.raises(SandboxViolation):
+        check_code("result = '{0.__class__}'.format(df)")
+    check_code("result = df.groupby('Department')['GPA'].mean()")
+    check_code("result = '{:.2f} and {0[GPA]}'.format(1.5)")
+
+
+def test_each_job_sees_its_own_dataset(pool):
+    a, b = pd.DataFrame({"v": [1]}), pd.DataFrame({"v": [2]})
+    results = [pool.run("result = int(df['v'][0])", frame).result for frame in (a, b, a)]
+    assert results == [1, 2, 1]
+
+
+def test_mixed_type_columns_fall_back_to_pickling(pool):
+    mixed = pd.DataFrame({"a": [1, "x", 3.5], "b": [1, 2, 3]})
+    outcome = pool.run("result = df['a'].astype(str).tolist()", mixed)
+    assert outcome.ok, outcome.error
+    assert outcome.result == ["1", "x", "3.5"]
+
+
+def test_memory_limit_does_not_count_the_mapped_dataset():
+    pool = ExecPool(size=1, memory_mb=384)
+    try:
+        big = pd.DataFrame({"x": np.arange(50_000_000, dtype="float64")})
+        outcome = pool.run("result = len(df)", big)
+        assert outcome.ok, outcome.error
+    finally:
+        pool.close()
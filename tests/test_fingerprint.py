@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+from fingerprint import changed_columns, column_fingerprints, frame_fingerprint
+
+
+def test_any_changed_value_changes_the_fingerprint():
+    df = pd.DataFrame({"GPA": np.linspace(0, 4, 3_000_000)})
+    before = frame_fingerprint(df)
+    df.loc[1500, "GPA"] = 400
+    assert frame_fingerprint(df) != before
+
+
+def test_same_data_same_fingerprint(students):
+    assert frame_fingerprint(students) == frame_fingerprint(students.copy())
+
+
+def test_changed_columns(students):
+    edited = students.copy()
+    edited.loc[0, "Age"] += 1
+    assert changed_columns(column_fingerprints(students), column_fingerprints(edited)) == ["Age"]
@@ -0,0 +1,122 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import get_llm_response
+from llm_cache import ResponseCache
+from rate_limiter import RequestScheduler
+
+
+def _chunk(content=None, total=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=content))] if content is not None else []
+    usage = SimpleNamespace(total_tokens=total) if total is not None else None
+    return SimpleNamespace(choices=choices, usage=None, x_groq=SimpleNamespace(usage=usage))
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = RequestScheduler(limits={"m": (100, 10000)})
+    monkeypatch.setattr(get_llm_response, "get_scheduler", lambda: scheduler)
+    return scheduler
+
+
+@pytest.fixture
+def groq(monkeypatch):
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs)
+        return iter([_chunk("Hel"), _chunk("lo"), _chunk(""), _chunk(total=300)])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(get_llm_response, "get_groq_client", lambda: client)
+    return requests
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    shared = ResponseCache(path=str(tmp_path / "cache.sqlite"))
+    monkeypatch.delenv("LLM_CACHE_DISABLE", raising=False)
+    monkeypatch.setattr(get_llm_response, "get_cache", lambda: shared)
+    return shared
+
+
+def test_stream_yields_tokens_and_settles_the_reservation(scheduler, groq):
+    tokens = list(get_llm_response.get_response_groq_stream("sys", "q", model="m", max_new_tokens=4000))
+    assert tokens == ["Hel", "lo"]
+    assert groq[0]["stream"] is True
+    # 4000 tokens were reserved, the final chunk reports 300, the rest goes back to the bucket.
+    assert scheduler._budget("m").tokens.tokens >= 9690
+
+
+def test_streamed_answer_is_cached_once_complete(scheduler, groq, cache):
+    assert list(get_llm_response.get_response_stream("sys", "q", model="m")) == ["Hel", "lo"]
+    assert list(get_llm_response.get_response_stream("sys", "q", model="m")) == ["Hello"]
+    assert len(groq) == 1
+    # A hit from the stream is the same entry get_response reads.
+    assert get_llm_response.get_response("sys", "q", model="m") == "Hello"
+    assert len(groq) == 1
+
+
+def test_abandoned_stream_is_not_cached(scheduler, groq, cache):
+    stream = get_llm_response.get_response_stream("sys", "q", model="m")
+    assert next(stream) == "Hel"
+    stream.close()
+    assert cache.stats()["entries"] == 0
+
+
+def test_sampled_stream_bypasses_the_cache(scheduler, groq, cache):
+    for _ in range(2):
+        assert "".join(get_llm_response.get_response_stream("sys", "q", model="m", temp=0.5)) == "Hello"
+    assert len(groq) == 2
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.fixture
+def slow_llm(monkeypatch):
+    state = {"in_flight": 0, "peak": 0, "calls": 0}
+
+    async def fake(system_prompt, user_query, model, temp, top_p, max_new_tokens):
+        state["calls"] += 1
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        await asyncio.sleep(0.01)
+        state["in_flight"] -= 1
+        return f"answer to {user_query}"
+
+    monkeypatch.setattr(get_llm_response, "ASYNC_MAX_CONCURRENCY", 2)
+    monkeypatch.setattr(get_llm_response, "get_response_groq_text_async", fake)
+    return state
+
+
+def test_async_calls_are_capped_per_event_loop(slow_llm):
+    async def main():
+        return await asyncio.gather(*(
+            get_llm_response.get_response_async("sys", f"q{i}", use_cache=False) for i in range(8)))
+
+    # A second asyncio.run() gets its own semaphore instead of one bound to the closed loop.
+    for _ in range(2):
+        assert asyncio.run(main()) == [f"answer to q{i}" for i in range(8)]
+    assert slow_llm["peak"] == 2
+    assert slow_llm["calls"] == 16
+
+
+def test_async_cache_hits_skip_the_call(slow_llm, cache):
+    async def main():
+        first = await get_llm_response.get_response_async("sys", "q")
+        return first, await get_llm_response.get_response_async("sys", "q")
+
+    assert asyncio.run(main()) == ("answer to q", "answer to q")
+    assert slow_llm["calls"] == 1
+
+
+def test_async_client_is_reused_within_a_loop_only():
+    from llm_client import get_async_groq_client
+
+    async def clients():
+        return get_async_groq_client(api_key="test"), get_async_groq_client(api_key="test")
+
+    first, again = asyncio.run(clients())
+    assert first is again
+    assert asyncio.run(clients())[0] is not first
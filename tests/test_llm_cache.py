@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import pytest
+
+import get_llm_response
+import llm_cache
+from llm_cache import ResponseCache, make_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(path=str(tmp_path / "cache.sqlite"), max_entries=2, ttl_seconds=60)
+
+
+def test_round_trip_and_stats(cache):
+    assert cache.get("k") is None
+    cache.set("k", "answer")
+    assert cache.get("k") == "answer"
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_entries_expire_after_the_ttl(cache, clock):
+    cache.set("k", "answer")
+    clock[0] += 59
+    assert cache.get("k") == "answer"
+    clock[0] += 2
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted_at_the_cap(cache, clock):
+    cache.set("a", "A")
+    clock[0] += 1
+    cache.set("b", "B")
+    clock[0] += 1
+    assert cache.get("a") == "A"
+    clock[0] += 1
+    cache.set("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+
+
+def test_cache_is_shared_through_the_file(cache):
+    cache.set("k", "answer")
+    assert ResponseCache(path=cache.path).get("k") == "answer"
+
+
+def test_key_covers_every_sampling_setting():
+    base = make_key("m", "sys", "q", 0, 1, 256)
+    assert base == make_key("m", "sys", "q", 0.0, 1.0, 256)
+    for other in (make_key("m2", "sys", "q", 0, 1, 256), make_key("m", "sys", "q2", 0, 1, 256),
+                  make_key("m", "sys", "q", 0, 0.9, 256), make_key("m", "sys", "q", 0, 1, 512)):
+        assert other != base
+
+
+@pytest.fixture
+def llm(monkeypatch, tmp_path):
+    calls = []
+
+    def fake(system_prompt, user_query, model, temp, top_p, max_new_tokens):
+        calls.append(temp)
+        return f"answer {len(calls)}"
+
+    shared = ResponseCache(path=str(tmp_path / "cache.sqlite"))
+    monkeypatch.delenv("LLM_CACHE_DISABLE", raising=False)
+    monkeypatch.setattr(get_llm_response, "get_cache", lambda: shared)
+    monkeypatch.setattr(get_llm_response, "get_response_groq_text", fake)
+    return SimpleNamespace(calls=calls, cache=shared)
+
+
+def test_deterministic_calls_are_answered_from_the_cache(llm):
+    assert get_llm_response.get_response("sys", "q") == "answer 1"
+    assert get_llm_response.get_response("sys", "q") == "answer 1"
+    assert llm.calls == [0]
+
+
+def test_sampled_calls_bypass_the_cache(llm):
+    assert get_llm_response.get_response("sys", "q", temp=0.7) == "answer 1"
+    assert get_llm_response.get_response("sys", "q", temp=0.7) == "answer 2"
+    assert llm.cache.stats()["entries"] == 0
+
+
+def test_cache_can_be_turned_off(llm, monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_DISABLE", "1")
+    get_llm_response.get_response("sys", "q")
+    get_llm_response.get_response("sys", "q", use_cache=False)
+    assert len(llm.calls) == 2
+    assert llm.cache.stats()["entries"] == 0
@@ -0,0 +1,78 @@
+import contextvars
+import threading
+
+import pytest
+
+import model_router
+from model_router import HEAVY_MODEL, LIGHT_MODEL, route, routed_response, use_heavy_model
+
+
+@pytest.fixture
+def models(monkeypatch):
+    seen = []
+
+    def fake(system_prompt, user_query, model, max_new_tokens):
+        seen.append((model, max_new_tokens))
+        return "ok"
+
+    monkeypatch.setattr(model_router, "get_response", fake)
+    return seen
+
+
+def _in_fresh_context(fn):
+    return contextvars.Context().run(fn)
+
+
+def test_tasks_go_to_their_tier(models):
+    routed_response("classify", "sys", "q")
+    routed_response("ask", "sys", "q")
+    assert models == [(LIGHT_MODEL, 16), (HEAVY_MODEL, 2048)]
+    assert "classify:" + LIGHT_MODEL in model_router.route_metrics()
+
+
+def test_override_replaces_the_heavy_model_only(models):
+    def run():
+        use_heavy_model("custom-model")
+        routed_response("ask", "sys", "q")
+        routed_response("column_resolution", "sys", "q")
+
+    _in_fresh_context(run)
+    assert models == [("custom-model", 2048), (LIGHT_MODEL, 256)]
+
+
+def test_override_does_not_leak_into_other_sessions():
+    picked = threading.Event()
+    release = threading.Event()
+    seen = {}
+
+    def session():
+        use_heavy_model("custom-model")
+        picked.set()
+        release.wait(5)
+        seen["session"] = route("ask")[0]
+
+    thread = threading.Thread(target=session)
+    thread.start()
+    picked.wait(5)
+    seen["other"] = _in_fresh_context(lambda: route("ask")[0])
+    release.set()
+    thread.join()
+    assert seen == {"session": "custom-model", "other": HEAVY_MODEL}
+
+
+def test_environment_pin_wins_over_the_override(monkeypatch):
+    monkeypatch.setenv("LLM_ROUTE_ASK", "pinned-model")
+
+    def run():
+        use_heavy_model("custom-model")
+        return route("ask")
+
+    assert _in_fresh_context(run) == ("pinned-model", 2048)
+
+
+def test_set_route_moves_a_task(monkeypatch):
+    monkeypatch.setitem(model_router.ROUTES, "narrate", model_router.ROUTES["narrate"])
+    model_router.set_route("narrate", tier="light")
+    assert route("narrate") == (LIGHT_MODEL, 1024)
+    model_router.set_route("narrate", tier="other-model", max_new_tokens=64)
+    assert route("narrate") == ("other-model", 64)
@@ -0,0 +1,59 @@
+import pytest
+
+import profile_cache
+from profile_cache import get_profile, invalidate
+
+
+@pytest.fixture
+def computed(monkeypatch):
+    invalidate()
+    frames = []
+    compute = profile_cache._compute_profile
+
+    def counting(df):
+        frames.append(df)
+        return compute(df)
+
+    monkeypatch.setattr(profile_cache, "_compute_profile", counting)
+    yield frames
+    invalidate()
+
+
+def test_profile_is_computed_once_per_version(students, computed):
+    profile = get_profile(students)
+    assert get_profile(students.copy()) is profile
+    assert len(computed) == 1
+    assert profile["describe"].equals(students.describe())
+    assert profile["nulls"].equals(students.isnull().sum())
+
+
+def test_edited_frame_gets_a_fresh_profile(students, computed):
+    before = get_profile(students)
+    edited = students.assign(GPA=students["GPA"] + 1)
+    after = get_profile(edited)
+    assert after is not before
+    assert after["describe"].loc["mean", "GPA"] == pytest.approx(before["describe"].loc["mean", "GPA"] + 1)
+    assert len(computed) == 2
+
+
+def test_least_recently_used_profiles_are_dropped(students, computed, monkeypatch):
+    monkeypatch.setattr(profile_cache, "MAX_PROFILES", 2)
+    a, b, c = (students.head(n) for n in (10, 20, 30))
+    get_profile(a)
+    get_profile(b)
+    get_profile(a)
+    get_profile(c)
+    get_profile(a)
+    assert len(computed) == 3
+    get_profile(b)
+    assert len(computed) == 4
+
+
+def test_invalidate_one_frame(students, computed):
+    other = students.head(10)
+    get_profile(students)
+    get_profile(other)
+    invalidate(students)
+    get_profile(students)
+    get_profile(other)
+    assert len(computed) == 3
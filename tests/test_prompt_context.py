@@ -0,0 +1,27 @@
+import pandas as pd
+
+from prompt_context import compact_encode, compact_frame, count_tokens
+
+
+def test_one_line_per_row(students):
+    lines = compact_encode(students).splitlines()
+    header = lines.index(",".join(students.columns))
+    rows = lines[header + 1:]
+    assert len(rows) == len(students)
+    assert rows[0].split(",")[students.columns.get_loc("GPA")] == "3.57"
+
+
+def test_shared_prefixes_and_codes_have_a_legend(students):
+    text = compact_encode(pd.concat([students] * 4, ignore_index=True))
+    assert 'Name: every value starts with "Student_"' in text
+    assert "Department codes: " in text and "=Computer Science" in text
+
+
+def test_values_with_commas_are_quoted():
+    text = compact_encode(pd.DataFrame({"a": ['x, y', 'say "hi"'], "b": [1.23456, None]}))
+    assert text.splitlines()[-2:] == ['"x, y",1.235', '"say ""hi""",']
+
+
+def test_smaller_than_csv_and_repr(students):
+    assert count_tokens(compact_encode(students)) < count_tokens(students.to_csv(index=False))
+    assert count_tokens(compact_frame(students)) < count_tokens(str(students))
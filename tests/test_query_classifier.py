@@ -0,0 +1,39 @@
+import pytest
+
+from query_classifier import HELD_OUT_QUERIES, local_classify
+
+
+@pytest.mark.parametrize("query", [
+    "which students had the biggest change in GPA",
+    "convert this into a summary",
+    "fill me in on Physics",
+    "how did attendance change over the years",
+])
+def test_update_words_inside_questions_do_not_route_to_update(query):
+    assert local_classify(query) != "update_data"
+
+
+@pytest.mark.parametrize("query", [
+    "drop the scholarship column",
+    "please rename Age to age",
+    "can you delete rows where GPA is missing",
+    "fill missing ages with the median",
+])
+def test_imperative_updates(query):
+    assert local_classify(query) == "update_data"
+
+
+def test_held_out_queries_are_never_misrouted():
+    for query, label in HELD_OUT_QUERIES:
+        assert local_classify(query) in (label, None)
+
+
+@pytest.mark.parametrize("query", [
+    "average GPA by department",
+    "sort by GPA",
+    "mean attendance by year",
+    "median age per department",
+    "show students sorted by attendance",
+])
+def test_aggregations_with_by_are_not_charts(query):
+    assert local_classify(query) in ("text", None)
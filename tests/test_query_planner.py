@@ -0,0 +1,98 @@
+import sys
+
+import pytest
+
+import query_planner
+from query_planner import plan_query, try_answer
+
+
+@pytest.mark.parametrize("question", [
+    "how many students are not in Economics",
+    "average GPA of students older than 21",
+    "how many departments are there",
+    "count of students with scholarship",
+    "how many unique departments",
+    "percentage of students in economics",
+    "average gpa except economics",
+    "plot the average gpa by department",
+])
+def test_questions_with_unused_words_are_left_to_the_llm(students, question):
+    assert plan_query(students, question) is None
+    assert try_answer(students, question) is None
+
+
+def test_count_with_value_filter(students):
+    plan = plan_query(students, "how many students in Economics")
+    assert plan.execute(students) == (students["Department"] == "Economics").sum()
+
+
+def test_count_with_numeric_condition(students):
+    plan = plan_query(students, "how many students have gpa above 3.5")
+    assert plan.execute(students) == (students["GPA"] > 3.5).sum()
+
+
+def test_grouped_aggregate(students):
+    result = plan_query(students, "average GPA by Department").execute(students)
+    expected = students.groupby("Department")["GPA"].mean().round(4)
+    assert result.sort_index().equals(expected.sort_index())
+
+
+def test_which_group_has_the_highest_is_a_grouped_aggregate(students):
+    plan = plan_query(students, "which department has the highest GPA")
+    assert plan.kind == "aggregate" and plan.group == "Department"
+    result = plan.execute(students)
+    assert list(result.index) == [students.groupby("Department")["GPA"].mean().idxmax()]
+
+
+def test_ranking(students):
+    result = plan_query(students, "top 5 by Attendance_%").execute(students)
+    assert list(result["Attendance_%"]) == sorted(students["Attendance_%"], reverse=True)[:5]
+
+
+def test_filtered_aggregate(students):
+    result = plan_query(students, "average gpa of students in physics with attendance above 90").execute(students)
+    mask = (students["Department"] == "Physics") & (students["Attendance_%"] > 90)
+    assert result == pytest.approx(students.loc[mask, "GPA"].mean())
+
+
+def test_try_answer_formats_grouped_aggregates(students, monkeypatch):
+    # The answer must not depend on tabulate, which DataFrame.to_markdown needs.
+    monkeypatch.setitem(sys.modules, "tabulate", None)
+    answer = try_answer(students, "average GPA by Department")
+    expected = students.groupby("Department")["GPA"].mean().round(4)
+    lines = answer.splitlines()
+    assert lines[0] == "**Computed locally:** mean of GPA by Department"
+    assert lines[2:4] == ["| Department | GPA |", "|---|---|"]
+    assert sorted(lines[4:]) == sorted(f"| {k} | {v} |" for k, v in expected.items())
+
+
+def test_try_answer_formats_rankings(students, monkeypatch):
+    monkeypatch.setitem(sys.modules, "tabulate", None)
+    answer = try_answer(students, "top 5 by GPA")
+    lines = answer.splitlines()
+    assert lines[0] == "**Computed locally:** top 5 rows by GPA"
+    assert lines[2] == "| " + " | ".join(students.columns) + " |"
+    top = students.nlargest(5, "GPA")
+    assert [line.split(" | ")[0] for line in lines[4:]] == [f"| {sid}" for sid in top["Student_ID"]]
+
+
+def test_try_answer_formats_counts(students):
+    answer = try_answer(students, "how many students in Economics")
+    assert answer.endswith(f"**{(students['Department'] == 'Economics').sum()}**")
+
+
+def test_try_answer_raises_unexpected_errors(students, monkeypatch):
+    def broken(plan, result):
+        raise ImportError("tabulate")
+
+    monkeypatch.setattr(query_planner, "format_result", broken)
+    with pytest.raises(ImportError):
+        try_answer(students, "average GPA by Department")
+
+
+def test_try_answer_passes_on_plans_that_do_not_fit_the_data(students, monkeypatch):
+    def mismatch(plan, df):
+        raise TypeError("'>' not supported between instances of 'str' and 'float'")
+
+    monkeypatch.setattr(query_planner.Plan, "execute", mismatch)
+    assert try_answer(students, "how many students have gpa above 3.5") is None
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from rate_limiter import RequestScheduler, parse_model_limits, used_tokens
+
+
+def _completion(total):
+    return SimpleNamespace(usage=SimpleNamespace(total_tokens=total))
+
+
+def test_unused_reservation_is_refunded():
+    scheduler = RequestScheduler(limits={"m": (100, 10000)})
+    scheduler.run("m", 3000, lambda: _completion(500))
+    bucket = scheduler._budget("m").tokens
+    assert 9400 <= bucket.tokens <= 10000
+
+
+def test_no_refund_without_usage():
+    scheduler = RequestScheduler(limits={"m": (100, 10000)})
+    scheduler.run("m", 3000, lambda: "text")
+    assert scheduler._budget("m").tokens.tokens < 7100
+
+
+def test_used_tokens_from_stream_chunk():
+    chunk = SimpleNamespace(usage=None, x_groq=SimpleNamespace(usage=SimpleNamespace(total_tokens=42)))
+    assert used_tokens(chunk) == 42
+    assert used_tokens(SimpleNamespace()) is None
+
+
+def test_per_model_limits(monkeypatch):
+    assert parse_model_limits("a=10/1000, b-1.2=5/200") == {"a": (10, 1000), "b-1.2": (5, 200)}
+    monkeypatch.setenv("GROQ_MODEL_LIMITS", "m=7/700")
+    monkeypatch.setenv("GROQ_TPM", "99")
+    scheduler = RequestScheduler(limits={"m": (100, 10000), "other": (100, 10000)})
+    assert scheduler._budget("m").tokens.capacity == 700
+    assert scheduler._budget("other").tokens.capacity == 99
+
+
+class _RateLimited(Exception):
+    status_code = 429
+    response = SimpleNamespace(status_code=429, headers={"retry-after": "0"})
+
+
+def _flaky(failures, total):
+    calls = {"n": 0}
+
+    def call():
+        calls["n"] += 1
+        if calls["n"] <= failures:
+            raise _RateLimited()
+        return _completion(total)
+    return call
+
+
+def test_rate_limited_attempts_return_their_reservation():
+    scheduler = RequestScheduler(limits={"m": (6000, 10000)})
+    start = time.monotonic()
+    scheduler.run("m", 4000, _flaky(3, 4000))
+    # Without the refunds the three rejected attempts would have drained the bucket for over a minute.
+    assert time.monotonic() - start < 1
+    assert scheduler._budget("m").tokens.tokens >= 5900
+    assert scheduler.metrics()["retries"] == 3
+
+
+def test_async_rate_limited_attempts_return_their_reservation():
+    scheduler = RequestScheduler(limits={"m": (6000, 10000)})
+
+    async def main():
+        call = _flaky(3, 4000)
+
+        async def acall():
+            return call()
+        return await scheduler.run_async("m", 4000, acall)
+
+    asyncio.run(main())
+    assert scheduler._budget("m").tokens.tokens >= 5900
+
+
+def test_async_waits_do_not_hold_threads_and_cancelled_waits_take_nothing():
+    scheduler = RequestScheduler(limits={"m": (6000, 600)})
+    budget = scheduler._budget("m")
+    budget.tokens.take(600)
+
+    async def main():
+        waiters = [asyncio.create_task(budget.acquire_async(300)) for _ in range(50)]
+        await asyncio.sleep(0.05)
+        assert all(not w.done() for w in waiters)
+        for w in waiters:
+            w.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+
+    start = time.monotonic()
+    asyncio.run(main())
+    assert time.monotonic() - start < 1
+    # A cancelled waiter that had still taken its 300 tokens would leave the bucket negative.
+    budget.tokens.time_until(0)
+    assert 0 <= budget.tokens.tokens < 300
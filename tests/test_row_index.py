@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+from row_index import RowIndex, numeric_conditions
+
+
+def test_finds_rows_by_unique_id_and_value(students):
+    index = RowIndex(students)
+    student_id = students["Student_ID"].iloc[17]
+    assert index.search(student_id)[0] == 17
+    rows = index.search_rows("Physics students")
+    assert len(rows) and (rows["Department"] == "Physics").all()
+
+
+def test_numeric_conditions_restrict_rows(students):
+    rows = RowIndex(students).search_rows("Economics students with GPA above 3.5")
+    assert len(rows) and (rows["GPA"] > 3.5).all() and (rows["Department"] == "Economics").all()
+    assert numeric_conditions("age between 20 and 25", ["Age"]) == [("Age", ">=", 20.0), ("Age", "<=", 25.0)]
+
+
+def test_token_counts_cover_every_column():
+    df = pd.DataFrame({"a": ["x y", None, "x"], "b": pd.Categorical(["y", "y", "z"]), "c": [True, False, True]})
+    index = RowIndex(df)
+    assert index.doc_len.tolist() == [4.0, 2.0, 3.0]
+    assert np.count_nonzero(index.bm25("x")) == 2
@@ -0,0 +1,27 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from sidecar import prune_sidecars, read_sidecar, sidecar_age, sidecar_path, write_sidecar  # noqa: E402
+
+
+def test_round_trip_and_age(tmp_path, students):
+    assert sidecar_age("k", str(tmp_path)) is None
+    write_sidecar("k", students, str(tmp_path))
+    assert read_sidecar("k", directory=str(tmp_path)).equals(students)
+    assert 0 <= sidecar_age("k", str(tmp_path)) < 60
+
+
+def test_prune_removes_least_recently_used(tmp_path, students):
+    directory = str(tmp_path)
+    for i, key in enumerate(["old", "used", "new"]):
+        write_sidecar(key, students, directory)
+        os.utime(sidecar_path(key, directory), (time.time() - 100 + i, time.time()))
+    read_sidecar("old", directory=directory)
+    size = os.path.getsize(sidecar_path("new", directory))
+    removed = prune_sidecars(max_bytes=2 * size, directory=directory, keep=[sidecar_path("new", directory)])
+    assert removed == [sidecar_path("used", directory)]
+    assert read_sidecar("used", directory=directory) is None
@@ -0,0 +1,44 @@
+import pytest
+
+from req_functions import _first_json_object, parse_structured_response
+
+
+def test_fenced_json():
+    response = '```json\n{"category": "graph", "answer": "A bar chart", "code": "```python\\nplt.bar([1], [2])\\n```"}\n```'
+    assert parse_structured_response(response) == ("graph", "A bar chart", "plt.bar([1], [2])")
+
+
+def test_trailing_prose():
+    response = 'Sure! {"category": "text", "answer": "42 students", "code": ""}\nLet me know if you need more.'
+    assert parse_structured_response(response) == ("text", "42 students", "")
+
+
+def test_nested_braces_and_braces_in_strings():
+    response = '{"category": "insight", "answer": {"GPA": {"mean": 3.1}}, "code": "d = {\\"a\\": 1}"}'
+    category, answer, code = parse_structured_response(response)
+    assert category == "insight"
+    assert '"mean": 3.1' in answer
+    assert code == 'd = {"a": 1}'
+
+
+def test_unknown_category_falls_back_to_text():
+    assert parse_structured_response('{"category": "poem", "answer": "hi"}')[0] == "text"
+
+
+def test_skips_a_broken_object_before_a_valid_one():
+    assert _first_json_object('{not json} and then {"answer": "ok"}') == {"answer": "ok"}
+
+
+@pytest.mark.parametrize("response", [
+    "no json here",
+    '{"category": "graph", "answer": "unterminated',
+    "{'category': 'graph'}",
+    "[1, 2, 3]",
+])
+def test_malformed_replies_fall_back_to_the_raw_text(response):
+    assert parse_structured_response(response) == ("text", response, "")
+
+
+def test_malformed_reply_keeps_its_code_block():
+    response = "Here you go:\n```python\nresult = df.GPA.mean()\n```"
+    assert parse_structured_response(response) == ("text", response, "result = df.GPA.mean()")
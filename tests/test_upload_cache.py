@@ -0,0 +1,69 @@
+import io
+
+import pandas as pd
+import pytest
+
+import sidecar
+import upload_cache
+from upload_cache import content_key, load_upload
+
+
+@pytest.fixture
+def parsed(monkeypatch, tmp_path):
+    monkeypatch.setattr(sidecar, "SIDECAR_DIR", str(tmp_path))
+    upload_cache.clear()
+    calls = []
+
+    def parse(data):
+        calls.append(data)
+        return pd.read_csv(io.BytesIO(data))
+
+    yield parse, calls
+    upload_cache.clear()
+
+
+def _bytes(df):
+    return df.to_csv(index=False).encode()
+
+
+def test_upload_is_parsed_once(students, parsed):
+    parse, calls = parsed
+    data = _bytes(students)
+    df, source = load_upload("students.csv", data, parse)
+    assert source == "parsed"
+    again, source = load_upload("renamed.csv", data, parse)
+    assert source == "memory" and again is df
+    assert len(calls) == 1
+
+
+def test_later_session_reads_the_sidecar(students, parsed):
+    pytest.importorskip("pyarrow")
+    parse, calls = parsed
+    data = _bytes(students)
+    df, _ = load_upload("students.csv", data, parse)
+    upload_cache.clear()
+    again, source = load_upload("students.csv", data, parse)
+    assert source == "disk"
+    assert again.equals(df)
+    assert len(calls) == 1
+
+
+def test_key_depends_on_bytes_extension_and_variant():
+    key = content_key("a.csv", b"x,y\n1,2\n")
+    assert key == content_key("B.CSV", b"x,y\n1,2\n")
+    assert key != content_key("a.csv", b"x,y\n1,3\n")
+    assert key != content_key("a.xlsx", b"x,y\n1,2\n")
+    assert content_key("a.xlsx", b"x", "Sheet1") != content_key("a.xlsx", b"x", "Sheet2")
+
+
+def test_least_recently_used_uploads_leave_memory(students, parsed, monkeypatch):
+    monkeypatch.setattr(sidecar, "SIDECAR_DISABLE", True)
+    monkeypatch.setattr(upload_cache, "MAX_UPLOADS", 2)
+    parse, calls = parsed
+    a, b, c = (_bytes(students.head(n)) for n in (10, 20, 30))
+    for data in (a, b, a, c):
+        load_upload("f.csv", data, parse)
+    assert load_upload("f.csv", a, parse)[1] == "memory"
+    assert load_upload("f.csv", b, parse)[1] == "parsed"
+    assert len(calls) == 4
+    assert upload_cache.upload_cache_stats()["cached"] == 2
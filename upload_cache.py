@@ -0,0 +1,69 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+from sidecar import read_sidecar, write_sidecar
+
+MAX_UPLOADS = int(os.getenv("UPLOAD_CACHE_MAX", "4"))
+
+_frames = OrderedDict()
+_lock = threading.Lock()
+_stats = {"memory": 0, "disk": 0, "parsed": 0}
+
+
+def content_key(name, data, variant=None):
+    """Hash of the uploaded bytes plus the file extension, which decides the parser, and e.g. the sheet read."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(os.path.splitext(name)[1].lower().encode())
+    h.update(repr(variant).encode())
+    h.update(data)
+    return h.hexdigest()
+
+
+def _remember(key, df):
+    with _lock:
+        _frames[key] = df
+        _frames.move_to_end(key)
+        while len(_frames) > MAX_UPLOADS:
+            _frames.popitem(last=False)
+
+
+def load_upload(name, data, parse, variant=None):
+    """
+    Parsed DataFrame for an uploaded file, parsing it with `parse(data)` only the first time
+    these bytes (and `variant`, such as an Excel sheet name) are seen. Returns (df, source) with source "memory", "disk" or "parsed".
+    The cached frame is shared between reruns and sessions, so callers must not modify it in place.
+    """
+    key = content_key(name, data, variant)
+    with _lock:
+        df = _frames.get(key)
+        if df is not None:
+            _frames.move_to_end(key)
+            _stats["memory"] += 1
+            return df, "memory"
+
+    # A file seen in an earlier session is read back from its Arrow sidecar instead of being parsed.
+    df = read_sidecar(key)
+    if df is not None:
+        _remember(key, df)
+        with _lock:
+            _stats["disk"] += 1
+        return df, "disk"
+
+    df = parse(data)
+    _remember(key, df)
+    with _lock:
+        _stats["parsed"] += 1
+    write_sidecar(key, df)
+    return df, "parsed"
+
+
+def upload_cache_stats():
+    with _lock:
+        return dict(_stats, cached=len(_frames))
+
+
+def clear():
+    with _lock:
+        _frames.clear()